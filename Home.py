@@ -1,8 +1,14 @@
 import streamlit as st
 import time
 
+from core import monitor
+
 st.set_page_config(page_title="Hub de Extração Pro", page_icon="🏥", layout="wide")
 
+# Endpoint local das métricas do processo (Prometheus), uma vez por servidor;
+# todas as sessões passam por aqui para se autenticarem
+monitor.iniciar()
+
 # 1. Inicializar o estado de autenticação
 if "authenticated" not in st.session_state:
     st.session_state["authenticated"] = False
@@ -50,6 +56,10 @@ with st.sidebar:
     )
     if st.button("🚪 Sair"):
         st.session_state["authenticated"] = False
+        # Os PDFs carregados nesta sessão (core.uploads) saem do disco já
+        pasta = st.session_state.pop("_pasta_uploads", None)
+        if pasta:
+            pasta.limpar()
         st.rerun()
 
 st.success("✅ Sistema pronto. Selecione uma ferramenta no menu lateral.")
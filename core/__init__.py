@@ -0,0 +1,7 @@
+"""
+Infraestrutura partilhada pelas páginas do Hub de Extração.
+
+As páginas em ``pages/`` continuam a ser scripts Streamlit autónomos; o que
+é comum a várias delas (armazenamento local, ligação à planilha, etc.)
+vive aqui para poder ser importado sem efeitos secundários.
+"""
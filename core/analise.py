@@ -0,0 +1,95 @@
+"""
+Agregações do painel de análise, todas vectorizadas em pandas.
+
+As funções recebem os DataFrames de cada aba (colunas = campos de
+core.espelho.ABAS) já normalizados por ``preparar`` e nunca iteram linha
+a linha, para que o painel continue rápido com vários anos de histórico.
+"""
+import pandas as pd
+
+from core.espelho import ABAS
+
+
+def preparar(valores, tabela):
+    """
+    Converte os valores lidos da folha (lista de listas, possivelmente com
+    linhas de tamanho variável) num DataFrame com as colunas da aba, mais
+    "dt" (datetime) e, quando a aba tem valor, "valor_num" (float).
+    """
+    campos = ABAS[tabela]["campos"]
+    df = pd.DataFrame(valores)
+    df = df.reindex(columns=range(len(campos)))
+    df.columns = campos
+
+    datas = df["data"].astype(str).str.strip().str.replace("/", "-", regex=False)
+    df["dt"] = pd.to_datetime(datas, format="%d-%m-%Y", errors="coerce")
+    df = df[df["dt"].notna()].copy()
+
+    if "valor" in campos:
+        df["valor_num"] = _numeros(df["valor"])
+    return df
+
+
+def _numeros(serie):
+    """Valores numéricos ou texto pt/en ("1.125,20", "1125,20", "1,125.20") → float."""
+    num = pd.to_numeric(serie, errors="coerce")
+    texto = serie.astype(str).str.replace(" ", "", regex=False).str.replace("€", "", regex=False)
+    # Vírgula decimal quando é o último separador ("1.125,20", "1125,20");
+    # caso contrário a vírgula é de milhares ("1,125.20")
+    virgula_decimal = texto.str.rfind(",") > texto.str.rfind(".")
+    pt = texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    en = texto.str.replace(",", "", regex=False)
+    convertido = pd.to_numeric(pt.where(virgula_decimal, en), errors="coerce")
+    return num.fillna(convertido)
+
+
+def filtrar_periodo(df, inicio, fim):
+    """Linhas com data entre inicio e fim (inclusive)."""
+    if df.empty:
+        return df
+    return df[(df["dt"] >= pd.Timestamp(inicio)) & (df["dt"] <= pd.Timestamp(fim))]
+
+
+def receita_mensal(pagos):
+    """Soma e nº de pagamentos por mês (índice = primeiro dia do mês)."""
+    if pagos.empty:
+        return pd.DataFrame(columns=["Receita (€)", "Pagamentos"])
+    mes = pagos["dt"].dt.to_period("M").dt.to_timestamp()
+    agg = pagos.groupby(mes)["valor_num"].agg(["sum", "count"])
+    agg.columns = ["Receita (€)", "Pagamentos"]
+    return agg
+
+
+def volume_por(df, coluna, top=15):
+    """Nº de actos e (se existir) receita por valor da coluna, ordenado por volume."""
+    if df.empty or coluna not in df:
+        return pd.DataFrame(columns=["Actos"])
+    chave = df[coluna].fillna("").astype(str).str.strip().replace("", "(sem valor)")
+    if "valor_num" in df:
+        agg = df.groupby(chave)["valor_num"].agg(["count", "sum"])
+        agg.columns = ["Actos", "Receita (€)"]
+    else:
+        agg = chave.value_counts().to_frame("Actos")
+    return agg.sort_values("Actos", ascending=False).head(top)
+
+
+def atos_por_dia_operatorio(anestesiados):
+    """
+    Por mês: cirurgias, dias operatórios (datas distintas, como a métrica
+    "Dias Operatórios" da página 02) e cirurgias por dia operatório.
+    """
+    if anestesiados.empty:
+        return pd.DataFrame(columns=["Cirurgias", "Dias Operatórios", "Actos por dia"])
+    mes = anestesiados["dt"].dt.to_period("M").dt.to_timestamp()
+    agg = anestesiados.groupby(mes)["dt"].agg(["count", "nunique"])
+    agg.columns = ["Cirurgias", "Dias Operatórios"]
+    agg["Actos por dia"] = (agg["Cirurgias"] / agg["Dias Operatórios"]).round(2)
+    return agg
+
+
+def contagem_mensal(df, nome):
+    """Nº de registos por mês, numa coluna com o nome dado."""
+    if df.empty:
+        return pd.DataFrame(columns=[nome])
+    mes = df["dt"].dt.to_period("M").dt.to_timestamp()
+    return mes.value_counts().sort_index().to_frame(nome)
@@ -0,0 +1,140 @@
+"""
+Relatório de arranque a frio por página.
+
+    python -m core.arranque [--json] [--repeticoes 3]
+
+Cada troca de página e cada rerun volta a executar o script da página, por
+isso tudo o que está no topo do ficheiro é pago sempre. Para cada página
+este relatório mede, num interpretador novo (a frio), o tempo de importar
+os módulos que a página importa no topo e indica as ligações ao Sheets ou
+ao Gemini feitas ao nível do módulo (fora de funções e de blocos ``if``),
+que acrescentam tempo de rede a cada execução.
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Chamadas que abrem ligações de rede quando feitas no topo de uma página
+LIGACOES = {"authorize", "open_by_key", "open_by_url", "configure",
+            "GenerativeModel", "abrir_planilha", "cliente_gspread"}
+
+_MEDIR = """
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+tempos = {{}}
+for modulo in {modulos!r}:
+    t0 = time.perf_counter()
+    try:
+        __import__(modulo)
+        tempos[modulo] = time.perf_counter() - t0
+    except Exception as e:
+        tempos[modulo] = None
+print(json.dumps(tempos))
+"""
+
+
+def paginas():
+    return [RAIZ / "Home.py"] + sorted((RAIZ / "pages").glob("*.py"))
+
+
+def _instrucoes_de_topo(corpo):
+    """Instruções executadas a cada execução do script (entra em try/with, não em if/def)."""
+    for no in corpo:
+        yield no
+        if isinstance(no, (ast.Try, ast.With)):
+            for filho in (no.body, getattr(no, "orelse", []), getattr(no, "finalbody", [])):
+                yield from _instrucoes_de_topo(filho)
+
+
+def analisar(caminho):
+    """(módulos importados no topo, chamadas de ligação feitas no topo)."""
+    arvore = ast.parse(caminho.read_text(encoding="utf-8"))
+    modulos, ligacoes = [], []
+    for no in _instrucoes_de_topo(arvore.body):
+        if isinstance(no, ast.Import):
+            modulos += [a.name for a in no.names]
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            modulos.append(no.module)
+            # "from core import analise": o que pesa é o submódulo, não o pacote
+            pasta = RAIZ.joinpath(*no.module.split("."))
+            modulos += [f"{no.module}.{a.name}" for a in no.names
+                        if (pasta / f"{a.name}.py").is_file() or (pasta / a.name / "__init__.py").is_file()]
+        elif not isinstance(no, (ast.Try, ast.With)):
+            for chamada in _chamadas_imediatas(no):
+                nome = getattr(chamada.func, "attr", getattr(chamada.func, "id", None))
+                if nome in LIGACOES:
+                    ligacoes.append(f"{nome} (linha {chamada.lineno})")
+    return list(dict.fromkeys(modulos)), ligacoes
+
+
+def _chamadas_imediatas(no):
+    """Chamadas executadas ao correr a instrução (não entra em def, lambda, class, if, ciclos)."""
+    if isinstance(no, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda,
+                       ast.If, ast.For, ast.While)):
+        return
+    if isinstance(no, ast.Call):
+        yield no
+    for filho in ast.iter_child_nodes(no):
+        yield from _chamadas_imediatas(filho)
+
+
+def medir(modulos):
+    """Tempo de importação a frio de cada módulo, por ordem, num processo novo."""
+    codigo = _MEDIR.format(raiz=str(RAIZ), modulos=modulos)
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True,
+                           text=True, cwd=RAIZ, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def relatorio(repeticoes=3):
+    linhas = []
+    for caminho in paginas():
+        modulos, ligacoes = analisar(caminho)
+        medicoes = [medir(modulos) for _ in range(repeticoes)]
+        tempos = {
+            m: (min(t[m] for t in medicoes) if all(t[m] is not None for t in medicoes) else None)
+            for m in modulos
+        }
+        em_falta = [m for m, t in tempos.items() if t is None]
+        linhas.append({
+            "pagina": caminho.name,
+            "importacoes_ms": round(sum(t for t in tempos.values() if t) * 1000, 1),
+            "mais_lentas": sorted(
+                ((m, round(t * 1000, 1)) for m, t in tempos.items() if t),
+                key=lambda x: -x[1],
+            )[:3],
+            "ligacoes_no_topo": ligacoes,
+            "nao_instalados": em_falta,
+        })
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.arranque", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    parser.add_argument("--repeticoes", type=int, default=3,
+                        help="Medições por página (fica a menor)")
+    args = parser.parse_args(argv)
+
+    linhas = relatorio(max(1, args.repeticoes))
+    if args.json:
+        print(json.dumps(linhas, ensure_ascii=False, indent=2))
+        return 0
+
+    for l in linhas:
+        lentas = ", ".join(f"{m} {t:.0f} ms" for m, t in l["mais_lentas"])
+        print(f"{l['pagina']:<42} {l['importacoes_ms']:>8.0f} ms   {lentas}")
+        if l["ligacoes_no_topo"]:
+            print(f"{'':<42} ⚠ ligações no topo: {', '.join(l['ligacoes_no_topo'])}")
+        if l["nao_instalados"]:
+            print(f"{'':<42} (não instalados: {', '.join(l['nao_instalados'])})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
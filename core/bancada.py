@@ -0,0 +1,174 @@
+"""
+Banco de ensaio dos parsers com PDFs sintéticos (core.sinteticos).
+
+    python -m core.bancada [--tipos honorarios exames ...] [--paginas 1 10 100 2000]
+                           [--semente 0] [--json]
+    python -m core.bancada --linhas [--json]
+
+Para cada tipo e número de páginas gera o PDF, corre o parser num processo
+novo — o pico de memória medido é só desse parsing — e compara os registos
+com os esperados. Mostra páginas/s, registos/s, pico de memória (RSS) e a
+precisão (registos extraídos certos) e cobertura (registos esperados
+encontrados). Serve de referência antes e depois de mexer num parser.
+
+Com --linhas mede o parser de linhas dos Exames em linhas patológicas
+(muito longas, quase válidas) de comprimento crescente: o tempo por
+carácter deve ficar constante — se crescer com o comprimento há retrocesso.
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from core.sinteticos import GERADORES, gerar
+
+PAGINAS = [1, 10, 100]
+COMPRIMENTOS = [1_000, 10_000, 100_000]
+
+# Linhas de Exames quase válidas, com n repetições do padrão do meio
+LINHAS_PATOLOGICAS = {
+    "cauda_invalida":     lambda n: "CCC/1 " + "JOSE GASTROENTEROLO12 X " * n + "1 N/",
+    "sem_especialidade":  lambda n: "CCC/1 " + "JOSE GASTRO-12 X " * n + "1 N/N",
+    "muitos_processos":   lambda n: "2021-01-01 " + "G 2 CCC/1 " * n + "A GASTROENTEROLO1- 1 N/N",
+}
+
+
+def _rss_kb():
+    """Pico de RSS do processo em KB, ou None onde o módulo resource não existe."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+
+def _medir(tipo, pdf_bytes):
+    """Corre no processo de ensaio: (resultado do parser, segundos, RSS antes, RSS pico)."""
+    import pdfplumber  # noqa: F401 — carregado antes da medição
+    from core.parsers import PARSERS
+
+    antes = _rss_kb()
+    t0 = time.perf_counter()
+    res = PARSERS[tipo](pdf_bytes)
+    segundos = time.perf_counter() - t0
+    return res, segundos, antes, _rss_kb()
+
+
+def comparar(esperados, obtidos):
+    """Precisão e cobertura por registo completo (todos os campos iguais)."""
+    esp = Counter(tuple(sorted(r.items())) for r in esperados)
+    obt = Counter(tuple(sorted(r.items())) for r in obtidos)
+    certos = sum((esp & obt).values())
+    falta = next((dict(r) for r in (esp - obt).elements()), None)
+    return {
+        "certos": certos,
+        "precisao": certos / len(obtidos) if obtidos else float(not esperados),
+        "cobertura": certos / len(esperados) if esperados else 1.0,
+        "exemplo_em_falta": falta,
+    }
+
+
+def ensaiar(tipo, paginas, semente=0):
+    """Um caso do banco de ensaio: gera, mede num processo novo e compara."""
+    t0 = time.perf_counter()
+    pdf, esperados = gerar(tipo, paginas, semente)
+    t_gerar = time.perf_counter() - t0
+
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+        res, segundos, antes, pico = pool.submit(_medir, tipo, pdf).result()
+
+    seg = segundos or 1e-9
+    registos = res["registos"]
+    return {
+        "tipo": tipo,
+        "paginas": res["paginas"],
+        "mb_pdf": round(len(pdf) / 1e6, 2),
+        "registos": len(registos),
+        "esperados": len(esperados),
+        "segundos": round(segundos, 3),
+        "paginas_s": round(res["paginas"] / seg, 1),
+        "registos_s": round(len(registos) / seg),
+        "pico_mb": round(pico / 1024, 1) if pico is not None else None,
+        "acrescimo_mb": round((pico - antes) / 1024, 1) if pico is not None else None,
+        "segundos_geracao": round(t_gerar, 2),
+        "resumo_ok": (res.get("verificacao") or {}).get("ok"),
+        **comparar(esperados, registos),
+    }
+
+
+def ensaiar_linhas(comprimentos=COMPRIMENTOS, repeticoes=5):
+    """Tempo de parsear_linha (melhor de ``repeticoes``) por forma e comprimento de linha."""
+    from core.parsers.exames import especialidades, parsear_linha
+
+    tabela = especialidades()
+    linhas = []
+    for forma, fazer in LINHAS_PATOLOGICAS.items():
+        unidade = len(fazer(1)) - len(fazer(0))
+        for comprimento in comprimentos:
+            linha = fazer(max(1, comprimento // unidade))
+            melhor = float("inf")
+            for _ in range(repeticoes):
+                t0 = time.perf_counter()
+                parsear_linha(linha, tabela)
+                melhor = min(melhor, time.perf_counter() - t0)
+            linhas.append({
+                "forma": forma,
+                "caracteres": len(linha),
+                "ms": round(melhor * 1000, 3),
+                "ns_por_caracter": round(melhor * 1e9 / len(linha), 1),
+            })
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.bancada", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tipos", nargs="+", choices=list(GERADORES), default=list(GERADORES))
+    parser.add_argument("--paginas", nargs="+", type=int, default=PAGINAS,
+                        help="Tamanhos a ensaiar (por omissão: %(default)s)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    parser.add_argument("--linhas", action="store_true",
+                        help="Ensaiar o parser de linhas dos Exames em linhas patológicas")
+    args = parser.parse_args(argv)
+
+    if args.linhas:
+        linhas = ensaiar_linhas()
+        if args.json:
+            print(json.dumps(linhas, ensure_ascii=False, indent=2))
+            return 0
+        print(f"{'forma':<20} {'caracteres':>10} {'ms':>9} {'ns/car.':>8}")
+        for l in linhas:
+            print(f"{l['forma']:<20} {l['caracteres']:>10} {l['ms']:>9.3f} {l['ns_por_caracter']:>8.1f}")
+        return 0
+
+    linhas = []
+    if not args.json:
+        print(f"{'tipo':<14} {'pág':>5} {'registos':>9} {'s':>8} {'pág/s':>8} {'reg/s':>8} "
+              f"{'pico MB':>8} {'+MB':>6} {'precisão':>9} {'cobertura':>9}")
+    for tipo in args.tipos:
+        for paginas in args.paginas:
+            l = ensaiar(tipo, paginas, args.semente)
+            linhas.append(l)
+            if args.json:
+                continue
+            pico = f"{l['pico_mb']:>8.1f} {l['acrescimo_mb']:>6.1f}" if l["pico_mb"] else f"{'-':>8} {'-':>6}"
+            print(f"{tipo:<14} {l['paginas']:>5} {l['registos']:>9} {l['segundos']:>8.2f} "
+                  f"{l['paginas_s']:>8.1f} {l['registos_s']:>8} {pico} "
+                  f"{l['precisao']:>9.1%} {l['cobertura']:>9.1%}")
+            if l["exemplo_em_falta"]:
+                print(f"{'':<14} em falta, p.ex.: {l['exemplo_em_falta']}")
+            if l["resumo_ok"] is False:
+                print(f"{'':<14} não confere com o sumário da pág. 1")
+    if args.json:
+        print(json.dumps(linhas, ensure_ascii=False, indent=2))
+    return 0 if all(l["cobertura"] == 1 and l["precisao"] == 1 and l["resumo_ok"] is not False
+                    for l in linhas) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
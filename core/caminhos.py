@@ -0,0 +1,16 @@
+import os
+from pathlib import Path
+
+# ─── Pasta de dados locais ────────────────────────────────────────────────────
+# Por omissão fica em <raiz do projecto>/dados (ignorada pelo git).
+# Pode ser redirecionada com a variável de ambiente HUB_DADOS.
+PASTA_DADOS = Path(
+    os.environ.get("HUB_DADOS", Path(__file__).resolve().parent.parent / "dados")
+)
+
+
+def pasta_dados(*partes) -> Path:
+    """Devolve (e cria, se necessário) uma subpasta da pasta de dados."""
+    p = PASTA_DADOS.joinpath(*partes)
+    p.mkdir(parents=True, exist_ok=True)
+    return p
@@ -0,0 +1,141 @@
+"""
+Índice persistente do que já foi importado para cada aba de cada planilha:
+o hash de cada PDF gravado e o período de datas que traz.
+
+Os utilizadores carregam muitas vezes o mesmo ficheiro duas vezes: um PDF
+igual (mesmo sha256) a outro já gravado na planilha — ou repetido no mesmo
+carregamento — é recusado antes do parsing.
+
+    indice = Indice(sheet_url)
+    indice.ja_gravado(sha)           # {"nome", "tabela", "registado_em"} ou None
+    registar(sheet_url, tabela, res) # depois de gravar (res de processar_ficheiro + "hash")
+
+O período (periodo_lido) fica registado só para informação. Não serve
+para recusar PDFs: o índice não sabe de que hospital ou instituição é cada
+relatório, e um Mapa do CCC do mesmo mês de um já importado do HCIS não é
+repetido; uma página com datas de dois lados da fronteira também não se
+pode saltar sem duplicar ou perder registos.
+"""
+import hashlib
+import logging
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+from core.caminhos import pasta_dados
+from core.espelho import data_iso
+from core.planilha import extrair_id_planilha
+
+log = logging.getLogger(__name__)
+
+CAMINHO_BD = "cobertura.sqlite3"
+
+
+# ─── Período de um PDF ────────────────────────────────────────────────────────
+
+def periodo_lido(periodo, datas):
+    """
+    O que um PDF cobre de facto: o período do cabeçalho limitado às datas
+    dos registos lidos. Um relatório pedido para o ano inteiro mas tirado
+    em Fevereiro só cobre até à última data que traz; None sem período ou
+    sem registos.
+    """
+    isos = [d for d in map(data_iso, set(datas)) if d]
+    if not periodo or not isos:
+        return None
+    inicio, fim = max(periodo[0], min(isos)), min(periodo[1], max(isos))
+    return (inicio, fim) if inicio <= fim else None
+
+
+# ─── Índice por planilha ──────────────────────────────────────────────────────
+
+def _ligar():
+    con = sqlite3.connect(pasta_dados() / CAMINHO_BD, timeout=30)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS ficheiros ("
+        "planilha TEXT NOT NULL, tabela TEXT NOT NULL, sha256 TEXT NOT NULL, "
+        "nome TEXT, inicio TEXT, fim TEXT, registado_em TEXT NOT NULL, "
+        "PRIMARY KEY (planilha, sha256, tabela))"
+    )
+    return con
+
+
+def hash_ficheiro(fonte):
+    """sha256 de um PDF dado por bytes ou por caminho (lido aos bocados)."""
+    if isinstance(fonte, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(fonte).hexdigest()
+    h = hashlib.sha256()
+    with open(fonte, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def registar(sheet_url, tabela, res):
+    """
+    Regista um PDF acabado de gravar na aba: hash e período coberto
+    (res["hash"], res.get("periodo") — ver periodo_lido). Um PDF com
+    páginas que não foi possível ler (res["falhas"]) não é registado, para
+    poder ser carregado outra vez. Como o espelho, uma falha aqui só é
+    registada no log — a gravação na planilha já foi feita.
+    """
+    if not sheet_url or not res.get("hash") or res.get("falhas"):
+        return
+    inicio, fim = res.get("periodo") or (None, None)
+    try:
+        with closing(_ligar()) as con, con:
+            con.execute(
+                "INSERT OR REPLACE INTO ficheiros "
+                "(planilha, tabela, sha256, nome, inicio, fim, registado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (extrair_id_planilha(sheet_url), tabela, res["hash"], res.get("nome"),
+                 inicio, fim, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            )
+    except sqlite3.Error as e:
+        log.warning("Índice de cobertura indisponível (%s): %s", tabela, e)
+
+
+class Indice:
+    """O que já foi gravado numa planilha, lido uma vez (para um carregamento)."""
+
+    def __init__(self, sheet_url):
+        self.gravados = {}      # sha256 -> {"nome", "tabela", "registado_em"}
+        if sheet_url:
+            try:
+                with closing(_ligar()) as con:
+                    linhas = con.execute(
+                        "SELECT * FROM ficheiros WHERE planilha = ? ORDER BY registado_em",
+                        (extrair_id_planilha(sheet_url),),
+                    ).fetchall()
+            except sqlite3.Error as e:
+                log.warning("Índice de cobertura indisponível: %s", e)
+                linhas = []
+            for r in linhas:
+                self.gravados.setdefault(r["sha256"], {
+                    "nome": r["nome"], "tabela": r["tabela"], "registado_em": r["registado_em"],
+                })
+
+    def ja_gravado(self, sha):
+        return self.gravados.get(sha)
+
+
+def recusar_duplicados(hashes, indice=None):
+    """
+    Motivo de recusa por posição, para os hashes (pela ordem do carregamento)
+    repetidos no próprio carregamento ou, com ``indice``, já gravados na
+    planilha. Devolve {posição: motivo}.
+    """
+    recusados = {}
+    vistos = {}
+    for i, sha in enumerate(hashes):
+        anterior = indice.ja_gravado(sha) if indice else None
+        if anterior:
+            recusados[i] = (f"ficheiro idêntico a {anterior['nome']}, já gravado "
+                            f"em {anterior['registado_em'][:16]}")
+        elif sha in vistos:
+            recusados[i] = f"ficheiro repetido neste carregamento (igual ao nº {vistos[sha] + 1})"
+        else:
+            vistos[sha] = i
+    return recusados
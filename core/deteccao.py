@@ -0,0 +1,88 @@
+"""
+Detecção do tipo de relatório a partir do cabeçalho, sem fazer o parsing.
+
+Lê só o texto da primeira página (o código do relatório está no cabeçalho
+de todas). O hospital não interessa aqui: o parser de cada família
+reconhece o prefixo do processo registo a registo. Devolve a chave de
+core.parsers.PARSERS.
+"""
+import re
+
+from core import metricas
+
+# Marcador no cabeçalho → família de relatório
+MARCADORES = [
+    ("GHRO4045R", "cirurgias"),
+    ("GHCE4025R", "consultas"),
+    ("Mapa de Honor", "honorarios"),
+    ("Exames Realizados", "exames"),
+]
+
+# Tipo → descrição para mensagens (e página dedicada). Cirurgias e consultas
+# têm um parser por família para todos os hospitais (HCIS, CCC, CCO).
+DESCRICOES = {
+    "honorarios": "Mapa de Honorários (página 01)",
+    "cirurgias":  "Cirurgias — GHRO4045R (páginas 02 e 06)",
+    "exames":     "Exames Realizados (página 03)",
+    "consultas":  "Consultas — GHCE4025R (páginas 04 e 08)",
+}
+
+# Período no cabeçalho: "Período entre A e B", "Período: A a B", "Datas Activ. A a B"
+_DATA = r'(\d{4}-\d{2}-\d{2}|\d{2}[-/.]\d{2}[-/.]\d{4})'
+RE_PERIODO = re.compile(
+    rf'(?:Per[íi]odo|Datas?\s+(?:Activ|Factur)\w*)[^\d\n]{{0,40}}{_DATA}[^\d\n]{{1,12}}{_DATA}',
+    re.I,
+)
+
+# Sinónimos aceites por cada tipo (as antigas chaves por hospital)
+ACEITES = {
+    "cirurgias_ccc": {"cirurgias"},
+    "consultas_ccc": {"consultas"},
+}
+
+
+def tipo_do_texto(texto):
+    """Tipo de relatório para o texto do cabeçalho, ou None."""
+    return next((t for marcador, t in MARCADORES if marcador in texto), None)
+
+
+def texto_cabecalho(pdf_bytes):
+    """Texto da primeira página do PDF ("" se não tiver páginas)."""
+    with metricas.abrir_pdf(pdf_bytes) as pdf:
+        if not pdf.pages:
+            return ""
+        with metricas.etapa("extract_text"):
+            return pdf.pages[0].extract_text() or ""
+
+
+def detetar_tipo(pdf_bytes):
+    """
+    Lê o cabeçalho da primeira página do PDF e devolve o tipo de relatório
+    (chave de PARSERS) ou None se não for reconhecido.
+    """
+    return tipo_do_texto(texto_cabecalho(pdf_bytes))
+
+
+def ler_periodo(texto):
+    """
+    Período declarado no cabeçalho ("Período entre 2024-01-01 e 2024-01-31",
+    "Período: … a …", "Datas Activ./Factur. …") como (início, fim) em
+    YYYY-MM-DD, ou None se o cabeçalho não o tiver.
+    """
+    m = RE_PERIODO.search(texto or "")
+    if not m:
+        return None
+    inicio, fim = (_data_iso(d) for d in m.groups())
+    return (inicio, fim) if inicio <= fim else (fim, inicio)
+
+
+def _data_iso(data):
+    partes = re.split(r'[-/.]', data)
+    if len(partes[0]) == 4:
+        return "-".join(partes)
+    return f"{partes[2]}-{partes[1]}-{partes[0]}"
+
+
+def tipo_compativel(tipo, detetado):
+    """True se um PDF detectado como ``detetado`` pode ir para o parser de ``tipo``."""
+    return detetado is None or detetado == tipo or detetado in ACEITES.get(tipo, ())
@@ -0,0 +1,310 @@
+"""
+Filas justas entre utilizadores para as quotas partilhadas (Gemini e Sheets).
+
+Todos os médicos usam a mesma GEMINI_API_KEY e a mesma conta de serviço,
+por isso uma corrida grande de um utilizador não pode deixar os outros à
+espera. Cada pedido à API (uma página para a IA, um lote para o Sheets) é
+uma unidade de trabalho que entra na fila do seu utilizador; as unidades
+são despachadas por ordem justa ponderada entre utilizadores (cada um
+avança um "tempo virtual" de 1/peso por unidade e é servido quem tiver o
+menor), respeitando o ritmo global da quota (pedidos por minuto) e o
+número máximo de pedidos em simultâneo.
+
+Um utilizador com poucas páginas passa à frente do resto de uma corrida
+grande de outro, e cada um pode ver a sua posição na fila e o tempo
+estimado (``estado``/``descrever``).
+
+Configuração opcional nos segredos:
+
+    [quotas]
+    gemini_rpm = 60
+    sheets_rpm = 50
+
+    [quotas.pesos]
+    dr_silva = 2
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from core import metricas, monitor, segredos
+
+GEMINI_RPM = 60
+GEMINI_CONCORRENCIA = 8
+SHEETS_RPM = 50
+SHEETS_CONCORRENCIA = 2
+
+_filas = {}
+_lock = threading.Lock()
+
+
+class _Unidade:
+    __slots__ = ("utilizador", "conceder")
+
+    def __init__(self, utilizador, conceder):
+        self.utilizador = utilizador
+        self.conceder = conceder
+
+
+class Escalonador:
+    """Fila justa ponderada por utilizador com limite de ritmo e de concorrência."""
+
+    def __init__(self, nome, pedidos_por_minuto, concorrencia, pesos=None):
+        self.nome = nome
+        self.intervalo = 60.0 / pedidos_por_minuto
+        self.concorrencia = concorrencia
+        self.pesos = dict(pesos or {})
+
+        self._cond = threading.Condition()
+        self._filas = {}            # utilizador -> deque de _Unidade
+        self._passagem = {}         # utilizador -> tempo virtual
+        self._virtual = 0.0         # tempo virtual da última unidade despachada
+        self._ativos = 0
+        self._proximo_envio = 0.0
+        self._duracoes = deque(maxlen=50)
+        self._executor = ThreadPoolExecutor(
+            max_workers=concorrencia, thread_name_prefix=f"fila-{nome}"
+        )
+        self._despachante = None
+
+    # ─── Entrada ──────────────────────────────────────────────────────────────
+
+    def submeter(self, utilizador, funcao, *args, **kwargs):
+        """Põe funcao(*args) na fila do utilizador; corre numa thread da fila. Devolve um Future."""
+        futuro = Future()
+        # A chamada corre noutra thread mas conta para a medição de quem submete
+        contexto = contextvars.copy_context()
+        pedido_em = time.perf_counter()
+
+        def conceder():
+            self._executor.submit(contexto.run, self._correr, futuro, funcao, args, kwargs, pedido_em)
+
+        self._enfileirar(_Unidade(utilizador or "", conceder))
+        return futuro
+
+    def executar(self, utilizador, funcao, *args, ao_esperar=None, **kwargs):
+        """
+        Espera pela vez do utilizador e corre funcao(*args) na thread de quem
+        chama (útil no script Streamlit, onde st.* tem de ficar na mesma
+        thread). ao_esperar(estado) é chamado a cada segundo de espera; se
+        levantar (no Streamlit, st.* levanta RerunException quando o
+        utilizador mexe num widget) a unidade sai da fila, ou a vez já
+        concedida é devolvida, para não ficar uma vaga presa.
+        """
+        vez = threading.Event()
+        pedido_em = time.perf_counter()
+        unidade = _Unidade(utilizador or "", vez.set)
+        self._enfileirar(unidade)
+        try:
+            while not vez.wait(1.0):
+                if ao_esperar:
+                    ao_esperar(self.estado(utilizador))
+        except BaseException:
+            self._desistir(unidade, vez)
+            raise
+        t0 = time.monotonic()
+        try:
+            return self._chamar(funcao, args, kwargs, pedido_em)
+        finally:
+            self._libertar(time.monotonic() - t0)
+
+    def _correr(self, futuro, funcao, args, kwargs, pedido_em):
+        t0 = time.monotonic()
+        try:
+            futuro.set_result(self._chamar(funcao, args, kwargs, pedido_em))
+        except Exception as e:
+            futuro.set_exception(e)
+        finally:
+            self._libertar(time.monotonic() - t0)
+
+    def _chamar(self, funcao, args, kwargs, pedido_em):
+        """
+        Chama a API contando a espera na fila, a duração, as chamadas e os
+        erros na medição activa (core.metricas) e no processo (core.monitor).
+        """
+        medicao = metricas.atual()
+        inicio = time.perf_counter()
+        monitor.observar("hub_api_espera_fila_segundos", inicio - pedido_em, api=self.nome)
+        monitor.contar("hub_api_chamadas_total", api=self.nome)
+        if medicao is not None:
+            medicao.somar(f"{self.nome}.espera_fila", inicio - pedido_em)
+            medicao.contar(f"{self.nome}.chamadas")
+        try:
+            return funcao(*args, **kwargs)
+        except Exception as e:
+            quota = "429" in str(e) or "quota" in str(e).lower()
+            monitor.contar("hub_api_erros_total", api=self.nome)
+            if quota:
+                monitor.contar("hub_api_erros_429_total", api=self.nome)
+            if medicao is not None:
+                medicao.contar(f"{self.nome}.erros")
+                if quota:
+                    medicao.contar(f"{self.nome}.erros_429")
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            monitor.observar("hub_api_segundos", duracao, api=self.nome)
+            if medicao is not None:
+                medicao.somar(self.nome, duracao)
+
+    def _enfileirar(self, unidade):
+        with self._cond:
+            u = unidade.utilizador
+            if u not in self._filas:
+                # Quem estava parado não acumula crédito: entra no tempo virtual actual
+                self._filas[u] = deque()
+                self._passagem[u] = max(self._passagem.get(u, 0.0), self._virtual)
+            self._filas[u].append(unidade)
+            if self._despachante is None:
+                self._despachante = threading.Thread(
+                    target=self._despachar, name=f"despacho-{self.nome}", daemon=True
+                )
+                self._despachante.start()
+            self._cond.notify_all()
+
+    def _desistir(self, unidade, vez):
+        """Retira da fila uma unidade de quem deixou de esperar, ou liberta a vez já concedida."""
+        with self._cond:
+            # O despachante concede sob _cond: aqui a unidade ou ainda está na fila ou já tem a vez
+            if not vez.is_set():
+                fila = self._filas.get(unidade.utilizador)
+                if fila is not None and unidade in fila:
+                    fila.remove(unidade)
+                    if not fila:
+                        del self._filas[unidade.utilizador]
+                return
+        self._libertar(0.0)
+
+    def _libertar(self, duracao):
+        with self._cond:
+            self._ativos -= 1
+            self._duracoes.append(duracao)
+            self._cond.notify_all()
+
+    # ─── Despacho ─────────────────────────────────────────────────────────────
+
+    def _peso(self, utilizador):
+        return max(float(self.pesos.get(utilizador, 1)), 0.01)
+
+    def _despachar(self):
+        with self._cond:
+            while True:
+                if not self._filas or self._ativos >= self.concorrencia:
+                    self._cond.wait()
+                    continue
+                espera = self._proximo_envio - time.monotonic()
+                if espera > 0:
+                    self._cond.wait(espera)
+                    continue
+
+                u = min(self._filas, key=self._passagem.__getitem__)
+                fila = self._filas[u]
+                unidade = fila.popleft()
+                if not fila:
+                    del self._filas[u]
+                self._virtual = self._passagem[u]
+                self._passagem[u] += 1.0 / self._peso(u)
+
+                self._ativos += 1
+                self._proximo_envio = max(time.monotonic(), self._proximo_envio) + self.intervalo
+                unidade.conceder()
+
+    def amostra(self):
+        """Gauges da fila para core.monitor: unidades à espera e chamadas em curso."""
+        with self._cond:
+            em_fila = sum(len(f) for f in self._filas.values())
+            ativos = self._ativos
+        return [("hub_fila_unidades", {"api": self.nome}, em_fila),
+                ("hub_fila_ativas", {"api": self.nome}, ativos)]
+
+    # ─── Posição e ETA ────────────────────────────────────────────────────────
+
+    def _ritmo(self):
+        """Unidades por segundo: o menor entre a quota e a concorrência observada."""
+        ritmo = 1.0 / self.intervalo
+        if self._duracoes:
+            media = sum(self._duracoes) / len(self._duracoes)
+            if media > 0:
+                ritmo = min(ritmo, self.concorrencia / media)
+        return ritmo
+
+    def estado(self, utilizador):
+        """
+        {"na_fila", "posicao", "eta_s", "total_fila"} do utilizador: unidades
+        suas por despachar, quantas passam antes da próxima delas e segundos
+        estimados até a última ser despachada, simulando a ordem justa.
+        """
+        u = utilizador or ""
+        with self._cond:
+            restantes = {k: len(v) for k, v in self._filas.items()}
+            passagem = {k: self._passagem[k] for k in restantes}
+            ritmo = self._ritmo()
+        total = sum(restantes.values())
+        if u not in restantes:
+            return {"na_fila": 0, "posicao": 0, "eta_s": 0.0, "total_fila": total}
+
+        na_fila = restantes[u]
+        posicao = None
+        despachadas = 0
+        while restantes.get(u):
+            k = min(restantes, key=passagem.__getitem__)
+            if k == u and posicao is None:
+                posicao = despachadas
+            despachadas += 1
+            passagem[k] += 1.0 / self._peso(k)
+            restantes[k] -= 1
+            if not restantes[k]:
+                del restantes[k]
+        return {
+            "na_fila": na_fila,
+            "posicao": posicao,
+            "eta_s": despachadas / ritmo,
+            "total_fila": total,
+        }
+
+    def descrever(self, utilizador):
+        """Texto curto com a posição e ETA do utilizador nesta fila."""
+        e = self.estado(utilizador)
+        if not e["na_fila"]:
+            return f"fila {self.nome}: sem pedidos pendentes"
+        return (
+            f"fila {self.nome}: {e['na_fila']} pedido(s) seu(s), "
+            f"{e['posicao']} à frente, ~{formatar_eta(e['eta_s'])}"
+        )
+
+
+def formatar_eta(segundos):
+    segundos = int(round(segundos))
+    if segundos < 60:
+        return f"{segundos} s"
+    if segundos < 3600:
+        return f"{segundos // 60} min {segundos % 60:02d} s"
+    return f"{segundos // 3600} h {segundos % 3600 // 60:02d} min"
+
+
+# ─── Filas partilhadas do processo ────────────────────────────────────────────
+
+def _obter(nome, chave_rpm, rpm, concorrencia):
+    with _lock:
+        if nome not in _filas:
+            quotas = segredos.obter("quotas", {}) or {}
+            _filas[nome] = Escalonador(
+                nome,
+                float(quotas.get(chave_rpm, rpm)),
+                concorrencia,
+                pesos=quotas.get("pesos"),
+            )
+            monitor.coletor(_filas[nome].amostra)
+        return _filas[nome]
+
+
+def obter_fila_gemini():
+    """Fila partilhada para chamadas ao Gemini (uma unidade = uma página)."""
+    return _obter("gemini", "gemini_rpm", GEMINI_RPM, GEMINI_CONCORRENCIA)
+
+
+def obter_fila_sheets():
+    """Fila partilhada para escritas no Google Sheets (uma unidade = um lote)."""
+    return _obter("sheets", "sheets_rpm", SHEETS_RPM, SHEETS_CONCORRENCIA)
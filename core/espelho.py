@@ -0,0 +1,293 @@
+"""
+Espelho local (SQLite) de todos os registos escritos nas abas da planilha.
+
+Cada página de importação, depois de gravar no Google Sheets, regista aqui
+exactamente as mesmas linhas. As consultas históricas (por processo, data
+ou entidade) correm assim localmente, sem voltar a descarregar as abas pela
+API.
+
+As linhas são guardadas por planilha (ID do URL), porque cada médico usa a
+sua própria cópia do template.
+"""
+import logging
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+
+from core import monitor
+from core.caminhos import pasta_dados
+from core.planilha import extrair_id_planilha
+
+log = logging.getLogger(__name__)
+
+# ─── Layout de cada aba ───────────────────────────────────────────────────────
+# "campos" segue a ordem exacta das colunas na folha, a partir de
+# "coluna_inicial". "folha" = None significa a primeira aba da planilha (07).
+ABAS = {
+    "pagos": {
+        "folha": "pagos",
+        "coluna_inicial": "B",
+        "campos": ["data", "processo", "nome", "valor", "procedimento",
+                   "entidade", "gravado_em", "origem"],
+        "cabecalho": ["Data", "Processo", "Nome do Doente", "Valor (€)",
+                      "Procedimento", "Entidade", "Gravado Em", "Origem PDF"],
+    },
+    "anestesiados": {
+        "folha": "Anestesiados",
+        "coluna_inicial": "C",
+        "campos": ["data", "processo", "nome", "procedimentos", "urgencia", "origem"],
+        "cabecalho": ["Data", "Nº Processo", "Doente", "Procedimentos", "Urgência", "Origem"],
+    },
+    "consulta": {
+        "folha": "Consulta",
+        "coluna_inicial": "C",
+        "campos": ["data", "processo", "nome", "origem"],
+        "cabecalho": ["Data", "Nº Processo", "Nome", "Origem PDF"],
+    },
+    "exames_esp": {
+        "folha": "ExamesEsp",
+        "coluna_inicial": "C",
+        "campos": ["data", "processo", "nome", "codigo", "procedimento",
+                   "gravado_em", "origem"],
+        "cabecalho": ["Data", "Processo", "Nome do Doente", "Código",
+                      "Procedimento", "Gravado Em", "Origem PDF"],
+    },
+    "honorarios_ia": {
+        "folha": None,
+        "coluna_inicial": "B",
+        "campos": ["data", "processo", "nome", "valor", "gravado_em", "origem"],
+        "cabecalho": ["Data", "ID Utente", "Nome", "Valor (€)",
+                      "Data Execução", "Ficheiro"],
+    },
+}
+
+# Colunas indexadas (quando existem na aba)
+INDEXADOS = ("processo", "data_iso", "entidade")
+
+CAMINHO_BD = "espelho.sqlite3"
+
+_esquema_pronto = False
+_esquema_lock = threading.Lock()
+
+
+# ─── Ligação e esquema ────────────────────────────────────────────────────────
+
+def _ligar():
+    con = sqlite3.connect(pasta_dados() / CAMINHO_BD, timeout=30)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    _garantir_esquema(con)
+    return con
+
+
+def _garantir_esquema(con):
+    global _esquema_pronto
+    if _esquema_pronto:
+        return
+    with _esquema_lock:
+        if _esquema_pronto:
+            return
+        for tabela, aba in ABAS.items():
+            extra = ", valor_num REAL" if "valor" in aba["campos"] else ""
+            colunas = ", ".join(f"{c} TEXT" for c in aba["campos"])
+            con.execute(
+                f"CREATE TABLE IF NOT EXISTS {tabela} ("
+                f"id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                f"planilha TEXT NOT NULL, {colunas}, data_iso TEXT{extra}, "
+                f"importado_em TEXT NOT NULL)"
+            )
+            for coluna in INDEXADOS:
+                if coluna == "data_iso" or coluna in aba["campos"]:
+                    con.execute(
+                        f"CREATE INDEX IF NOT EXISTS ix_{tabela}_{coluna} "
+                        f"ON {tabela} (planilha, {coluna})"
+                    )
+        # Incrementado sempre que uma aba é substituída por inteiro, para que
+        # quem mantém vistas incrementais (índices em memória, caches) saiba
+        # que tem de as reconstruir.
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS geracoes ("
+            "planilha TEXT NOT NULL, tabela TEXT NOT NULL, "
+            "geracao INTEGER NOT NULL, PRIMARY KEY (planilha, tabela))"
+        )
+        con.commit()
+        _esquema_pronto = True
+
+
+# ─── Normalização ─────────────────────────────────────────────────────────────
+
+RE_DATA_PT  = re.compile(r'^(\d{1,2})-(\d{1,2})-(\d{4})')
+RE_DATA_ISO = re.compile(r'^(\d{4})-(\d{2})-(\d{2})')
+
+
+def data_iso(data):
+    """DD-MM-YYYY (formato das abas) → YYYY-MM-DD, para ordenar e filtrar por período."""
+    s = str(data or "").strip()
+    m = RE_DATA_PT.match(s)
+    if m:
+        return f"{m.group(3)}-{m.group(2).zfill(2)}-{m.group(1).zfill(2)}"
+    m = RE_DATA_ISO.match(s)
+    return m.group(0) if m else None
+
+
+def valor_num(valor):
+    """Converte "1125,20" / "1,125.20" / 45.5 em float (None se não for número)."""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    s = str(valor or "").strip().replace(" ", "")
+    if "," in s and "." in s:
+        s = s.replace(",", "")
+    else:
+        s = s.replace(",", ".")
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+# ─── Escrita ──────────────────────────────────────────────────────────────────
+
+def registar(sheet_url, tabela, linhas):
+    """
+    Acrescenta ao espelho as linhas acabadas de gravar na aba, no mesmo
+    layout de colunas da folha. Devolve o número de linhas registadas.
+
+    Uma falha no espelho nunca deve invalidar uma importação que já foi
+    gravada na planilha, por isso os erros de SQLite são apenas registados.
+    As linhas contam para hub_linhas_gravadas_total (core.monitor) mesmo
+    com o espelho indisponível.
+    """
+    if not linhas:
+        return 0
+    monitor.contar("hub_linhas_gravadas_total", len(linhas), tabela=tabela)
+    try:
+        with closing(_ligar()) as con, con:
+            _inserir(con, extrair_id_planilha(sheet_url), tabela, linhas)
+        return len(linhas)
+    except sqlite3.Error as e:
+        log.warning("Espelho local indisponível (%s): %s", tabela, e)
+        return 0
+
+
+def substituir(sheet_url, tabela, linhas):
+    """Substitui todo o conteúdo da aba no espelho (ex.: sincronização a partir da folha)."""
+    planilha = extrair_id_planilha(sheet_url)
+    with closing(_ligar()) as con, con:
+        con.execute(f"DELETE FROM {tabela} WHERE planilha = ?", (planilha,))
+        _inserir(con, planilha, tabela, linhas)
+        con.execute(
+            "INSERT INTO geracoes (planilha, tabela, geracao) VALUES (?, ?, 1) "
+            "ON CONFLICT (planilha, tabela) DO UPDATE SET geracao = geracao + 1",
+            (planilha, tabela),
+        )
+    return len(linhas)
+
+
+def sincronizar_da_folha(sh, sheet_url, tabela):
+    """
+    Substitui o espelho de uma aba pelo conteúdo actual da folha (útil para
+    trazer o histórico anterior ao espelho). Devolve o número de linhas.
+    """
+    aba = ABAS[tabela]
+    ws = sh.worksheet(aba["folha"]) if aba["folha"] else sh.get_worksheet(0)
+    col = aba["coluna_inicial"]
+    ultima_col = chr(ord(col) + len(aba["campos"]) - 1)
+    valores = ws.get(f"{col}2:{ultima_col}")
+    linhas = [v for v in valores if any(str(c).strip() for c in v)]
+    return substituir(sheet_url, tabela, linhas)
+
+
+def _inserir(con, planilha, tabela, linhas):
+    campos = ABAS[tabela]["campos"]
+    tem_valor = "valor" in campos
+    i_data = campos.index("data")
+    i_valor = campos.index("valor") if tem_valor else None
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    nomes = ["planilha", *campos, "data_iso", *(["valor_num"] if tem_valor else []), "importado_em"]
+    sql = (
+        f"INSERT INTO {tabela} ({', '.join(nomes)}) "
+        f"VALUES ({', '.join('?' * len(nomes))})"
+    )
+
+    def _valores():
+        for linha in linhas:
+            linha = list(linha)[:len(campos)]
+            linha += [""] * (len(campos) - len(linha))
+            texto = ["" if v is None else str(v) for v in linha]
+            extra = [valor_num(linha[i_valor])] if tem_valor else []
+            yield (planilha, *texto, data_iso(linha[i_data]), *extra, agora)
+
+    con.executemany(sql, _valores())
+
+
+# ─── Leitura ──────────────────────────────────────────────────────────────────
+
+def consultar(sheet_url, tabela, processo=None, desde=None, ate=None, entidade=None):
+    """
+    Devolve os registos (dicts) de uma aba, filtrados por processo, período
+    (datas em qualquer formato aceite por data_iso) e/ou entidade.
+    Todos os filtros usam os índices do espelho.
+    """
+    filtros = ["planilha = ?"]
+    args = [extrair_id_planilha(sheet_url)]
+    if processo:
+        filtros.append("processo = ?")
+        args.append(str(processo))
+    if desde:
+        filtros.append("data_iso >= ?")
+        args.append(data_iso(desde))
+    if ate:
+        filtros.append("data_iso <= ?")
+        args.append(data_iso(ate))
+    if entidade and "entidade" in ABAS[tabela]["campos"]:
+        filtros.append("entidade = ?")
+        args.append(entidade)
+
+    with closing(_ligar()) as con:
+        cur = con.execute(
+            f"SELECT * FROM {tabela} WHERE {' AND '.join(filtros)} ORDER BY data_iso, id",
+            args,
+        )
+        return [dict(r) for r in cur]
+
+
+def novos_registos(sheet_url, tabela, depois_de=0):
+    """Registos da aba com id > depois_de, por ordem de id (leitura incremental)."""
+    with closing(_ligar()) as con:
+        cur = con.execute(
+            f"SELECT * FROM {tabela} WHERE planilha = ? AND id > ? ORDER BY id",
+            (extrair_id_planilha(sheet_url), depois_de),
+        )
+        return [dict(r) for r in cur]
+
+
+def geracoes(sheet_url):
+    """{tabela: geração} da planilha — muda quando uma aba é substituída por inteiro."""
+    with closing(_ligar()) as con:
+        cur = con.execute(
+            "SELECT tabela, geracao FROM geracoes WHERE planilha = ?",
+            (extrair_id_planilha(sheet_url),),
+        )
+        return {t: 0 for t in ABAS} | {r["tabela"]: r["geracao"] for r in cur}
+
+
+def versao(sheet_url):
+    """
+    Marca que muda sempre que qualquer aba da planilha recebe ou perde
+    linhas no espelho. Serve de chave para invalidar caches de leitura.
+    """
+    planilha = extrair_id_planilha(sheet_url)
+    with closing(_ligar()) as con:
+        ultimos = tuple(
+            con.execute(
+                f"SELECT COALESCE(MAX(id), 0) FROM {tabela} WHERE planilha = ?",
+                (planilha,),
+            ).fetchone()[0]
+            for tabela in ABAS
+        )
+    return ultimos + tuple(geracoes(sheet_url).values())
+
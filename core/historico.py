@@ -0,0 +1,471 @@
+"""
+Carga histórica retomável: uma pasta grande de PDFs (todos os meses desde
+2021) importada por ordem de datas, em lotes, com pontos de retoma.
+
+    python -m core.historico PASTA [--planilha URL] [--csv PASTA_SAIDA]
+                                   [--saida PASTA_SAIDA --formato csv|xlsx|parquet]
+                                   [--tipo auto|...] [--lote 20] [--processos N]
+                                   [--recursivo] [--recomecar] [--relatorio FICHEIRO.json]
+
+Primeiro lê o cabeçalho de cada PDF (em paralelo) para saber o período e
+ordena-os pelo início; sem período no cabeçalho vale a data no nome do
+ficheiro (2023-05, 202305, 05-2023) e, em último caso, a data de
+modificação. Depois processa-os em lotes de --lote ficheiros (o parsing de
+cada lote em paralelo, com --processos processos) e grava-os por essa
+ordem nos destinos, como o core.importar.
+
+O estado fica em historico.sqlite3 (pasta de dados): cada ficheiro é
+marcado assim que é gravado e cada lote quando termina. Se a corrida
+parar — erro, quota do Sheets esgotada, Ctrl+C, máquina desligada —
+voltar a correr o mesmo comando retoma no primeiro ficheiro por gravar (a
+carga é identificada pela pasta e pelos destinos; --recomecar começa do
+zero). Um ficheiro interrompido entre a gravação e o registo é gravado de
+novo; com --planilha, os PDFs já gravados na planilha são recusados pelo
+índice de cobertura (core.cobertura).
+
+XLSX e Parquet só ficam legíveis quando o ficheiro é fechado, por isso com
+--formato xlsx|parquet cada lote tem os seus ficheiros (PASTA_SAIDA/
+lote_0007/pagos.xlsx), fechados no fim do lote. Cada ficheiro é marcado
+como gravado na planilha e nos CSV (e registado no índice de cobertura)
+logo a seguir a essa gravação, e como gravado de todo só quando os
+ficheiros do lote fecham. Um lote interrompido é apagado e refeito na
+retoma, mas os PDFs que já estavam na planilha e nos CSV só voltam a ser
+gravados nos ficheiros do lote.
+
+O progresso mostra ficheiros e MB feitos e o tempo estimado até ao fim,
+pelo débito medido nesta corrida (MB/s).
+"""
+import argparse
+import hashlib
+import json
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+
+from core import cobertura, metricas, processamento, saidas
+from core.caminhos import pasta_dados
+from core.deteccao import ler_periodo, texto_cabecalho, tipo_do_texto
+from core.escalonador import formatar_eta
+from core.importar import (
+    TIPOS, DestinoCSV, DestinoPlanilha, gravar_resultado, listar_pdfs,
+)
+
+CAMINHO_BD = "historico.sqlite3"
+LOTE = 20
+
+PENDENTE  = "pendente"
+GRAVADO   = "gravado"
+PARCIAL   = "parcial"       # gravado na planilha e nos CSV, falta o ficheiro do lote
+IGNORADO  = "ignorado"
+ERRO      = "erro"
+
+# Data no nome do ficheiro: 2023-05, 2023_05, 202305 ou 05-2023
+RE_DATA_NOME = re.compile(
+    r'(?<!\d)(20\d{2})[-_.]?(0[1-9]|1[0-2])(?!\d)'
+    r'|(?<!\d)(0[1-9]|1[0-2])[-_.](20\d{2})(?!\d)'
+)
+
+
+# ─── Estado da carga ──────────────────────────────────────────────────────────
+
+def _ligar():
+    con = sqlite3.connect(pasta_dados() / CAMINHO_BD, timeout=30)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS ficheiros ("
+        "carga TEXT NOT NULL, caminho TEXT NOT NULL, sha256 TEXT, tipo TEXT, "
+        "inicio TEXT, bytes INTEGER NOT NULL DEFAULT 0, estado TEXT NOT NULL, "
+        "lote INTEGER, registos INTEGER, erro TEXT, atualizado_em TEXT NOT NULL, "
+        "PRIMARY KEY (carga, caminho))"
+    )
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS lotes ("
+        "carga TEXT NOT NULL, lote INTEGER NOT NULL, ficheiros INTEGER, registos INTEGER, "
+        "segundos REAL, concluido_em TEXT NOT NULL, PRIMARY KEY (carga, lote))"
+    )
+    return con
+
+
+def _agora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def id_carga(pasta, destinos):
+    """A mesma pasta com os mesmos destinos é a mesma carga (e retoma-se)."""
+    chave = json.dumps([str(Path(pasta).resolve()), sorted(destinos)])
+    return hashlib.sha1(chave.encode()).hexdigest()[:12]
+
+
+def esquecer(carga):
+    """Apaga o estado de uma carga (--recomecar)."""
+    with closing(_ligar()) as con, con:
+        con.execute("DELETE FROM ficheiros WHERE carga = ?", (carga,))
+        con.execute("DELETE FROM lotes WHERE carga = ?", (carga,))
+
+
+def estado(carga):
+    """{caminho: linha} com o que já se sabe de cada ficheiro da carga."""
+    with closing(_ligar()) as con:
+        return {
+            r["caminho"]: dict(r)
+            for r in con.execute("SELECT * FROM ficheiros WHERE carga = ?", (carga,))
+        }
+
+
+def marcar(carga, caminho, estado_ficheiro, **campos):
+    """Ponto de retoma de um ficheiro (gravado, ignorado ou erro)."""
+    colunas = ", ".join(f"{c} = ?" for c in campos)
+    with closing(_ligar()) as con, con:
+        con.execute(
+            f"UPDATE ficheiros SET estado = ?, atualizado_em = ?{', ' + colunas if colunas else ''} "
+            "WHERE carga = ? AND caminho = ?",
+            (estado_ficheiro, _agora(), *campos.values(), carga, caminho),
+        )
+
+
+def concluir_lote(carga, lote, ficheiros, registos, segundos):
+    """Ponto de retoma de um lote."""
+    with closing(_ligar()) as con, con:
+        con.execute(
+            "INSERT OR REPLACE INTO lotes (carga, lote, ficheiros, registos, segundos, concluido_em) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (carga, lote, ficheiros, registos, round(segundos, 2), _agora()),
+        )
+
+
+def _proximo_lote(carga):
+    with closing(_ligar()) as con:
+        return (con.execute("SELECT MAX(lote) FROM lotes WHERE carga = ?", (carga,)).fetchone()[0] or 0) + 1
+
+
+# ─── Saída por lote (XLSX, Parquet) ──────────────────────────────────────────
+
+class ExportacaoPorLote:
+    """
+    --saida num formato que só fica legível depois de fechado: um
+    saidas.Exportacao por lote, numa subpasta lote_NNNN, aberta por abrir()
+    e fechada por fechar() no fim do lote.
+    """
+
+    def __init__(self, pasta, formato):
+        if formato not in saidas.formatos_disponiveis():
+            modulo = saidas.DEPENDENCIAS[formato]
+            raise RuntimeError(f"A saída {formato.upper()} precisa do pacote {modulo} (pip install {modulo})")
+        self.pasta = Path(pasta)
+        self.formato = formato
+        self.ficheiros = {}         # "lote_NNNN/tabela" -> caminho, dos lotes já fechados
+        self._atual = None
+
+    def abrir(self, lote):
+        """Começa os ficheiros do lote; os de uma corrida interrompida neste lote são apagados."""
+        pasta = self.pasta / f"lote_{lote:04d}"
+        shutil.rmtree(pasta, ignore_errors=True)
+        self._atual = saidas.Exportacao(pasta, self.formato)
+
+    def gravar(self, tabela, linhas):
+        return self._atual.gravar(tabela, linhas)
+
+    def fechar(self):
+        """Fecha os ficheiros do lote (ficam completos em disco)."""
+        if self._atual is None:
+            return
+        self._atual.fechar()
+        for tabela, caminho in self._atual.ficheiros.items():
+            self.ficheiros[f"{self._atual.pasta.name}/{tabela}"] = caminho
+        self._atual = None
+
+
+# ─── Ordem por datas ──────────────────────────────────────────────────────────
+
+def data_do_nome(nome):
+    """Primeiro dia do mês no nome do ficheiro (YYYY-MM-01), ou None."""
+    m = RE_DATA_NOME.search(nome)
+    if not m:
+        return None
+    ano, mes = (m.group(1), m.group(2)) if m.group(1) else (m.group(4), m.group(3))
+    return f"{ano}-{mes}-01"
+
+
+def examinar(caminho):
+    """
+    Corre num processo de trabalho: (sha256, tipo detectado, início do
+    período) de um PDF, pelo cabeçalho da primeira página.
+    """
+    sha = cobertura.hash_ficheiro(caminho)
+    try:
+        texto = texto_cabecalho(caminho)
+    except Exception:
+        return sha, None, None
+    periodo = ler_periodo(texto)
+    return sha, tipo_do_texto(texto), periodo[0] if periodo else None
+
+
+def registar_novos(carga, pdfs, conhecidos, ao_examinar=None):
+    """
+    Acrescenta à carga os PDFs que ainda não tem, com hash, tipo e data de
+    início (examinar, em paralelo no pool de processos).
+    """
+    novos = [p for p in pdfs if str(p) not in conhecidos]
+    if not novos:
+        return 0
+    pool = processamento.obter_pool()
+    linhas = []
+    for i, (caminho, (sha, tipo, inicio)) in enumerate(
+        zip(novos, pool.map(examinar, [str(p) for p in novos], chunksize=8)), 1
+    ):
+        if inicio is None:
+            inicio = data_do_nome(caminho.name) or datetime.fromtimestamp(
+                caminho.stat().st_mtime).strftime("%Y-%m-%d")
+        linhas.append((carga, str(caminho), sha, tipo, inicio, caminho.stat().st_size,
+                       PENDENTE, _agora()))
+        if ao_examinar:
+            ao_examinar(i, len(novos))
+    with closing(_ligar()) as con, con:
+        con.executemany(
+            "INSERT INTO ficheiros (carga, caminho, sha256, tipo, inicio, bytes, estado, atualizado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            linhas,
+        )
+    return len(novos)
+
+
+# ─── Progresso ────────────────────────────────────────────────────────────────
+
+class Progresso:
+    """Ficheiros e bytes feitos e ETA pelo débito desta corrida (bytes/s)."""
+
+    def __init__(self, ficheiros, total_bytes, feitos=0, bytes_feitos=0):
+        self.ficheiros = ficheiros
+        self.total_bytes = total_bytes
+        self.feitos = feitos
+        self.bytes_feitos = bytes_feitos
+        self._bytes_corrida = 0
+        self._t0 = time.perf_counter()
+
+    def avancar(self, n_bytes):
+        self.feitos += 1
+        self.bytes_feitos += n_bytes
+        self._bytes_corrida += n_bytes
+
+    def debito(self):
+        """Bytes por segundo nesta corrida (None antes do primeiro ficheiro)."""
+        segundos = time.perf_counter() - self._t0
+        return self._bytes_corrida / segundos if self._bytes_corrida and segundos > 0 else None
+
+    def eta(self):
+        debito = self.debito()
+        return (self.total_bytes - self.bytes_feitos) / debito if debito else None
+
+    def descrever(self):
+        fracao = self.bytes_feitos / self.total_bytes if self.total_bytes else 1.0
+        texto = (f"{self.feitos}/{self.ficheiros} ficheiros, "
+                 f"{self.bytes_feitos / 1e6:.1f}/{self.total_bytes / 1e6:.1f} MB ({fracao:.1%})")
+        debito, eta = self.debito(), self.eta()
+        if debito:
+            texto += f" — {debito / 1e6:.2f} MB/s, fim em ~{formatar_eta(eta)}"
+        return texto
+
+
+# ─── Carga ────────────────────────────────────────────────────────────────────
+
+def _marcar_gravado(carga, lote, f, res, estado_ficheiro=GRAVADO):
+    """Ponto de retoma de um ficheiro gravado (PARCIAL: só nos destinos imediatos)."""
+    marcar(carga, f["caminho"], estado_ficheiro, lote=lote, tipo=res["tipo"],
+           registos=len(res["registos"]), erro=None)
+
+
+def carregar(carga, pdfs, tipo, destinos, tamanho_lote=LOTE, saida=sys.stdout):
+    """
+    Processa os PDFs por lotes, por ordem de data, retomando do estado da
+    carga. Devolve o resumo; uma excepção ao gravar (quota, rede) sobe —
+    o que ficou gravado até aí está marcado.
+    """
+    conhecidos = estado(carga)
+    n = registar_novos(
+        carga, pdfs, conhecidos,
+        ao_examinar=lambda i, total: print(f"\r  A ler cabeçalhos: {i}/{total}", end="",
+                                           file=saida, flush=True),
+    )
+    if n:
+        print(file=saida)
+    em_pasta = {str(p) for p in pdfs}
+    todos = [f for c, f in estado(carga).items() if c in em_pasta]
+    pendentes = sorted((f for f in todos if f["estado"] in (PENDENTE, PARCIAL)),
+                       key=lambda f: (f["inicio"] or "", f["caminho"]))
+    feitos = [f for f in todos if f["estado"] not in (PENDENTE, PARCIAL)]
+    progresso = Progresso(len(todos), sum(f["bytes"] for f in todos),
+                          len(feitos), sum(f["bytes"] for f in feitos))
+    if feitos:
+        print(f"A retomar: {len(feitos)} ficheiro(s) já tratados, {len(pendentes)} por tratar.",
+              file=saida)
+
+    planilha = next((d for d in destinos if isinstance(d, DestinoPlanilha)), None)
+    indice = cobertura.Indice(planilha.sheet_url) if planilha else None
+    resumo = {"ficheiros": len(todos), "ja_feitos": len(feitos), "gravados": 0,
+              "ignorados": 0, "erros": 0, "registos": 0, "lotes": 0}
+    lote = _proximo_lote(carga)
+    gravado_em = datetime.now().strftime("%d-%m-%Y %H:%M")
+    # Hash → nome dos ficheiros já gravados nesta carga (cópias do mesmo PDF)
+    gravados = {f["sha256"]: Path(f["caminho"]).name
+                for f in todos if f["estado"] in (GRAVADO, PARCIAL)}
+    # Com saída por lote, a planilha e os CSV são gravados e marcados logo
+    # (PARCIAL) e os ficheiros do lote só contam como gravados depois de
+    # fechados: uma retoma não volta a acrescentar linhas à planilha
+    por_lote = [d for d in destinos if isinstance(d, ExportacaoPorLote)]
+    imediatos = [d for d in destinos if not isinstance(d, ExportacaoPorLote)]
+
+    for inicio in range(0, len(pendentes), tamanho_lote):
+        t0 = time.perf_counter()
+        grupo = pendentes[inicio:inicio + tamanho_lote]
+        for destino in por_lote:
+            destino.abrir(lote)
+        a_marcar = []
+        # Os PARCIAL já passaram pela recusa (e estão no índice de cobertura)
+        novos = [i for i, f in enumerate(grupo) if f["estado"] == PENDENTE]
+        recusados = {novos[j]: motivo for j, motivo in cobertura.recusar_duplicados(
+            [grupo[i]["sha256"] for i in novos], indice).items()}
+        for i in novos:
+            if i not in recusados and grupo[i]["sha256"] in gravados:
+                recusados[i] = (f"ficheiro idêntico a {gravados[grupo[i]['sha256']]}, "
+                                "já gravado nesta carga")
+        a_ler = [i for i in range(len(grupo)) if i not in recusados]
+        lidos = dict(zip(a_ler, processamento.processar_lote(
+            tipo, [(Path(grupo[i]["caminho"]).name, grupo[i]["caminho"]) for i in a_ler],
+        )))
+
+        registos_lote = 0
+        for i, f in enumerate(grupo):
+            res = lidos.get(i)
+            if res is None or res.get("ignorado"):
+                motivo = recusados.get(i) or res["ignorado"]
+                marcar(carga, f["caminho"], IGNORADO, lote=lote, erro=motivo)
+                resumo["ignorados"] += 1
+            elif res["erro"]:
+                if res["erro"].startswith("BrokenProcessPool"):
+                    continue      # o processo morreu: fica pendente para a retoma
+                marcar(carga, f["caminho"], ERRO, lote=lote, erro=res["erro"])
+                resumo["erros"] += 1
+                print(f"  {f['caminho']}: {res['erro']}", file=saida)
+            else:
+                if f["estado"] == PENDENTE:
+                    tabela, n_planilha = gravar_resultado(res, imediatos, gravado_em)
+                    if n_planilha is not None:
+                        cobertura.registar(planilha.sheet_url, tabela, {**res, "hash": f["sha256"]})
+                if por_lote:
+                    _marcar_gravado(carga, lote, f, res, PARCIAL)
+                    gravar_resultado(res, por_lote, gravado_em)
+                    a_marcar.append((f, res))
+                else:
+                    _marcar_gravado(carga, lote, f, res)
+                gravados[f["sha256"]] = Path(f["caminho"]).name
+                resumo["gravados"] += 1
+                resumo["registos"] += len(res["registos"])
+                registos_lote += len(res["registos"])
+            progresso.avancar(f["bytes"])
+
+        for destino in por_lote:
+            destino.fechar()
+        for f, res in a_marcar:
+            _marcar_gravado(carga, lote, f, res)
+        segundos = time.perf_counter() - t0
+        concluir_lote(carga, lote, len(grupo), registos_lote, segundos)
+        resumo["lotes"] += 1
+        print(f"[lote {lote}] {len(grupo)} ficheiro(s), {registos_lote} registos em "
+              f"{segundos:.1f} s — {progresso.descrever()}", file=saida, flush=True)
+        lote += 1
+    return resumo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m core.historico",
+        description="Carga histórica retomável de uma pasta de PDFs, por ordem de datas.",
+    )
+    parser.add_argument("pasta", help="Pasta com os PDFs")
+    parser.add_argument("--tipo", choices=TIPOS, default="auto",
+                        help="Tipo de relatório (por omissão detectado pelo cabeçalho)")
+    parser.add_argument("--planilha", help="URL da planilha Google onde gravar")
+    parser.add_argument("--csv", help="Pasta onde gravar um CSV por aba")
+    parser.add_argument("--saida", help="Pasta onde gravar um ficheiro por aba no --formato")
+    parser.add_argument("--formato", choices=list(saidas.SAIDAS), default="csv",
+                        help="Formato dos ficheiros de --saida (por omissão: %(default)s)")
+    parser.add_argument("--utilizador", default="carga-historica",
+                        help="Nome usado na fila partilhada do Sheets")
+    parser.add_argument("--lote", type=int, default=LOTE,
+                        help="Ficheiros por lote (por omissão: %(default)s)")
+    parser.add_argument("--processos", type=int, default=processamento.NUM_PROCESSOS,
+                        help="Processos de parsing (por omissão: %(default)s)")
+    parser.add_argument("--recursivo", action="store_true", help="Incluir subpastas")
+    parser.add_argument("--recomecar", action="store_true",
+                        help="Esquecer o estado desta carga e começar do zero")
+    parser.add_argument("--relatorio", help="Gravar os tempos por etapa e contadores neste JSON")
+    args = parser.parse_args(argv)
+
+    if not (args.planilha or args.csv or args.saida):
+        parser.error("indique --planilha, --csv e/ou --saida")
+    pdfs = listar_pdfs(args.pasta, args.recursivo)
+    if not pdfs:
+        print(f"Nenhum PDF em {args.pasta}", file=sys.stderr)
+        return 1
+
+    carga = id_carga(args.pasta, [f"planilha={args.planilha}", f"csv={args.csv}",
+                                  f"saida={args.saida}:{args.formato}"])
+    if args.recomecar:
+        esquecer(carga)
+
+    processamento.NUM_PROCESSOS = max(1, args.processos)
+    destinos = []
+    if args.csv:
+        destinos.append(DestinoCSV(args.csv))
+    exportacao = None
+    if args.saida:
+        try:
+            exportacao = (saidas.Exportacao(args.saida, args.formato) if args.formato == "csv"
+                          else ExportacaoPorLote(args.saida, args.formato))
+        except RuntimeError as e:
+            parser.error(str(e))
+    if exportacao:
+        destinos.append(exportacao)
+    if args.planilha:
+        destinos.append(DestinoPlanilha(args.planilha, args.utilizador))
+
+    print(f"Carga {carga}: {len(pdfs)} PDF(s), lotes de {args.lote}, "
+          f"{processamento.NUM_PROCESSOS} processos")
+    interrompida = None
+    with metricas.medir() as medicao:
+        try:
+            resumo = carregar(carga, pdfs, args.tipo, destinos, max(1, args.lote))
+        except KeyboardInterrupt:
+            interrompida = "interrompida (Ctrl+C)"
+        except Exception as e:
+            interrompida = f"parou: {type(e).__name__}: {e}"
+        finally:
+            if exportacao:
+                exportacao.fechar()
+
+    if interrompida:
+        print(f"\nCarga {interrompida}. Os ficheiros gravados estão marcados — "
+              "volte a correr o mesmo comando para retomar.", file=sys.stderr)
+        return 2
+
+    print(f"\nGravados: {resumo['gravados']} ficheiro(s), {resumo['registos']} registos "
+          f"em {resumo['lotes']} lote(s); {resumo['ignorados']} ignorado(s), "
+          f"{resumo['erros']} com erro; {resumo['ja_feitos']} de corridas anteriores.")
+    if exportacao:
+        for caminho in exportacao.ficheiros.values():
+            print(f"Ficheiro:   {caminho}")
+    if args.relatorio:
+        rel = metricas.relatorio("historico", medicao, resumo=resumo, carga=carga)
+        Path(args.relatorio).write_text(json.dumps(rel, ensure_ascii=False, indent=1), encoding="utf-8")
+        print(f"Relatório:  {args.relatorio}")
+    return 1 if resumo["erros"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+"""
+Extração de honorários com IA (Gemini) — página 07 e tarefas em segundo plano.
+
+Cada página pedida à IA fica com o seu estado — ok, vazia, erro_parse (a
+resposta não traz JSON válido, ou o texto da página não se leu) ou erro_api
+(quota, rede) — e os registos que devolveu. Uma página que falha não
+estraga o resto: repetir_falhadas volta a pedir só essas páginas e junta o
+resultado no lugar.
+"""
+import json
+import re
+from collections import Counter
+
+from core import metricas, monitor, segredos
+from core.escalonador import formatar_eta, obter_fila_gemini
+from core.parsers.comum import ERRO_PARSE, OK, VAZIA
+from core.processamento import processar_lote
+from core.registos import Lote
+
+MODELO = "models/gemini-2.0-flash"
+
+PROMPT_EXTRACAO = 'Extraia dados deste PDF CUF para este JSON: [{"data":"DD-MM-YYYY","id":"ID","nome":"NOME","valor":0.00}]'
+
+# Estado de uma página cuja chamada à API falhou; com ERRO_PARSE, as que se repetem
+ERRO_API = "erro_api"
+FALHADAS = {ERRO_PARSE, ERRO_API}
+
+
+def obter_modelo():
+    """Modelo Gemini configurado com a chave mestra dos segredos."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=segredos.obter("GEMINI_API_KEY"))
+    return genai.GenerativeModel(MODELO)
+
+
+def formatar_data(data_str):
+    data_str = str(data_str).strip()
+    if not data_str or "DD-MM-YYYY" in data_str.upper():
+        return None
+    match = re.search(r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{2,4})', data_str)
+    if match:
+        d, m, a = match.groups()
+        if len(a) == 2: a = "20" + a
+        return f"{d.zfill(2)}-{m.zfill(2)}-{a}"
+    return None
+
+def pedir_pagina(texto_pagina, model):
+    """Texto da resposta da IA para uma página; os erros da API propagam-se (a fila conta-os)."""
+    response = model.generate_content(
+        f"{PROMPT_EXTRACAO}\n\nTEXTO:\n{texto_pagina}",
+        generation_config={"temperature": 0.0}
+    )
+    return response.text
+
+
+def interpretar_resposta(resposta):
+    """Registos (dicts) da resposta da IA; ValueError se a resposta não traz uma lista JSON."""
+    match = re.search(r'\[\s*\{.*\}\s*\]', resposta, re.DOTALL)
+    if match:
+        dados = json.loads(match.group())
+        if isinstance(dados, list):
+            return [d for d in dados if isinstance(d, dict)]
+    elif re.search(r'\[\s*\]', resposta):
+        return []
+    raise ValueError(f"resposta sem lista JSON: {resposta[:80]!r}")
+
+
+def ler_resposta(pedido):
+    """(estado, registos, erro) de um pedido à IA (Future de pedir_pagina)."""
+    try:
+        resposta = pedido.result()
+    except Exception as e:
+        metricas.contar("gemini.respostas_falhadas")
+        monitor.contar("hub_ia_paginas_total", estado=ERRO_API)
+        return ERRO_API, [], f"{type(e).__name__}: {e}"
+    try:
+        dados = interpretar_resposta(resposta)
+    except ValueError as e:
+        metricas.contar("gemini.respostas_falhadas")
+        monitor.contar("hub_ia_paginas_total", estado=ERRO_PARSE)
+        return ERRO_PARSE, [], str(e)
+    estado = OK if dados else VAZIA
+    monitor.contar("hub_ia_paginas_total", estado=estado)
+    return estado, dados, None
+
+
+def extrair_dados_ia(texto_pagina, model):
+    """Extração de uma página numa só chamada (Fase 3); uma página que falha devolve []."""
+    try:
+        dados = interpretar_resposta(pedir_pagina(texto_pagina, model))
+    except Exception:
+        metricas.contar("gemini.respostas_falhadas")
+        monitor.contar("hub_ia_paginas_total", estado="falhada")
+        return []
+    monitor.contar("hub_ia_paginas_total", estado=OK if dados else VAZIA)
+    return dados
+
+
+# ── VERIFICAÇÃO: lê o total DECLARADO no próprio PDF ─────────────────────────
+
+def _extrair_texto_extremos(ficheiros):
+    """(texto da primeira e última página de todos os PDFs, textos das primeiras páginas)."""
+    texto = ""
+    primeiras = []
+    for nome, conteudo in ficheiros:
+        with metricas.abrir_pdf(conteudo) as pdf:
+            indices = sorted(set([0, len(pdf.pages) - 1]))
+            for i in indices:
+                with metricas.etapa("extract_text"):
+                    t = pdf.pages[i].extract_text() or ""
+                texto += f"\n[{nome} — pág. {i+1}]\n{t}\n"
+                if i == 0:
+                    primeiras.append(t)
+    return texto, primeiras
+
+def _resumo_total(primeiras):
+    """Soma dos actos do sumário por grupo da pág. 1, se todos os PDFs o tiverem."""
+    from core.parsers.honorarios import ler_resumo
+
+    total = 0
+    for texto in primeiras:
+        resumo = ler_resumo(texto)
+        if resumo is None:
+            return None
+        total += resumo["total"][0] if resumo["total"] else sum(n for n, _ in resumo["grupos"].values())
+    return total or None
+
+def _regex_total(texto):
+    padroes = [
+        r'n[oº°]\.?\s*(?:de\s+)?registos\s*[:\-]\s*(\d+)',
+        r'total\s+(?:de\s+)?registos\s*[:\-]\s*(\d+)',
+        r'total\s+(?:de\s+)?linhas\s*[:\-]\s*(\d+)',
+        r'total\s*[:\-]\s*(\d+)\s*registos',
+        r'\b(\d{2,4})\s+registos\b',
+        r'\blinhas\s*[:\-]\s*(\d+)',
+        r'\bcount\s*[:\-]\s*(\d+)',
+    ]
+    candidatos = []
+    for padrao in padroes:
+        for m in re.finditer(padrao, texto.lower()):
+            val = int(m.group(1))
+            if 1 < val < 100000:
+                candidatos.append(val)
+    return Counter(candidatos).most_common(1)[0][0] if candidatos else None
+
+def _ia_total(texto_extremos, model, utilizador=None):
+    prompt = (
+        "Lê este texto de PDFs de honorários CUF (primeiras e últimas páginas).\n"
+        "Encontra o número TOTAL DE REGISTOS declarado ('Total', 'Nº Registos', 'Nº de linhas', etc.).\n"
+        "Responde APENAS com o número inteiro. Se não encontrares, responde: null"
+    )
+    try:
+        response = obter_fila_gemini().executar(
+            utilizador, model.generate_content,
+            f"{prompt}\n\nTEXTO:\n{texto_extremos}",
+            generation_config={"temperature": 0.0, "max_output_tokens": 20}
+        )
+        raw = response.text.strip()
+        if "null" in raw.lower():
+            return None
+        numeros = re.findall(r'\d+', raw)
+        return int(numeros[0]) if numeros else None
+    except Exception:
+        metricas.contar("gemini.respostas_falhadas")
+        return None
+
+def obter_total_esperado(ficheiros, model, utilizador=None):
+    texto_extremos, primeiras = _extrair_texto_extremos(ficheiros)
+    total = _resumo_total(primeiras)
+    if total:
+        return total, "sumário por grupo da pág. 1 (sem IA)"
+    total = _regex_total(texto_extremos)
+    if total:
+        return total, "rodapé/cabeçalho do PDF (detecção automática)"
+    total = _ia_total(texto_extremos, model, utilizador)
+    if total:
+        return total, "rodapé/cabeçalho do PDF (leitura por IA)"
+    return None, None
+
+
+# ── FASE 3: CAÇA AOS REGISTOS EM FALTA ──────────────────────────────────────
+
+TERMOS_IGNORAR = ["PROENÇA ANTUNES", "UTILIZADOR", "PÁGINA", "LISTAGEM", "RELATÓRIO", "FIM DA LISTAGEM"]
+
+def extrair_todos_ids_do_pdf(ficheiros, model, status_placeholder, progresso_placeholder,
+                             utilizador=None):
+    """
+    Relê TODAS as páginas de todos os PDFs e extrai todos os registos,
+    usando uma abordagem mais agressiva (sem pular a página 0).
+    Devolve dict {id: {data, id, nome, valor, pagina, ficheiro}}.
+    """
+    todos = {}
+    total_paginas = 0
+    for _, conteudo in ficheiros:
+        with metricas.abrir_pdf(conteudo) as pdf:
+            total_paginas += len(pdf.pages)
+    pagina_atual = 0
+
+    for nome_ficheiro, conteudo in ficheiros:
+        with metricas.abrir_pdf(conteudo) as pdf:
+            ultima_data = ""
+            for i, pagina in enumerate(pdf.pages):
+                pagina_atual += 1
+                progresso_placeholder.progress(pagina_atual / total_paginas)
+                status_placeholder.info(f"🔎 A re-analisar: {nome_ficheiro} — pág. {i+1}/{len(pdf.pages)}")
+
+                with metricas.etapa("extract_text"):
+                    texto = pagina.extract_text(layout=True)
+                if not texto:
+                    continue
+
+                dados = obter_fila_gemini().executar(
+                    utilizador, extrair_dados_ia, texto, model,
+                    ao_esperar=lambda e: status_placeholder.info(
+                        f"⏳ Quota Gemini partilhada — {e['posicao']} pedido(s) à frente, "
+                        f"~{formatar_eta(e['eta_s'])}"
+                    ),
+                )
+                for d in dados:
+                    dt = formatar_data(d.get('data', ''))
+                    if dt:
+                        ultima_data = dt
+                    else:
+                        dt = ultima_data
+
+                    id_limpo = re.sub(r'\D', '', str(d.get('id', '')))
+                    nome_raw = str(d.get('nome', '')).strip().upper()
+                    e_lixo = any(t in nome_raw for t in TERMOS_IGNORAR)
+
+                    if id_limpo and not e_lixo and len(nome_raw) > 3:
+                        if id_limpo not in todos:   # primeiro encontrado ganha
+                            todos[id_limpo] = {
+                                "data": dt,
+                                "id": id_limpo,
+                                "nome": nome_raw,
+                                "valor": d.get('valor', 0.0),
+                                "pagina": i + 1,
+                                "ficheiro": nome_ficheiro,
+                            }
+    return todos
+
+
+CAMPOS_EM_FALTA = ("data", "id", "nome", "valor", "pagina", "ficheiro")
+
+
+def encontrar_em_falta(ids_extraidos_set, todos_do_pdf):
+    """
+    Compara o set de IDs já extraídos com o universo completo do PDF.
+    Devolve um Lote (data, id, nome, valor, pagina, ficheiro) com os registos
+    presentes no PDF mas ausentes na extração principal.
+    """
+    em_falta = Lote(CAMPOS_EM_FALTA, partilhados=("data", "ficheiro"))
+    em_falta.estender(
+        r for id_key, r in todos_do_pdf.items()
+        if id_key not in ids_extraidos_set
+    )
+    return em_falta
+
+
+# ── FASE 1: EXTRAÇÃO ─────────────────────────────────────────────────────────
+
+def extrair_paginas(ficheiros, model, reportar=None, utilizador=None):
+    """
+    Texto de todos os PDFs lido em paralelo (pool de processos) e uma
+    chamada à IA por página (sem a primeira), em paralelo na fila
+    partilhada do Gemini (que reparte a quota de forma justa entre
+    utilizadores). reportar(fracao, mensagem) recebe o progresso.
+    Devolve (paginas, erros): uma entrada por página, pela ordem de upload e
+    de página, com "pdf" (posição do ficheiro), "ficheiro", "pagina",
+    "estado", "erro" e "dados" (os registos que a IA devolveu).
+    """
+    reportar = reportar or (lambda fracao, mensagem: None)
+    reportar(0.0, f"📖 Fase 1/2 — A ler {len(ficheiros)} PDF(s)...")
+    textos_pdf = processar_lote("texto", ficheiros)
+
+    fila = obter_fila_gemini()
+    erros = []
+    pendentes = []
+    for pdf, res in enumerate(textos_pdf):
+        if res["erro"]:
+            erros.append(f"{res['nome']}: {res['erro']}")
+            continue
+        falhas = res.get("falhas") or {}
+        for n, texto in enumerate(res["registos"][1:], start=2):
+            pagina = {"pdf": pdf, "ficheiro": res["nome"], "pagina": n,
+                      "estado": VAZIA, "erro": None, "dados": []}
+            if n in falhas:
+                pagina.update(estado=ERRO_PARSE, erro=falhas[n])
+            pedido = fila.submeter(utilizador, pedir_pagina, texto, model) if texto else None
+            pendentes.append((pagina, pedido))
+
+    total = len(pendentes) or 1
+    for feitas, (pagina, pedido) in enumerate(pendentes, start=1):
+        reportar(feitas / total,
+                 f"📖 Fase 1/2 — A extrair: {pagina['ficheiro']} ({fila.descrever(utilizador)})")
+        if pedido is not None:
+            pagina["estado"], pagina["dados"], pagina["erro"] = ler_resposta(pedido)
+    return [pagina for pagina, _ in pendentes], erros
+
+
+def falhadas(paginas):
+    """Páginas com erro (de leitura ou da API), as que repetir_falhadas volta a pedir."""
+    return [p for p in paginas if p["estado"] in FALHADAS]
+
+
+def _textos_das_paginas(paginas, ficheiros):
+    """{(pdf, página): (texto, erro)} das páginas dadas, abrindo cada PDF uma vez."""
+    por_pdf = {}
+    for p in paginas:
+        por_pdf.setdefault(p["pdf"], []).append(p["pagina"])
+    textos = {}
+    for pdf, numeros in por_pdf.items():
+        with metricas.abrir_pdf(ficheiros[pdf][1]) as doc:
+            for n in numeros:
+                try:
+                    with metricas.etapa("extract_text"):
+                        textos[pdf, n] = (doc.pages[n - 1].extract_text(layout=True) or "", None)
+                except Exception as e:
+                    textos[pdf, n] = (None, f"{type(e).__name__}: {e}")
+    return textos
+
+
+def repetir_falhadas(paginas, ficheiros, model, reportar=None, utilizador=None):
+    """
+    Volta a pedir à IA só as páginas com erro (com o texto relido dessas
+    páginas) e guarda o novo estado e registos no lugar de cada uma — as
+    outras páginas ficam como estão. Devolve quantas deixaram de ter erro.
+    """
+    reportar = reportar or (lambda fracao, mensagem: None)
+    a_repetir = falhadas(paginas)
+    if not a_repetir:
+        return 0
+    reportar(0.0, f"🔁 A repetir {len(a_repetir)} página(s) com erro...")
+    textos = _textos_das_paginas(a_repetir, ficheiros)
+
+    fila = obter_fila_gemini()
+    pedidos = []
+    for pagina in a_repetir:
+        texto, erro = textos[pagina["pdf"], pagina["pagina"]]
+        metricas.contar("gemini.repeticoes")
+        pedidos.append(fila.submeter(utilizador, pedir_pagina, texto, model) if texto else None)
+        if not texto:
+            pagina.update(estado=ERRO_PARSE if erro else VAZIA, erro=erro, dados=[])
+
+    recuperadas = 0
+    for feitas, (pagina, pedido) in enumerate(zip(a_repetir, pedidos), start=1):
+        reportar(feitas / len(a_repetir),
+                 f"🔁 A repetir: {pagina['ficheiro']} — pág. {pagina['pagina']}")
+        if pedido is not None:
+            pagina["estado"], pagina["dados"], pagina["erro"] = ler_resposta(pedido)
+        recuperadas += pagina["estado"] not in FALHADAS
+    return recuperadas
+
+
+def linhas_das_paginas(paginas, data_exec):
+    """
+    Linhas no layout da folha (a partir da coluna B) com os registos das
+    páginas, pela ordem de upload e de página: a data em falta herda a
+    última data válida do mesmo PDF.
+    """
+    linhas = []
+    pdf_atual, ultima_data_valida = None, ""
+    for pagina in paginas:
+        if pagina["pdf"] != pdf_atual:
+            pdf_atual, ultima_data_valida = pagina["pdf"], ""
+        for d in pagina["dados"]:
+            dt = formatar_data(d.get('data', ''))
+            if dt:
+                ultima_data_valida = dt
+            else:
+                dt = ultima_data_valida
+            id_limpo = re.sub(r'\D', '', str(d.get('id', '')))
+            nome_raw = str(d.get('nome', '')).strip().upper()
+            e_lixo = any(t in nome_raw for t in TERMOS_IGNORAR)
+            if id_limpo and not e_lixo and len(nome_raw) > 3:
+                linhas.append([
+                    dt, id_limpo, nome_raw,
+                    d.get('valor', 0.0), data_exec, pagina["ficheiro"]
+                ])
+    return linhas
@@ -0,0 +1,145 @@
+"""
+Conversão dos registos dos parsers em linhas das abas e gravação na folha.
+
+É o único caminho de escrita no Sheets: as páginas, as tarefas, a linha de
+comandos (core.importar, core.historico) e a pasta vigiada gravam todas por
+gravar(), pela fila partilhada, com o layout de core.espelho.ABAS, e cada
+gravação é registada no espelho local.
+"""
+import re
+
+from core import espelho
+from core.escalonador import obter_fila_sheets
+from core.parsers.exames import formatar_data_pt
+from core.registos import Lote
+
+# Tipo de relatório (chave de PARSERS) → tabela/aba de destino
+TABELA_DO_TIPO = {
+    "honorarios":    "pagos",
+    "cirurgias":     "anestesiados",
+    "cirurgias_ccc": "anestesiados",
+    "exames":        "exames_esp",
+    "consultas":     "consulta",
+    "consultas_ccc": "consulta",
+}
+
+# Abas gravadas com USER_ENTERED nas páginas (01 e 03); as outras em RAW
+ENTRADA_UTILIZADOR = {"pagos", "exames_esp"}
+
+LOTE = 500
+
+
+# Tipo → campos do registo pela ordem das colunas da aba (sem as colunas de gravação)
+CAMPOS_DA_FOLHA = {
+    "honorarios":    ("data", "processo", "nome", "valor", "procedimento", "entidade"),
+    "cirurgias":     ("data", "processo", "doente", "procedimentos", "urgencia"),
+    "cirurgias_ccc": ("data", "processo", "doente", "procedimentos", "urgencia"),
+    "consultas":     ("data", "processo", "nome"),
+    "consultas_ccc": ("data", "processo", "nome"),
+    "exames":        ("data", "processo", "nome", "codigo", "procedimento"),
+}
+
+
+def linhas_para_folha(tipo, registos, origem, gravado_em):
+    """
+    Registos de um PDF (Lote ou lista de dicts) → linhas da aba, como as
+    páginas 01–08 as gravam. De um Lote as linhas saem coluna a coluna,
+    sem um dict por registo.
+    """
+    if tipo not in CAMPOS_DA_FOLHA:
+        raise ValueError(f"Tipo sem aba de destino: {tipo}")
+    campos = CAMPOS_DA_FOLHA[tipo]
+    if tipo == "exames":
+        valores = (
+            zip(*(registos.coluna(c) for c in campos)) if isinstance(registos, Lote)
+            else ([r[c] for c in campos] for r in registos)
+        )
+        return [[formatar_data_pt(data), re.sub(r'\D', '', processo), nome.upper(),
+                 codigo, procedimento, gravado_em, origem]
+                for data, processo, nome, codigo, procedimento in valores]
+    sufixo = (gravado_em, origem) if tipo == "honorarios" else (origem,)
+    if isinstance(registos, Lote):
+        return registos.linhas(campos, *sufixo)
+    return [[*(r[c] for c in campos), *sufixo] for r in registos]
+
+
+def deduplicar_exames(linhas, chaves_existentes):
+    """Remove (data, processo) já vistos, como a página 03; actualiza o set."""
+    novas = []
+    for linha in linhas:
+        chave = f"{linha[0]}_{linha[1]}"
+        if chave not in chaves_existentes:
+            chaves_existentes.add(chave)
+            novas.append(linha)
+    return novas
+
+
+def _coluna(letra, desvio):
+    return chr(ord(letra) + desvio)
+
+
+def obter_folha(sh, tabela):
+    """
+    Aba da tabela, criada com o cabeçalho do layout (a negrito) se ainda não
+    existir. Sem nome de folha no layout (honorarios_ia) é a primeira aba.
+    """
+    import gspread
+
+    aba = espelho.ABAS[tabela]
+    if aba["folha"] is None:
+        return sh.get_worksheet(0)
+    try:
+        return sh.worksheet(aba["folha"])
+    except gspread.exceptions.WorksheetNotFound:
+        ws = sh.add_worksheet(title=aba["folha"], rows=2000, cols=20)
+        col = aba["coluna_inicial"]
+        intervalo = f"{col}1:{_coluna(col, len(aba['cabecalho']) - 1)}1"
+        ws.update(range_name=intervalo, values=[aba["cabecalho"]])
+        ws.format(intervalo, {
+            "textFormat": {"bold": True},
+            "backgroundColor": {"red": 0.122, "green": 0.220, "blue": 0.392},
+        })
+        return ws
+
+
+def chaves_exames(worksheet):
+    """Chaves data_processo já gravadas na aba ExamesEsp (colunas C e D)."""
+    valores = worksheet.get("C2:D")
+    return {f"{r[0]}_{r[1]}" for r in valores if len(r) > 1}
+
+
+def gravar(worksheet, sheet_url, tabela, linhas, utilizador=None, ao_esperar=None):
+    """
+    Acrescenta as linhas a partir da primeira linha livre da coluna inicial
+    da aba, em lotes pela fila partilhada do Sheets, e regista-as no espelho.
+    ``ao_esperar`` é passado à fila (no Streamlit, para mostrar a posição).
+    Devolve a primeira linha escrita.
+    """
+    if not linhas:
+        return None
+    aba = espelho.ABAS[tabela]
+    col = aba["coluna_inicial"]
+    ultima_col = _coluna(col, len(aba["campos"]) - 1)
+    n_col = ord(col) - ord("A") + 1
+
+    fila = obter_fila_sheets()
+    primeira = fila.executar(utilizador, worksheet.col_values, n_col, ao_esperar=ao_esperar)
+    primeira = len(primeira) + 1
+    ultima = primeira + len(linhas) - 1
+    if ultima > worksheet.row_count:
+        fila.executar(utilizador, worksheet.add_rows, ultima - worksheet.row_count + 1000,
+                      ao_esperar=ao_esperar)
+
+    linha_atual = primeira
+    for i in range(0, len(linhas), LOTE):
+        lote = linhas[i:i + LOTE]
+        fila.executar(
+            utilizador, worksheet.update,
+            range_name=f"{col}{linha_atual}:{ultima_col}{linha_atual + len(lote) - 1}",
+            values=lote,
+            value_input_option="USER_ENTERED" if tabela in ENTRADA_UTILIZADOR else "RAW",
+            ao_esperar=ao_esperar,
+        )
+        linha_atual += len(lote)
+    espelho.registar(sheet_url, tabela, linhas)
+    return primeira
@@ -0,0 +1,227 @@
+"""
+Importação em lote pela linha de comandos, sem browser nem Streamlit.
+
+    python -m core.importar PASTA [--tipo auto|honorarios|cirurgias|...]
+                                  [--planilha URL] [--csv PASTA_SAIDA]
+                                  [--saida PASTA_SAIDA --formato csv|xlsx|parquet]
+                                  [--recursivo] [--processos N]
+                                  [--relatorio FICHEIRO.json]
+
+Usa os mesmos parsers das páginas (core.parsers), em paralelo em todos os
+núcleos, e grava as linhas com o layout de cada aba no Google Sheets e/ou
+num ficheiro por aba: CSV (--csv) ou CSV, XLSX e Parquet (--saida, ver
+core.saidas). Sem destino, só faz o parsing e mostra o resumo — útil para
+medir o débito. Os segredos vêm do mesmo secrets.toml
+do Streamlit (ou de HUB_SEGREDOS).
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from core import cobertura, espelho, metricas, processamento, saidas
+from core.importacao import (
+    TABELA_DO_TIPO, chaves_exames, deduplicar_exames, gravar, linhas_para_folha, obter_folha,
+)
+from core.parsers import PARSERS
+from core.parsers.honorarios import grupos_divergentes
+
+TIPOS = ["auto"] + [t for t in PARSERS if t in TABELA_DO_TIPO]
+
+
+def listar_pdfs(pasta, recursivo=False):
+    """PDFs da pasta por ordem de nome (a ordem de gravação é esta)."""
+    padrao = "**/*" if recursivo else "*"
+    return sorted(
+        (p for p in Path(pasta).glob(padrao) if p.is_file() and p.suffix.lower() == ".pdf"),
+        key=lambda p: str(p).lower(),
+    )
+
+
+class DestinoCSV:
+    """Um CSV por aba, com o cabeçalho do layout; acrescenta se já existir."""
+
+    def __init__(self, pasta):
+        self.pasta = Path(pasta)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+
+    def gravar(self, tabela, linhas):
+        caminho = self.pasta / f"{tabela}.csv"
+        novo = not caminho.exists()
+        with open(caminho, "a", newline="", encoding="utf-8") as f:
+            escritor = csv.writer(f)
+            if novo:
+                escritor.writerow(espelho.ABAS[tabela]["cabecalho"])
+            escritor.writerows(linhas)
+
+
+class DestinoPlanilha:
+    """Abas da planilha, abertas uma vez; exames deduplicados como na página 03."""
+
+    def __init__(self, sheet_url, utilizador=None):
+        from core.planilha import abrir_planilha
+
+        self.sheet_url = sheet_url
+        self.utilizador = utilizador
+        self.sh = abrir_planilha(sheet_url)
+        self._folhas = {}
+        self._chaves_exames = None
+
+    def gravar(self, tabela, linhas):
+        if tabela not in self._folhas:
+            self._folhas[tabela] = obter_folha(self.sh, tabela)
+        ws = self._folhas[tabela]
+        if tabela == "exames_esp":
+            if self._chaves_exames is None:
+                self._chaves_exames = chaves_exames(ws)
+            linhas = deduplicar_exames(linhas, self._chaves_exames)
+        gravar(ws, self.sheet_url, tabela, linhas, self.utilizador)
+        return len(linhas)
+
+
+def gravar_resultado(res, destinos, gravado_em):
+    """
+    Grava o resultado de um PDF (de processar_ficheiro) em cada destino.
+    Devolve (tabela, linhas gravadas na planilha ou None sem planilha).
+    """
+    tabela = TABELA_DO_TIPO[res["tipo"]]
+    linhas = linhas_para_folha(res["tipo"], res["registos"], Path(res["nome"]).name, gravado_em)
+    gravados = None
+    for destino in destinos:
+        n = destino.gravar(tabela, linhas)
+        if isinstance(destino, DestinoPlanilha):
+            gravados = n
+    return tabela, gravados
+
+
+def importar(pdfs, tipo, destinos, saida=sys.stdout):
+    """Processa os PDFs e grava-os por ordem em cada destino. Devolve o resumo."""
+    t0 = time.perf_counter()
+    gravado_em = datetime.now().strftime("%d-%m-%Y %H:%M")
+
+    def ao_concluir(concluidos, total, resultado):
+        estado = resultado["erro"] or f"{len(resultado['registos'])} registos"
+        divergentes = grupos_divergentes(resultado.get("verificacao"))
+        if divergentes:
+            estado += f" — não confere com o sumário da pág. 1 ({', '.join(divergentes)})"
+        if resultado.get("falhas"):
+            estado += f" — página(s) com erro, não lida(s): {', '.join(map(str, sorted(resultado['falhas'])))}"
+        print(f"  [{concluidos}/{total}] {resultado['nome']} ({resultado['tipo']}): {estado}",
+              file=saida)
+
+    # Com planilha, os PDFs já gravados nela (ou repetidos) não são lidos (core.cobertura)
+    planilha = next((d for d in destinos if isinstance(d, DestinoPlanilha)), None)
+    indice = cobertura.Indice(planilha.sheet_url) if planilha else None
+    hashes = [cobertura.hash_ficheiro(p) for p in pdfs]
+    recusados = cobertura.recusar_duplicados(hashes, indice)
+    a_ler = [i for i in range(len(pdfs)) if i not in recusados]
+    for i, motivo in recusados.items():
+        print(f"  {pdfs[i]}: não lido — {motivo}", file=saida)
+
+    lidos = dict(zip(a_ler, processamento.processar_lote(
+        tipo, [(str(pdfs[i]), str(pdfs[i])) for i in a_ler], ao_concluir,
+    )))
+    t_parsing = time.perf_counter() - t0
+
+    resumo = {"ficheiros": len(pdfs), "erros": 0, "ignorados": len(recusados), "paginas": 0,
+              "registos": 0, "gravados": {}, "por_tipo": {}}
+    for i, res in sorted(lidos.items()):
+        if res["erro"]:
+            resumo["erros"] += 1
+            continue
+        if res.get("ignorado"):
+            resumo["ignorados"] += 1
+            continue
+        resumo["paginas"] += res["paginas"]
+        resumo["registos"] += len(res["registos"])
+        resumo["por_tipo"][res["tipo"]] = resumo["por_tipo"].get(res["tipo"], 0) + 1
+
+        tabela, n = gravar_resultado(res, destinos, gravado_em)
+        if n is not None:
+            resumo["gravados"][tabela] = resumo["gravados"].get(tabela, 0) + n
+            cobertura.registar(planilha.sheet_url, tabela, {**res, "hash": hashes[i]})
+
+    resumo["segundos_parsing"] = t_parsing
+    resumo["segundos"] = time.perf_counter() - t0
+    return resumo
+
+
+def imprimir_resumo(resumo, saida=sys.stdout):
+    seg = resumo["segundos"] or 1e-9
+    seg_p = resumo["segundos_parsing"] or 1e-9
+    print("", file=saida)
+    print(f"Ficheiros:  {resumo['ficheiros']} ({resumo['erros']} com erro, "
+          f"{resumo['ignorados']} já importados)", file=saida)
+    for tipo, n in sorted(resumo["por_tipo"].items()):
+        print(f"  {tipo:<14} {n}", file=saida)
+    print(f"Páginas:    {resumo['paginas']}", file=saida)
+    print(f"Registos:   {resumo['registos']}", file=saida)
+    for tabela, n in sorted(resumo["gravados"].items()):
+        print(f"  gravados em {espelho.ABAS[tabela]['folha']}: {n}", file=saida)
+    print(f"Parsing:    {seg_p:.1f} s — {resumo['paginas'] / seg_p:.1f} pág/s, "
+          f"{resumo['registos'] / seg_p:.0f} registos/s", file=saida)
+    print(f"Total:      {seg:.1f} s — {resumo['paginas'] / seg:.1f} pág/s", file=saida)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m core.importar",
+        description="Importa uma pasta de PDFs (sem Streamlit).",
+    )
+    parser.add_argument("pasta", help="Pasta com os PDFs")
+    parser.add_argument("--tipo", choices=TIPOS, default="auto",
+                        help="Tipo de relatório (por omissão detectado pelo cabeçalho)")
+    parser.add_argument("--planilha", help="URL da planilha Google onde gravar")
+    parser.add_argument("--csv", help="Pasta onde gravar um CSV por aba")
+    parser.add_argument("--saida", help="Pasta onde gravar um ficheiro por aba no --formato")
+    parser.add_argument("--formato", choices=list(saidas.SAIDAS), default="csv",
+                        help="Formato dos ficheiros de --saida (por omissão: %(default)s)")
+    parser.add_argument("--utilizador", default="linha-de-comandos",
+                        help="Nome usado na fila partilhada do Sheets")
+    parser.add_argument("--recursivo", action="store_true", help="Incluir subpastas")
+    parser.add_argument("--processos", type=int, default=processamento.NUM_PROCESSOS,
+                        help="Processos de parsing (por omissão: %(default)s)")
+    parser.add_argument("--relatorio", help="Gravar os tempos por etapa e contadores neste JSON")
+    args = parser.parse_args(argv)
+
+    pdfs = listar_pdfs(args.pasta, args.recursivo)
+    if not pdfs:
+        print(f"Nenhum PDF em {args.pasta}", file=sys.stderr)
+        return 1
+
+    processamento.NUM_PROCESSOS = max(1, args.processos)
+    destinos = []
+    if args.csv:
+        destinos.append(DestinoCSV(args.csv))
+    exportacao = saidas.Exportacao(args.saida, args.formato) if args.saida else None
+    if exportacao:
+        destinos.append(exportacao)
+    if args.planilha:
+        destinos.append(DestinoPlanilha(args.planilha, args.utilizador))
+
+    print(f"{len(pdfs)} PDF(s), {processamento.NUM_PROCESSOS} processos")
+    with metricas.medir() as medicao:
+        try:
+            resumo = importar(pdfs, args.tipo, destinos)
+        finally:
+            if exportacao:
+                exportacao.fechar()
+    imprimir_resumo(resumo)
+    if exportacao:
+        for caminho in exportacao.ficheiros.values():
+            print(f"Ficheiro:   {caminho}")
+
+    rel = metricas.relatorio("importar", medicao, resumo=resumo)
+    etapas = ", ".join(f"{nome} {e['segundos']:.1f} s" for nome, e in list(rel["etapas"].items())[:5])
+    print(f"Etapas:     {etapas}  (soma dos processos)")
+    if args.relatorio:
+        Path(args.relatorio).write_text(json.dumps(rel, ensure_ascii=False, indent=1), encoding="utf-8")
+        print(f"Relatório:  {args.relatorio}")
+    return 1 if resumo["erros"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Índice em memória de doentes (processo e nome) sobre todas as abas do espelho.
+
+O índice é construído uma vez por planilha e actualizado incrementalmente:
+em cada pesquisa lê do espelho apenas os registos com id acima da última
+marca de cada aba, por isso as importações feitas noutras páginas (ou
+noutras sessões) aparecem sem reconstruir nada. Só uma substituição
+completa de uma aba (sincronização a partir da folha) obriga a reconstruir.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from core import espelho
+
+# Tipo de evento mostrado na cronologia para cada aba do espelho
+TIPOS = {
+    "consulta":      "Consulta",
+    "anestesiados":  "Anestesia",
+    "exames_esp":    "Exame",
+    "pagos":         "Pagamento",
+    "honorarios_ia": "Pagamento (IA)",
+}
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e com espaços simples: "JOSÉ  Conceição" → "jose conceicao"."""
+    s = unicodedata.normalize("NFKD", str(texto or ""))
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', s).strip().casefold()
+
+
+def _descricao(tabela, r):
+    if tabela == "anestesiados":
+        partes = [r.get("procedimentos"), r.get("urgencia")]
+    elif tabela == "exames_esp":
+        partes = [r.get("codigo"), r.get("procedimento")]
+    elif tabela == "pagos":
+        partes = [r.get("procedimento"), r.get("entidade")]
+    else:
+        partes = []
+    return " — ".join(p for p in partes if p)
+
+
+class IndiceDoentes:
+    """Índice de prefixos (processo e nome normalizado) + cronologia por processo."""
+
+    def __init__(self, sheet_url):
+        self.sheet_url = sheet_url
+        self._lock = threading.Lock()
+        self._limpar()
+
+    def _limpar(self):
+        self._marcas = {t: 0 for t in TIPOS}
+        self._geracoes = None
+        self._eventos = defaultdict(list)   # processo → [evento, ...]
+        self._nomes = {}                     # processo → nome mais recente
+        self._chaves = []                    # [(chave_normalizada, processo)], ordenada
+
+    # ── Actualização ──────────────────────────────────────────────────────────
+
+    def atualizar(self):
+        """Lê do espelho só o que entrou desde a última chamada. Devolve nº de registos novos."""
+        with self._lock:
+            geracoes = espelho.geracoes(self.sheet_url)
+            if self._geracoes is not None and geracoes != self._geracoes:
+                self._limpar()
+            self._geracoes = geracoes
+
+            novas_chaves = []
+            total = 0
+            for tabela in TIPOS:
+                for r in espelho.novos_registos(self.sheet_url, tabela, self._marcas[tabela]):
+                    self._marcas[tabela] = r["id"]
+                    processo = re.sub(r'\D', '', r.get("processo") or "")
+                    if not processo:
+                        continue
+                    total += 1
+                    if processo not in self._eventos:
+                        novas_chaves.append((processo, processo))
+                    self._eventos[processo].append({
+                        "data_iso":  r.get("data_iso") or "",
+                        "data":      r.get("data") or "",
+                        "tipo":      TIPOS[tabela],
+                        "descricao": _descricao(tabela, r),
+                        "valor":     r.get("valor_num"),
+                        "origem":    r.get("origem") or "",
+                    })
+                    nome = (r.get("nome") or "").strip()
+                    if nome and self._nomes.get(processo) != nome:
+                        self._nomes[processo] = nome
+                        novas_chaves.extend(
+                            (sufixo, processo) for sufixo in self._sufixos_nome(nome)
+                        )
+
+            if novas_chaves:
+                if len(novas_chaves) > 64:
+                    self._chaves.extend(novas_chaves)
+                    self._chaves.sort()
+                else:
+                    for chave in novas_chaves:
+                        bisect.insort(self._chaves, chave)
+            return total
+
+    @staticmethod
+    def _sufixos_nome(nome):
+        """Nome a partir de cada palavra, para que "silva" encontre "MARIA SILVA"."""
+        palavras = normalizar(nome).split(" ")
+        return [" ".join(palavras[i:]) for i in range(len(palavras))]
+
+    # ── Consulta ──────────────────────────────────────────────────────────────
+
+    def procurar(self, termo, limite=20):
+        """Doentes cujo processo ou nome (qualquer palavra) começa por termo: [(processo, nome)]."""
+        chave = normalizar(termo)
+        if not chave:
+            return []
+        with self._lock:
+            encontrados = []
+            i = bisect.bisect_left(self._chaves, (chave, ""))
+            while i < len(self._chaves) and len(encontrados) < limite:
+                k, processo = self._chaves[i]
+                if not k.startswith(chave):
+                    break
+                if processo not in encontrados:
+                    encontrados.append(processo)
+                i += 1
+            return [(p, self._nomes.get(p, "")) for p in encontrados]
+
+    def cronologia(self, processo):
+        """Todos os eventos do doente (consultas, anestesias, exames, pagamentos) por data."""
+        with self._lock:
+            eventos = list(self._eventos.get(str(processo), []))
+        return sorted(eventos, key=lambda e: e["data_iso"])
+
+    def __len__(self):
+        return len(self._eventos)
@@ -0,0 +1,206 @@
+"""
+Tempos por etapa e contadores de uma corrida (importação, tarefa, linha de
+comandos), para saber onde foi o tempo quando uma corrida é lenta.
+
+    with metricas.medir() as m:
+        with metricas.etapa("extract_text"):
+            ...
+        metricas.contar("registos", 120)
+    rel = metricas.relatorio("02_cirurgias", m)
+
+A medição activa é guardada num ContextVar: as funções instrumentadas
+(parsers, filas do Gemini/Sheets) não recebem nada e não fazem nada quando
+não há medição activa, por isso podem ser chamadas de qualquer lado. Cada
+etapa guarda o número de vezes, o total e o máximo — nos parsers uma vez
+por página, o que dá o tempo por página e por ficheiro. O trabalho feito
+nos processos de parsing volta com o resultado ("metricas") e é somado à
+corrida em processar_lote.
+
+Os relatórios são JSON, ficam em dados/relatorios/ e podem ser
+descarregados na página, para comparar entre versões.
+"""
+import contextvars
+import functools
+import json
+import subprocess
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from core.caminhos import pasta_dados
+
+_atual = contextvars.ContextVar("medicao", default=None)
+
+
+class Medicao:
+    """Etapas (n, segundos, máximo) e contadores; pode ser partilhada entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.id = uuid.uuid4().hex[:8]
+        self.inicio = datetime.now()
+        self._t0 = time.perf_counter()
+        self.etapas = {}        # nome -> [n, segundos, máximo]
+        self.contadores = {}    # nome -> número
+        self.ficheiros = []     # resumo por ficheiro (registar_ficheiro)
+
+    def somar(self, nome, segundos):
+        with self._lock:
+            e = self.etapas.setdefault(nome, [0, 0.0, 0.0])
+            e[0] += 1
+            e[1] += segundos
+            e[2] = max(e[2], segundos)
+
+    def contar(self, nome, n=1):
+        with self._lock:
+            self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+    def juntar(self, dados):
+        """Soma uma medição serializada (como_dict) de outro processo."""
+        for nome, e in (dados or {}).get("etapas", {}).items():
+            with self._lock:
+                atual = self.etapas.setdefault(nome, [0, 0.0, 0.0])
+                atual[0] += e["n"]
+                atual[1] += e["segundos"]
+                atual[2] = max(atual[2], e["max_s"])
+        for nome, n in (dados or {}).get("contadores", {}).items():
+            self.contar(nome, n)
+
+    def vazia(self):
+        return not self.etapas and not self.contadores
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                "etapas": {
+                    nome: {"n": n, "segundos": round(s, 4), "max_s": round(m, 4)}
+                    for nome, (n, s, m) in sorted(self.etapas.items(), key=lambda x: -x[1][1])
+                },
+                "contadores": dict(sorted(self.contadores.items())),
+            }
+
+
+@contextmanager
+def medir(medicao=None):
+    """Activa uma medição (nova, se não for dada) para o código dentro do bloco."""
+    medicao = medicao or Medicao()
+    token = _atual.set(medicao)
+    try:
+        yield medicao
+    finally:
+        _atual.reset(token)
+
+
+def atual():
+    return _atual.get()
+
+
+@contextmanager
+def etapa(nome):
+    """Soma o tempo do bloco à etapa ``nome`` da medição activa (se houver)."""
+    medicao = _atual.get()
+    if medicao is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.somar(nome, time.perf_counter() - t0)
+
+
+def contar(nome, n=1):
+    medicao = _atual.get()
+    if medicao is not None:
+        medicao.contar(nome, n)
+
+
+@contextmanager
+def abrir_pdf(fonte):
+    """
+    pdfplumber.open com o tempo contado na etapa "pdfplumber.open". ``fonte``
+    são os bytes do PDF ou o caminho do ficheiro (lido por mmap, ver
+    core.uploads.abrir_fonte).
+    """
+    import pdfplumber
+
+    from core.uploads import abrir_fonte
+
+    with abrir_fonte(fonte) as fluxo:
+        with etapa("pdfplumber.open"):
+            pdf = pdfplumber.open(fluxo)
+        with pdf:
+            yield pdf
+
+
+def registar_ficheiro(resultado):
+    """Junta à medição activa o resultado de processar_ficheiro (vindo de um processo de trabalho)."""
+    medicao = _atual.get()
+    if medicao is None:
+        return
+    dados = resultado.get("metricas") or {}
+    medicao.juntar(dados)
+    with medicao._lock:
+        medicao.ficheiros.append({
+            "nome":     resultado.get("nome"),
+            "tipo":     resultado.get("tipo"),
+            "paginas":  resultado.get("paginas", 0),
+            "registos": len(resultado.get("registos") or []),
+            "segundos": round(resultado.get("segundos", 0.0), 4),
+            "erro":     resultado.get("erro"),
+            **dados,
+        })
+
+
+# ─── Relatório da corrida ─────────────────────────────────────────────────────
+
+@functools.lru_cache(maxsize=1)
+def versao():
+    """Commit actual (git), para comparar relatórios entre versões; None fora de um repositório."""
+    try:
+        saida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, timeout=2,
+        )
+        return saida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def relatorio(origem, medicao, **extra):
+    """Relatório JSON-serializável da medição: totais, por etapa e por ficheiro."""
+    return {
+        "id":        medicao.id,
+        "origem":    origem,
+        "versao":    versao(),
+        "inicio":    medicao.inicio.isoformat(timespec="seconds"),
+        "segundos":  round(time.perf_counter() - medicao._t0, 3),
+        **medicao.como_dict(),
+        "ficheiros": list(medicao.ficheiros),
+        **extra,
+    }
+
+
+def gravar(rel):
+    """Grava o relatório em dados/relatorios/ (o mesmo ficheiro para a mesma medição)."""
+    nome = f"{rel['inicio'].replace(':', '')}_{rel['origem']}_{rel['id']}.json"
+    caminho = pasta_dados("relatorios") / nome
+    caminho.write_text(json.dumps(rel, ensure_ascii=False, indent=1), encoding="utf-8")
+    return caminho
+
+
+def linhas_etapas(rel):
+    """Linhas para uma tabela: etapa, vezes, total, média e máximo (ms)."""
+    return [
+        {
+            "Etapa": nome,
+            "Vezes": e["n"],
+            "Total (s)": round(e["segundos"], 3),
+            "Média (ms)": round(1000 * e["segundos"] / e["n"], 1) if e["n"] else 0.0,
+            "Máx. (ms)": round(1000 * e["max_s"], 1),
+        }
+        for nome, e in rel["etapas"].items()
+    ]
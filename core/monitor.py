@@ -0,0 +1,226 @@
+"""
+Métricas do processo da aplicação, expostas em HTTP no formato de texto do
+Prometheus, para acompanhar ao longo de semanas o débito (páginas lidas,
+linhas gravadas), a latência do Gemini e do Sheets, os 429 e a cache.
+
+Ao contrário de core.metricas (uma medição por corrida, em JSON), aqui os
+valores somam-se desde o arranque do processo e valem para todos os
+utilizadores:
+
+    monitor.contar("hub_linhas_gravadas_total", 120, tabela="pagos")
+    monitor.observar("hub_api_segundos", 0.8, api="gemini")
+    monitor.iniciar()                     # http://127.0.0.1:9464/metrics
+
+Os percentis saem dos histogramas no Prometheus, p.ex.
+``histogram_quantile(0.95, rate(hub_api_segundos_bucket{api="gemini"}[5m]))``.
+
+Configuração opcional nos segredos (ou HUB_MONITOR_PORTA no ambiente; a
+porta 0 desliga o endpoint):
+
+    [monitor]
+    porta = 9464
+    endereco = "127.0.0.1"
+"""
+import logging
+import os
+import threading
+
+from core import segredos
+
+log = logging.getLogger(__name__)
+
+PORTA = 9464
+ENDERECO = "127.0.0.1"
+
+# Limites (segundos) dos histogramas
+BALDES_API = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+BALDES_FICHEIRO = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120)
+
+# Nome → (tipo, descrição, baldes do histograma)
+METRICAS = {
+    "hub_ficheiros_total":          ("counter",   "PDFs processados pelos parsers, por tipo e resultado (ok, erro, ignorado).", None),
+    "hub_paginas_total":            ("counter",   "Páginas dos PDFs processados, por tipo.", None),
+    "hub_paginas_com_erro_total":   ("counter",   "Páginas que não foi possível ler, por tipo.", None),
+    "hub_registos_total":           ("counter",   "Registos extraídos pelos parsers, por tipo.", None),
+    "hub_pdf_bytes_total":          ("counter",   "Bytes de PDF processados, por tipo.", None),
+    "hub_parser_segundos":          ("histogram", "Duração do parsing de um PDF, por tipo.", BALDES_FICHEIRO),
+    "hub_api_chamadas_total":       ("counter",   "Chamadas às APIs pelas filas partilhadas (gemini, sheets).", None),
+    "hub_api_erros_total":          ("counter",   "Chamadas às APIs que falharam.", None),
+    "hub_api_erros_429_total":      ("counter",   "Chamadas recusadas por quota (429).", None),
+    "hub_api_segundos":             ("histogram", "Duração das chamadas às APIs.", BALDES_API),
+    "hub_api_espera_fila_segundos": ("histogram", "Espera na fila partilhada antes da chamada.", BALDES_API),
+    "hub_fila_unidades":            ("gauge",     "Unidades à espera na fila partilhada.", None),
+    "hub_fila_ativas":              ("gauge",     "Chamadas em curso na fila partilhada.", None),
+    "hub_ia_paginas_total":         ("counter",   "Páginas pedidas ao Gemini, por estado da resposta.", None),
+    "hub_linhas_gravadas_total":    ("counter",   "Linhas gravadas na planilha, por aba.", None),
+    "hub_cache_total":              ("counter",   "Consultas às caches, por cache e resultado (acerto, falha).", None),
+}
+
+_lock = threading.Lock()
+_contadores = {}        # (nome, etiquetas) -> valor
+_histogramas = {}       # (nome, etiquetas) -> [contagem por balde..., soma, contagem]
+_coletores = []         # funções chamadas ao exportar: [(nome, etiquetas, valor), ...]
+_servidor = None
+
+
+def _etiquetas(etiquetas):
+    return tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+# ─── Registo ──────────────────────────────────────────────────────────────────
+
+def contar(nome, n=1, **etiquetas):
+    """Soma ``n`` ao contador ``nome`` com as etiquetas dadas."""
+    if not n:
+        return
+    chave = (nome, _etiquetas(etiquetas))
+    with _lock:
+        _contadores[chave] = _contadores.get(chave, 0) + n
+
+
+def observar(nome, valor, **etiquetas):
+    """Junta uma observação (segundos) ao histograma ``nome``."""
+    baldes = METRICAS[nome][2]
+    chave = (nome, _etiquetas(etiquetas))
+    with _lock:
+        h = _histogramas.get(chave)
+        if h is None:
+            h = _histogramas[chave] = [0] * (len(baldes) + 2)
+        for i, limite in enumerate(baldes):
+            if valor <= limite:
+                h[i] += 1
+        h[-2] += valor
+        h[-1] += 1
+
+
+def coletor(funcao):
+    """Regista funcao() -> [(nome, etiquetas, valor), ...], chamada a cada exportação (gauges)."""
+    with _lock:
+        _coletores.append(funcao)
+    return funcao
+
+
+def registar_ficheiro(resultado):
+    """Soma o resultado de processar_ficheiro (páginas, registos, tempo) aos contadores do processo."""
+    tipo = resultado.get("tipo") or "?"
+    estado = "erro" if resultado.get("erro") else "ignorado" if resultado.get("ignorado") else "ok"
+    contar("hub_ficheiros_total", tipo=tipo, resultado=estado)
+    contar("hub_paginas_total", resultado.get("paginas", 0), tipo=tipo)
+    contar("hub_paginas_com_erro_total", len(resultado.get("falhas") or ()), tipo=tipo)
+    contar("hub_registos_total", len(resultado.get("registos") or ()), tipo=tipo)
+    contadores = (resultado.get("metricas") or {}).get("contadores") or {}
+    contar("hub_pdf_bytes_total", contadores.get("bytes", 0), tipo=tipo)
+    if estado != "ignorado":
+        observar("hub_parser_segundos", resultado.get("segundos", 0.0), tipo=tipo)
+
+
+# ─── Formato de texto do Prometheus ───────────────────────────────────────────
+
+def _escapar(valor):
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exportar():
+    """Texto de todas as métricas no formato de exposição do Prometheus (0.0.4)."""
+    amostras = []
+    for funcao in list(_coletores):
+        try:
+            amostras += funcao()
+        except Exception as e:
+            log.warning("Coletor de métricas falhou: %s", e)
+
+    with _lock:
+        contadores = dict(_contadores)
+        histogramas = {k: list(v) for k, v in _histogramas.items()}
+    for nome, etiquetas, valor in amostras:
+        contadores[(nome, _etiquetas(etiquetas))] = valor
+
+    linhas = []
+    for nome, (tipo, ajuda, baldes) in METRICAS.items():
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        if tipo != "histogram":
+            for (n, etiquetas), valor in sorted(contadores.items()):
+                if n == nome:
+                    linhas.append(f"{nome}{_formatar_etiquetas(etiquetas)} {_numero(valor)}")
+            continue
+        for (n, etiquetas), h in sorted(histogramas.items()):
+            if n != nome:
+                continue
+            for limite, quantos in zip(baldes, h):
+                linhas.append(f"{nome}_bucket{_formatar_etiquetas(etiquetas, [('le', str(limite))])} {quantos}")
+            linhas.append(f"{nome}_bucket{_formatar_etiquetas(etiquetas, [('le', '+Inf')])} {h[-1]}")
+            linhas.append(f"{nome}_sum{_formatar_etiquetas(etiquetas)} {_numero(h[-2])}")
+            linhas.append(f"{nome}_count{_formatar_etiquetas(etiquetas)} {h[-1]}")
+    return "\n".join(linhas) + "\n"
+
+
+# ─── Endpoint HTTP ────────────────────────────────────────────────────────────
+
+def _classe_pedido():
+    # http.server só é importado ao arrancar o endpoint: este módulo é
+    # importado pelo espelho e pelas filas, logo por quase todas as páginas
+    from http.server import BaseHTTPRequestHandler
+
+    class Pedido(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            corpo = exportar().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Pedido
+
+
+def _configuracao():
+    config = segredos.obter("monitor", {}) or {}
+    porta = os.environ.get("HUB_MONITOR_PORTA") or config.get("porta", PORTA)
+    return config.get("endereco", ENDERECO), int(porta)
+
+
+def iniciar():
+    """
+    Arranca (uma vez por processo) o servidor HTTP das métricas numa thread
+    de fundo. Devolve (endereço, porta), ou None se está desligado ou a
+    porta está ocupada (p.ex. por outro processo da aplicação) — as
+    métricas continuam a ser contadas, só não são expostas.
+    """
+    global _servidor
+    with _lock:
+        if _servidor is None:
+            endereco, porta = _configuracao()
+            if not porta:
+                _servidor = False
+                return None
+            from http.server import ThreadingHTTPServer
+
+            try:
+                _servidor = ThreadingHTTPServer((endereco, porta), _classe_pedido())
+            except OSError as e:
+                log.warning("Endpoint de métricas indisponível em %s:%s: %s", endereco, porta, e)
+                _servidor = False
+                return None
+            _servidor.daemon_threads = True
+            threading.Thread(
+                target=_servidor.serve_forever, name="monitor-http", daemon=True
+            ).start()
+        return _servidor.server_address[:2] if _servidor else None
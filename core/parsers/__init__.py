@@ -0,0 +1,23 @@
+"""
+Parsers de PDF partilhados pelas páginas de importação.
+
+Cada tipo de relatório tem uma função ``processar_pdf(pdf_bytes, ...)`` que
+devolve ``{"registos", "paginas", "amostra", "estados", "falhas"}`` — o
+estado de cada página e o erro das que falharam (comum.EstadoPaginas).
+Estão aqui (e não nas páginas) para poderem correr em processos de
+trabalho, fora do Streamlit.
+"""
+from core.parsers import cirurgias, consultas, exames, honorarios, texto
+
+# Tipo de relatório → função de processamento de um PDF. Cirurgias e
+# consultas têm um só parser por família, para todos os prefixos (HCIS, CCC,
+# CCO); as chaves "_ccc" ficam como sinónimos para a linha de comandos.
+PARSERS = {
+    "honorarios":    honorarios.processar_pdf,
+    "cirurgias":     cirurgias.processar_pdf,
+    "cirurgias_ccc": cirurgias.processar_pdf,
+    "exames":        exames.processar_pdf,
+    "consultas":     consultas.processar_pdf,
+    "consultas_ccc": consultas.processar_pdf,
+    "texto":         texto.processar_pdf,
+}
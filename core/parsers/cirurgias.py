@@ -0,0 +1,175 @@
+"""
+Parser do relatório GHRO4045R — Cirurgias por Interveniente (páginas 02 e 06).
+
+O layout é o mesmo em todos os hospitais; só muda o prefixo do processo
+(HCIS/…, CCC/…, CCO/…), que é reconhecido em cada registo. Como no antigo
+parser do CCC, a data é procurada em toda a linha e não só no início (há
+exportações com um nº de ordem antes dela). Um PDF com processos de vários
+hospitais é lido numa só passagem.
+"""
+import re
+
+from core.metricas import abrir_pdf, etapa
+from core.registos import Lote
+from core.parsers.comum import (
+    PREFIXOS, EstadoPaginas, agrupar_linhas, palavras_ate, re_prefixo,
+)
+
+# ─── Constantes de parsing ────────────────────────────────────────────────────
+PROC_MIN_X = 290
+PROC_MAX_X = 480
+DOC_MAX_X  = 290
+
+# Campos de cada registo; os de poucos valores distintos ficam partilhados no Lote
+CAMPOS       = ("data", "processo", "doente", "procedimentos", "urgencia")
+PARTILHADOS  = ("data", "procedimentos", "urgencia")
+
+# Modelo da página: colunas usadas até PROC_MAX_X; a 1ª página é o resumo
+LIMITE_X        = PROC_MAX_X
+PAGINAS_RESUMO  = 1
+
+
+# ─── Funções de parsing PDF ───────────────────────────────────────────────────
+
+def cluster_rows(words, gap=6):
+    return [(int(c[0]['top']), c) for c in agrupar_linhas(words, gap)]
+
+
+def left_text(ws):
+    return " ".join(
+        w['text'] for w in sorted(ws, key=lambda x: x['x0'])
+        if w['x0'] < DOC_MAX_X
+    )
+
+
+def proc_text(ws):
+    return " ".join(
+        w['text'] for w in sorted(ws, key=lambda x: x['x0'])
+        if PROC_MIN_X <= w['x0'] < PROC_MAX_X
+    )
+
+
+def min_left_x(ws):
+    lws = [w for w in ws if w['x0'] < DOC_MAX_X]
+    return min(w['x0'] for w in lws) if lws else 0
+
+
+def parse_pagina(words, prefixos=PREFIXOS):
+    """Registos de uma página (palavras de extract_words), de qualquer dos prefixos."""
+    pref = re_prefixo(prefixos)
+    records = []
+    row_clusters = cluster_rows(words, gap=6)
+
+    date_re = re.compile(r'(\d{4}-\d{2}-\d{2})')
+    gr_re   = re.compile(r'Gr\.\s*de\s*urg', re.I)
+    resp_re = re.compile(r'Responsável:', re.I)
+
+    row_data = [
+        (top, left_text(ws), proc_text(ws), ws)
+        for top, ws in row_clusters
+    ]
+
+    rec_starts = [
+        i for i, (top, l, p, ws) in enumerate(row_data)
+        if date_re.search(l) and re.search(pref, l, re.I)
+    ]
+
+    for idx, start in enumerate(rec_starts):
+        end = rec_starts[idx + 1] if idx + 1 < len(rec_starts) else len(row_data)
+        block = row_data[start:end]
+
+        _, first_left, first_proc, _ = block[0]
+
+        dm = date_re.search(first_left)
+        date_raw = dm.group(1) if dm else ""
+        pts = date_raw.split('-')
+        date_fmt = f"{pts[2]}-{pts[1]}-{pts[0]}" if len(pts) == 3 else date_raw
+
+        pm = re.search(pref + r'\s*/\s*(\d+)', first_left)
+        proc_num = pm.group(1) if pm else ""
+
+        nm = re.search(pref + r'\s*/\s*\d+\s*-\s*(.+)', first_left)
+        name_acc = [nm.group(1).strip()] if nm else []
+
+        urgency = ""
+        proc_lines = [first_proc] if first_proc.strip() else []
+        in_resp = False
+
+        for top_row, left, right, row_ws in block[1:]:
+            if gr_re.search(left):
+                ug = re.search(r'urgência\s*:\s*(\w+)', left, re.I)
+                if ug:
+                    urgency = ug.group(1)
+                in_resp = True
+                if right.strip():
+                    proc_lines.append(right)
+                continue
+            if resp_re.search(left):
+                in_resp = True
+                if right.strip():
+                    proc_lines.append(right)
+                continue
+            if in_resp:
+                mx = min_left_x(row_ws)
+                if mx > 145:
+                    if right.strip():
+                        proc_lines.append(right)
+                    continue
+                else:
+                    in_resp = False
+            if left.strip() and not re.search(r'\d{2}:\d{2}', left):
+                name_acc.append(left.strip())
+            if right.strip():
+                proc_lines.append(right)
+
+        full_name = re.sub(r'\s+', ' ', " ".join(name_acc)).strip()
+
+        proc_raw = " ".join(proc_lines)
+        proc_raw = re.sub(r'\b\d+\b', '', proc_raw)
+        proc_raw = re.sub(r'\s+', ' ', proc_raw).strip()
+
+        proc_items = re.findall(
+            r'-([A-ZÁÉÍÓÚÀÃÕÂÊÔÇÜ][^-]+?)(?=\s*-[A-ZÁÉÍÓÚÀÃÕÂÊÔÇÜ]|$)',
+            proc_raw
+        )
+        procedures = []
+        for p in proc_items:
+            p = re.sub(r'\s+', ' ', p).strip().strip(',').strip(' )')
+            if p and len(p) > 2 and not re.fullmatch(r'[\s/\(\)\.\)]+', p):
+                procedures.append(p)
+
+        records.append({
+            "data":          date_fmt,
+            "processo":      proc_num,
+            "doente":        full_name,
+            "procedimentos": " | ".join(procedures),
+            "urgencia":      urgency,
+        })
+
+    return records
+
+
+def parse_cirurgias_pdf(pdf_bytes, prefixos=PREFIXOS):
+    """Extrai as cirurgias do PDF (sem as PAGINAS_RESUMO iniciais)."""
+    return processar_pdf(pdf_bytes, prefixos)["registos"]
+
+
+def processar_pdf(pdf_bytes, prefixos=PREFIXOS):
+    """
+    Devolve {"registos" (Lote), "paginas", "amostra", "estados", "falhas"}
+    para um PDF GHRO4045R.
+    """
+    records = Lote(CAMPOS, PARTILHADOS)
+    with abrir_pdf(pdf_bytes) as pdf:
+        total_pags = len(pdf.pages)
+        paginas = EstadoPaginas(total_pags)
+        for i in range(PAGINAS_RESUMO, total_pags):
+            page = pdf.pages[i]
+            with paginas.ler(i):
+                with etapa("extract_words"):
+                    words = palavras_ate(page, LIMITE_X)
+                with etapa("regex"):
+                    novos = parse_pagina(words, prefixos)
+                records.estender(novos)
+                paginas.lida(i, len(novos))
+    return {"registos": records, "paginas": total_pags, "amostra": "", **paginas.como_dict()}
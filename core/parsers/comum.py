@@ -0,0 +1,136 @@
+"""
+Peças partilhadas pelos parsers por coordenadas (cirurgias e consultas).
+
+O prefixo do nº de processo identifica a instituição (HCIS, CCC, CCO) e é
+reconhecido registo a registo, por isso um PDF com processos de vários
+hospitais é lido numa só passagem. Um hospital novo é só mais uma entrada
+em PREFIXOS.
+
+Cada modelo de página define até onde (x) ficam as colunas que o parser
+usa; palavras_ate só agrupa em palavras os caracteres dessa faixa, e
+palavras_iniciadas_ate as palavras que nela começam, sem as cortar.
+
+Todos os parsers lêem cada página dentro de EstadoPaginas.ler: uma página
+mal formada fica registada com o erro e o resto do PDF é lido.
+"""
+import re
+from contextlib import contextmanager
+
+from core import metricas
+
+PREFIXOS = ("HCIS", "CCC", "CCO")
+
+
+def re_prefixo(prefixos=PREFIXOS):
+    """Alternativa de regex (sem grupo de captura) para os prefixos dados."""
+    return "(?:" + "|".join(re.escape(p) for p in prefixos) + ")"
+
+
+def agrupar_linhas(words, gap):
+    """Agrupa palavras (extract_words) em linhas por proximidade vertical."""
+    if not words:
+        return []
+    sw = sorted(words, key=lambda w: w['top'])
+    clusters = [[sw[0]]]
+    for w in sw[1:]:
+        if w['top'] - clusters[-1][-1]['top'] <= gap:
+            clusters[-1].append(w)
+        else:
+            clusters.append([w])
+    return clusters
+
+
+# ─── Recorte por colunas ──────────────────────────────────────────────────────
+
+OPCOES_PALAVRAS = {"keep_blank_chars": False, "x_tolerance": 3, "y_tolerance": 3}
+
+
+def palavras_ate(page, limite_x, verificar=True):
+    """
+    extract_words só com os caracteres que começam à esquerda de
+    ``limite_x`` (o recorte do modelo): as colunas da direita, que o parser
+    não usa, não passam pelo agrupamento em palavras. Com ``verificar``, se
+    alguma palavra chega ao limite (podia continuar do outro lado) a página
+    é lida inteira, para o parser ver as mesmas palavras que sem recorte.
+    """
+    from pdfplumber.utils import extract_words
+
+    chars = page.chars
+    recorte = [c for c in chars if c["x0"] < limite_x]
+    if len(recorte) == len(chars):
+        return extract_words(chars, **OPCOES_PALAVRAS)
+    palavras = extract_words(recorte, **OPCOES_PALAVRAS)
+    if verificar and any(w["x1"] > limite_x - OPCOES_PALAVRAS["x_tolerance"] for w in palavras):
+        metricas.contar("paginas.sem_recorte")
+        return extract_words(chars, **OPCOES_PALAVRAS)
+    return palavras
+
+
+def palavras_iniciadas_ate(page, limite_x):
+    """
+    As palavras que começam à esquerda de ``limite_x``, inteiras: a uma
+    palavra cortada pelo limite (p.ex. um token de data+hora colado)
+    juntam-se os caracteres que a continuam do outro lado. As restantes
+    colunas não passam pelo agrupamento em palavras.
+    """
+    from pdfplumber.utils import extract_words
+
+    tol = OPCOES_PALAVRAS["x_tolerance"]
+    chars = page.chars
+    recorte = [c for c in chars if c["x0"] < limite_x]
+    palavras = extract_words(recorte, **OPCOES_PALAVRAS)
+    cortadas = [w for w in palavras if w["x1"] > limite_x - tol]
+    if not cortadas:
+        return palavras
+    fora = sorted((c for c in chars if c["x0"] >= limite_x), key=lambda c: c["x0"])
+    for w in cortadas:
+        fim = w["x1"]
+        for c in fora:
+            if abs(c["top"] - w["top"]) > OPCOES_PALAVRAS["y_tolerance"]:
+                continue
+            if c["x0"] - fim > tol:
+                break
+            recorte.append(c)
+            fim = max(fim, c["x1"])
+    return [w for w in extract_words(recorte, **OPCOES_PALAVRAS) if w["x0"] < limite_x]
+
+
+# ─── Estado de cada página ────────────────────────────────────────────────────
+
+OK, VAZIA, SALTADA, ERRO_PARSE = "ok", "vazia", "saltada", "erro_parse"
+
+
+class EstadoPaginas:
+    """
+    O que aconteceu a cada página de um PDF (ok, vazia, saltada ou
+    erro_parse) e o erro das que falharam, por nº de página (1, 2, …).
+    """
+
+    def __init__(self, total):
+        self.estados = [VAZIA] * total
+        self.falhas = {}
+
+    @contextmanager
+    def ler(self, i):
+        """
+        Bloco que lê a página de índice ``i``: uma excepção fica registada
+        em falhas e o PDF continua na página seguinte (os registos da
+        página com erro não entram — só os das outras).
+        """
+        try:
+            yield
+        except Exception as e:
+            self.estados[i] = ERRO_PARSE
+            self.falhas[i + 1] = f"{type(e).__name__}: {e}"
+            metricas.contar("paginas.com_erro")
+
+    def lida(self, i, n_registos):
+        self.estados[i] = OK if n_registos else VAZIA
+
+    def saltada(self, i):
+        self.estados[i] = SALTADA
+        metricas.contar("paginas.saltadas")
+
+    def como_dict(self):
+        """{"estados": [estado de cada página], "falhas": {página: erro}} para o resultado do parser."""
+        return {"estados": self.estados, "falhas": self.falhas}
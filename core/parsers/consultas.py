@@ -0,0 +1,218 @@
+"""
+Parser do relatório GHCE4025R — Actos Médicos / consultas (páginas 04 e 08).
+
+Há dois modelos de exportação, que diferem na disposição das colunas:
+"hcis" (token de data+hora colado, processo isolado, nome em x 155..225) e
+"ccc" (data e hora separadas, nome em x 150..400). O modelo é escolhido
+por página e o prefixo do processo (HCIS, CCC, CCO) é reconhecido em cada
+registo, por isso um PDF de vários hospitais é lido numa só passagem.
+
+O modelo é detectado pelas palavras que começam na faixa da data
+(x < BANDA_DATA_X, inteiras mesmo que passem o limite, como o token de
+data+hora colado), que também dizem se a página tem registos (sem datas é
+saltada); depois só se agrupam em palavras as colunas até ao "limite_x"
+do modelo (N.Benef e acto não).
+"""
+import re
+
+from core.metricas import abrir_pdf, etapa
+from core.registos import Lote
+from core.parsers.comum import (
+    PREFIXOS, EstadoPaginas, agrupar_linhas, palavras_ate, palavras_iniciadas_ate,
+    re_prefixo,
+)
+
+# ─── Constantes de layout ─────────────────────────────────────────────────────
+
+# Modelo → coluna do nome (x mínimo, x máximo), fim das colunas usadas
+# (limite_x, antes do N.Benef) e tokens a ignorar no nome (N.Benef colados,
+# códigos alfanuméricos, cabeçalhos de serviço)
+MODELOS = {
+    "hcis": {
+        "nome_x":   (155, 225),
+        "limite_x": 239,
+        "lixo":     re.compile(r'\d{5,}|^[A-Z0-9]{6,}$|Anestesiologi'),
+    },
+    "ccc": {
+        "nome_x":   (150, 400),
+        "limite_x": 415,
+        "lixo":     re.compile(r'\d{5,}|^[A-Z0-9]{6,}$|Anestesiologi|Consultas|Consulta De'),
+    },
+}
+
+# Campos de cada registo (a data repete-se muito: fica partilhada no Lote)
+CAMPOS      = ("data", "processo", "nome")
+PARTILHADOS = ("data",)
+
+# Faixa da data (e hora) à esquerda, antes do nº de processo
+BANDA_DATA_X = 95
+DATA_RE      = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+DATE_TIME_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})\d{2}:\d{2}$')
+# Data e hora (separadas ou não) no texto da linha
+DATE_TIME_CCC_RE = re.compile(r'(\d{4}-\d{2}-\d{2})\s*(\d{2}:\d{2})?')
+INICIAL_RE = re.compile(r'^[A-ZÁÉÍÓÚÀÃÕÂÊÔÇÜ]')
+
+
+# ─── Parser PDF ───────────────────────────────────────────────────────────────
+
+def cluster_rows(words, gap=5):
+    """Agrupa palavras em linhas por proximidade vertical."""
+    return agrupar_linhas(words, gap)
+
+
+def modelo_da_pagina(page):
+    """
+    Modelo da página pela faixa da data, ou None se a página não tem
+    nenhuma data (cabeçalho, resumo, página em branco).
+    """
+    banda = palavras_iniciadas_ate(page, BANDA_DATA_X)
+    if not any(DATA_RE.match(w['text']) for w in banda):
+        return None
+    return detetar_modelo(banda)
+
+
+def detetar_modelo(words):
+    """"hcis" se a página tem o token de data+hora colado, senão "ccc"."""
+    return "hcis" if any(DATE_TIME_RE.match(w['text']) for w in words) else "ccc"
+
+
+def limpar_nome(parts, modelo="hcis"):
+    """Remove tokens de N.Benef que ficam colados na coluna do nome."""
+    lixo = MODELOS[modelo]["lixo"]
+    return ' '.join(p for p in parts if not lixo.search(p)).strip()
+
+
+def _nome_na_linha(row, nome_x):
+    x_min, x_max = nome_x
+    return [
+        w['text'] for w in sorted(row, key=lambda x: x['x0'])
+        if x_min <= w['x0'] <= x_max and INICIAL_RE.match(w['text'])
+    ]
+
+
+def _registo(date_val, proc_val, name_parts, modelo):
+    pts = date_val.split('-')
+    return {
+        "data":     f"{pts[2]}-{pts[1]}-{pts[0]}",
+        "processo": proc_val,
+        "nome":     limpar_nome(name_parts, modelo),
+    }
+
+
+def parse_pagina(words, modelo=None, prefixos=PREFIXOS):
+    """
+    Registos de consulta de uma página. O modelo ("hcis"/"ccc") é detectado
+    pelas palavras da página quando não é dado.
+    """
+    modelo = modelo or detetar_modelo(words)
+    nome_x = MODELOS[modelo]["nome_x"]
+    pref = re_prefixo(prefixos)
+    clusters = cluster_rows(words, gap=5)
+    if modelo == "hcis":
+        return _registos_hcis(clusters, nome_x, re.compile(rf'^{pref}/(\d+)$'))
+    return _registos_ccc(clusters, nome_x, re.compile(rf'{pref}/(\d+)'))
+
+
+def _registos_hcis(clusters, nome_x, proc_re):
+    """Modelo hcis: data+hora e processo são tokens isolados na linha."""
+    records = []
+    i = 0
+    while i < len(clusters):
+        row = clusters[i]
+
+        date_val = None
+        proc_val = None
+        for w in row:
+            dm = DATE_TIME_RE.match(w['text'])
+            if dm:
+                date_val = dm.group(1)
+            pm = proc_re.match(w['text'])
+            if pm:
+                proc_val = pm.group(1)
+
+        if date_val and proc_val:
+            name_parts = _nome_na_linha(row, nome_x)
+            # Recolher continuação do nome nas linhas seguintes
+            j = i + 1
+            while j < len(clusters):
+                next_row = clusters[j]
+                # Parar no próximo registo ou em "Data de nascimento"
+                has_date = any(DATE_TIME_RE.match(w['text']) for w in next_row)
+                has_nasc = any(
+                    w['text'] == 'Data' and w['x0'] < 35 for w in next_row
+                )
+                if has_date or has_nasc:
+                    break
+                name_parts += _nome_na_linha(next_row, nome_x)
+                j += 1
+
+            records.append(_registo(date_val, proc_val, name_parts, "hcis"))
+            i = j
+        else:
+            i += 1
+
+    return records
+
+
+def _registos_ccc(clusters, nome_x, proc_re):
+    """Modelo ccc: data e processo procurados no texto da linha."""
+    records = []
+    i = 0
+    while i < len(clusters):
+        row = clusters[i]
+        row_text = " ".join([w['text'] for w in row])
+
+        date_match = DATE_TIME_CCC_RE.search(row_text)
+        proc_match = proc_re.search(row_text)
+
+        if date_match and proc_match:
+            name_parts = _nome_na_linha(row, nome_x)
+
+            j = i + 1
+            while j < len(clusters):
+                next_row = clusters[j]
+                next_text = " ".join([w['text'] for w in next_row])
+                if DATE_TIME_CCC_RE.search(next_text) or "nascimento" in next_text.lower():
+                    break
+                name_parts += _nome_na_linha(next_row, nome_x)
+                j += 1
+
+            records.append(_registo(date_match.group(1), proc_match.group(1), name_parts, "ccc"))
+            i = j
+        else:
+            i += 1
+    return records
+
+
+def parse_consultas_pdf(pdf_bytes, modelo=None):
+    """
+    Extrai registos de consulta do PDF GHCE4025R.
+    Devolve lista de dicts: data, processo, nome.
+    """
+    return processar_pdf(pdf_bytes, modelo)["registos"]
+
+
+def processar_pdf(pdf_bytes, modelo=None):
+    """
+    Devolve {"registos" (Lote), "paginas", "amostra", "estados", "falhas"}
+    para um PDF GHCE4025R.
+    Com ``modelo`` ("hcis"/"ccc") o modelo fica fixo em todas as páginas.
+    """
+    records = Lote(CAMPOS, PARTILHADOS)
+    with abrir_pdf(pdf_bytes) as pdf:
+        total_pags = len(pdf.pages)
+        paginas = EstadoPaginas(total_pags)
+        for i, page in enumerate(pdf.pages):
+            with paginas.ler(i):
+                with etapa("extract_words"):
+                    modelo_pag = modelo_da_pagina(page)
+                    if modelo_pag is None:
+                        paginas.saltada(i)
+                        continue
+                    words = palavras_ate(page, MODELOS[modelo or modelo_pag]["limite_x"])
+                with etapa("regex"):
+                    novos = parse_pagina(words, modelo or modelo_pag)
+                records.estender(novos)
+                paginas.lida(i, len(novos))
+    return {"registos": records, "paginas": total_pags, "amostra": "", **paginas.como_dict()}
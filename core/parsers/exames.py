@@ -0,0 +1,247 @@
+"""
+Parser do relatório "Exames Realizados" (página 03), sem IA.
+"""
+import functools
+import re
+
+from core import metricas
+from core.metricas import abrir_pdf, etapa
+from core.registos import Lote
+from core.parsers.comum import EstadoPaginas
+
+# ---------------------------------------------------------------------------
+# PARSING DIRETO (sem IA)
+#
+# Parsing por tokens, em tempo linear no comprimento da linha (sem regex com
+# grupos preguiçosos, que numa linha que não encaixa voltam atrás muitas
+# vezes). Funciona com qualquer prefixo de processo (CCC/, HCIS/, etc.) e com
+# as especialidades de ESPECIALIDADES — o rótulo vem truncado no relatório e
+# colado ao código do acto.
+#
+# ESTRUTURA DO PDF:
+# Linha com data:  "2021-05-17 Equipa Cirurgica 2 CCC/245230 JOSE... GASTROENTEROLO6051 Anestesia... 1 N/N"
+# Linha sem data:  "CCC/344423 ANABELA... GASTROENTEROLO17009901 Colonoscopia... 1 N/N"
+# Cabeçalho (ignorado): "Data: 2026-02-17", "Hospital ...", "Pág. 1/52", etc.
+# ---------------------------------------------------------------------------
+
+# Rótulos de especialidade como aparecem no relatório (truncados a 14
+# caracteres). Pode ser alargada em secrets.toml com
+# especialidades_exames = ["...", ...].
+ESPECIALIDADES = (
+    "GASTROENTEROLO",
+    "ANESTESIOLOGIA",
+    "CIRURGIA GERAL",
+    "PNEUMOLOGIA",
+    "CARDIOLOGIA",
+    "UROLOGIA",
+    "GINECOLOGIA",
+    "OTORRINOLARING",
+    "MEDICINA INTER",
+)
+
+# Campos de cada registo; os de poucos valores distintos ficam partilhados no Lote
+CAMPOS      = ("data", "processo", "nome", "codigo", "procedimento")
+PARTILHADOS = ("data", "codigo", "procedimento")
+
+RE_IGNORAR = re.compile(
+    r'Data:\s*\d{4}|'
+    r'Hora:\s*\d|'
+    r'Hospital |'
+    r'Exames Realizados|'
+    r'Utilizador:|'
+    r'GHC[A-Z]\d+|'
+    r'Período entre|'
+    r'Interveniente:|'
+    r'^Data\s+Grupo\s+Total|'
+    r'Pág\.\s*\d'
+)
+
+
+def tabela_especialidades(rotulos):
+    """Rótulos → palavras de cada um, o mais longo primeiro (há rótulos que são prefixo de outros)."""
+    return tuple(tuple(r.split()) for r in sorted(set(rotulos), key=len, reverse=True))
+
+
+@functools.lru_cache(maxsize=1)
+def especialidades():
+    """Tabela de ESPECIALIDADES mais as de secrets.toml (especialidades_exames)."""
+    from core import segredos
+
+    extra = segredos.obter("especialidades_exames", None) or ()
+    return tabela_especialidades([*ESPECIALIDADES, *extra])
+
+
+def _e_data(tok):
+    """YYYY-MM-DD."""
+    return (len(tok) == 10 and tok[4] == tok[7] == '-'
+            and tok[:4].isdigit() and tok[5:7].isdigit() and tok[8:].isdigit())
+
+
+def _e_processo(tok):
+    """PREFIXO/número (CCC/245230, HCIS/123, ...)."""
+    pref, barra, num = tok.partition('/')
+    return bool(barra) and pref.isalpha() and pref.isupper() and num.isdigit()
+
+
+def _e_codigo(tok):
+    """Equivalente a \\w+."""
+    return tok.replace('_', 'a').isalnum()
+
+
+def _e_fact(tok):
+    """Indicador de facturação X/Y (N/N, S/N)."""
+    return len(tok) == 3 and tok[1] == '/' and tok[0].isupper() and tok[2].isupper()
+
+
+def _especialidade(tokens, i, partes, colado):
+    """
+    Se o rótulo ``partes`` começa no token ``i`` — no início ou, com
+    ``colado``, depois do fim do nome (SILVAGASTROENTEROLO6051) —, devolve
+    (nome, código, procedimento); senão None.
+    """
+    tok = tokens[i]
+    if colado:
+        p = tok.find(partes[0], 1)
+        if p < 0:
+            return None
+        nome = tokens[:i] + [tok[:p]]
+    elif i and tok.startswith(partes[0]):
+        p, nome = 0, tokens[:i]
+    else:
+        return None
+    fim = i + len(partes) - 1
+    if fim >= len(tokens) or not (tok[p:] if fim == i else tokens[fim]).startswith(partes[-1]):
+        return None
+    if len(partes) > 1 and (tok[p:], *tokens[i + 1:fim]) != partes[:-1]:
+        return None
+    resto = (tok[p:] if fim == i else tokens[fim])[len(partes[-1]):]
+    j = fim + 1
+    if not resto:
+        if j >= len(tokens):
+            return None
+        resto, j = tokens[j], j + 1
+    if not _e_codigo(resto) or j >= len(tokens):
+        return None
+    return " ".join(nome), resto, " ".join(tokens[j:])
+
+
+def _corpo(tokens, tabela):
+    """
+    (nome, código, procedimento) para os tokens entre o processo e a
+    quantidade, ou None. A especialidade é o primeiro token (depois de pelo
+    menos um do nome) que começa por um rótulo da tabela; o resto desse
+    token, ou o token seguinte, é o código do acto. Sem nenhum, procura-se
+    o rótulo colado ao fim de uma palavra do nome.
+    """
+    for colado in (False, True):
+        for i in range(len(tokens)):
+            for partes in tabela:
+                corpo = _especialidade(tokens, i, partes, colado)
+                if corpo:
+                    return corpo
+    return None
+
+
+def parsear_linha(linha, tabela=None):
+    """
+    (data ou None, processo, nome, código, procedimento) de uma linha de acto,
+    ou None se a linha não for um acto.
+    """
+    tokens = linha.split()
+    if len(tokens) < 5 or not _e_fact(tokens[-1]) or not tokens[-2].isdigit():
+        return None
+
+    data = None
+    if _e_data(tokens[0]):
+        # data, grupo (1+ tokens), total, processo
+        k = next(
+            (k for k in range(3, len(tokens) - 2)
+             if _e_processo(tokens[k]) and tokens[k - 1].isdigit()),
+            None,
+        )
+        if k is None:
+            return None
+        data = tokens[0]
+    elif _e_processo(tokens[0]):
+        k = 0
+    else:
+        return None
+
+    corpo = _corpo(tokens[k + 1:-2], tabela or especialidades())
+    if corpo is None:
+        metricas.contar("exames.linhas_sem_especialidade")
+        return None
+    nome, codigo, procedimento = corpo
+    return data, tokens[k], nome, codigo, procedimento
+
+
+def extrair_registos_pagina(texto: str, ultima_data: str):
+    """
+    Parseia uma página e devolve (lista_registos, última_data_de_ato).
+    A data propaga-se apenas entre registos de ato — nunca do cabeçalho.
+    """
+    registos = []
+    tabela = especialidades()
+
+    for linha in texto.split('\n'):
+        linha = linha.strip()
+        if not linha or RE_IGNORAR.search(linha):
+            continue
+
+        campos = parsear_linha(linha, tabela)
+        if campos is None:
+            continue
+        data, processo, nome, codigo, procedimento = campos
+        if data:
+            ultima_data = data
+        registos.append({
+            "data": ultima_data,
+            "processo": processo,
+            "nome": nome,
+            "codigo": codigo,
+            "procedimento": procedimento,
+        })
+
+    return registos, ultima_data
+
+
+def formatar_data_pt(data_iso: str) -> str:
+    """YYYY-MM-DD → DD-MM-YYYY com zero padding garantido (ex: 05-06-2021)"""
+    if not data_iso:
+        return ""
+    p = re.findall(r'\d+', data_iso)
+    if len(p) == 3 and len(p[0]) == 4:
+        ano, mes, dia = p[0], p[1].zfill(2), p[2].zfill(2)
+        return f"{dia}-{mes}-{ano}"
+    return data_iso
+
+
+def processar_pdf(pdf_bytes):
+    """
+    Extrai todos os registos de um PDF de exames, propagando a última data
+    de ato entre páginas.
+    Devolve {"registos" (Lote), "paginas", "amostra", "estados", "falhas"};
+    "amostra" (início da pág. 1) só é preenchida quando nada foi extraído,
+    para diagnóstico; "estados" e "falhas" são os de EstadoPaginas.
+    """
+    registos = Lote(CAMPOS, PARTILHADOS)
+    ultima_data = ""
+    amostra = ""
+    with abrir_pdf(pdf_bytes) as pdf:
+        total_pags = len(pdf.pages)
+        paginas = EstadoPaginas(total_pags)
+        for i, pagina in enumerate(pdf.pages):
+            with paginas.ler(i):
+                with etapa("extract_text"):
+                    texto = pagina.extract_text()
+                if not texto:
+                    continue
+                with etapa("regex"):
+                    novos, ultima_data = extrair_registos_pagina(texto, ultima_data)
+                registos.estender(novos)
+                paginas.lida(i, len(novos))
+
+        if not registos and total_pags:
+            amostra = (pdf.pages[0].extract_text() or "")[:1500]
+
+    return {"registos": registos, "paginas": total_pags, "amostra": amostra, **paginas.como_dict()}
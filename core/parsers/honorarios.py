@@ -0,0 +1,306 @@
+"""
+Parser do "Mapa de Honorários - Detalhe" (página 01), sem IA.
+"""
+import re
+
+from core import metricas
+from core.metricas import abrir_pdf, etapa
+from core.registos import Lote
+from core.parsers.comum import EstadoPaginas
+
+# ---------------------------------------------------------------------------
+# PARSING DIRETO (sem IA)
+#
+# ESTRUTURA DO PDF (Mapa de Honorários - Detalhe):
+#
+# Pág. 1: sumário por grupo — "<Grupo> <actos> <valor>" e "Total Geral <actos> <valor>";
+#         não dá registos, serve para verificar a extracção (ler_resumo)
+# Págs. 2+: linhas de detalhe, uma por ato:
+#   "DD-MM-YY <processo><nome> <Serviço> <cod_ent> <entidade> <cod_acto><procedimento> [%] [NrK] <qtd> <valor>"
+#
+# Colunas extraídas (por ordem):
+#   Data | Processo | Nome | Valor | Procedimento | Entidade | Data Extração | PDF Origem
+# ---------------------------------------------------------------------------
+
+# Campos de cada registo; os de poucos valores distintos ficam partilhados no Lote
+CAMPOS      = ("data", "processo", "nome", "valor", "procedimento", "entidade")
+PARTILHADOS = ("data", "procedimento", "entidade")
+
+# Serviços conhecidos — do mais longo para o mais curto (evita matches parciais)
+_SERVICOS = [
+    'Bloco Operatorio Tejo',
+    'Cir. Plástica E Reconstru',
+    'Ginecologia Obstetricia',
+    'Otorrinolaringologia',
+    'Neuro-Cirurgia',
+    'Cirurgia Vascular',
+    'Cirurgia Torácica',
+    'Cirurgia Geral',
+    'Gastroenterologia',
+    'Anestesiologia',
+    'Oftalmologia',
+    'Ortopedia',
+    'Angiografia',
+    'Urologia',
+    'CPRE',
+]
+_SERVICOS.sort(key=len, reverse=True)
+
+# Mapa para nome canónico independente de maiúsculas no PDF
+_SERVICO_CANON = {s.lower(): s for s in _SERVICOS}
+
+# Separador nome → serviço: case-insensitive, serviço seguido de dígito (código entidade)
+RE_SERVICO = re.compile(
+    r'\s*(' + '|'.join(re.escape(s) for s in _SERVICOS) + r')(?=\s*\d)',
+    re.IGNORECASE
+)
+
+# Linha de dados principal
+RE_LINHA = re.compile(
+    r'^(\d{2}-\d{2}-\d{2})\s+'   # data DD-MM-YY
+    r'(\d+)'                       # processo (só dígitos, colado ao nome)
+    r'(.+?)\s+'                    # nome + serviço + entidade + procedimento
+    r'-?\d+\s+'                    # quantidade (pode ser negativa em extornos)
+    r'(-?[\d,]+\.\d{2})$'         # valor (ex: 50.00 ou -121.41 ou 1,125.20)
+)
+
+# Cabeçalhos de secção de grupo
+RE_GRUPO = re.compile(
+    r'^(Anestesia|Angiografia[^,]|CPRE|Cirurgias Oftalmologia|Cirurgias|'
+    r'Consultas|Exames Bloco)$'
+)
+
+# Linhas de cabeçalho/rodapé a ignorar
+# "Hospital" ancorado ao início para não apanhar entidades como "Hospital Garcia De Orta"
+RE_IGNORAR = re.compile(
+    r'^Hospital |Mapa de Honor|PS_PA_009|Utilizador:|Pág\.\s*(por|:)?\s*\d|'
+    r'Data:\s*\d{4}|Hora:\s*\d|Ano:\s*\d|Prestador de Serviços|'
+    r'Código fornecedor|1M - Processamento|Datas (Activ|Factur)|'
+    r'Valores do Período|^Data\s+Doente|Total (do Período|Geral|Valor)'
+)
+
+RE_COD_ACTO     = re.compile(r'\d{5,}')
+RE_SUFIXO_COD   = re.compile(r'^(PT|T)(?=[A-Za-zÀ-ÿ])')
+RE_CAUDA_PCT_NR = re.compile(r'\s+\d+\.\d{2}\s+-?\d+\s*$')
+RE_CAUDA_PCT    = re.compile(r'\s+\d+\.\d{2}\s*$')
+RE_TRACO_FINAL  = re.compile(r'\s+-\s*$')
+
+
+# Linhas do sumário da pág. 1
+RE_RESUMO       = re.compile(r'^(.+?)\s+(-?\d+)\s+(-?[\d,]+\.\d{2})$')
+RE_TOTAL_GERAL  = re.compile(r'^Total Geral\s+(-?\d+)\s+(-?[\d,]+\.\d{2})$')
+
+
+def centimos(valor_raw: str) -> int:
+    """"1,125.20" → 112520 | "-50.00" → -5000 (sem erros de vírgula flutuante)."""
+    return int(valor_raw.replace(',', '').replace('.', ''))
+
+
+def extrair_entidade_proc(resto: str) -> tuple[str, str]:
+    """
+    Dado o texto após o serviço, extrai entidade pagadora e início do procedimento.
+
+    Formato do resto: " <cod_ent> <entidade...> <cod_acto><procedimento> [% NrK]"
+
+    O cod_acto é sempre 5+ dígitos colados ao início do procedimento.
+    Alguns códigos têm sufixo de letras maiúsculas (PT, T) que fazem parte do código.
+    """
+    resto = resto.strip()
+    partes = resto.split(None, 1)
+    if len(partes) < 2:
+        return "", ""
+
+    sem_cod_ent = partes[1]  # remove o código numérico da entidade (1ª palavra)
+
+    # Localiza cod_acto: 5+ dígitos colados ao procedimento
+    m = RE_COD_ACTO.search(sem_cod_ent)
+    if not m:
+        return sem_cod_ent.strip(), ""
+
+    entidade   = sem_cod_ent[:m.start()].strip()
+    apos_digitos = sem_cod_ent[m.end():]
+
+    # Elimina sufixo de código (PT ou T) quando colado ao procedimento
+    sufixo = RE_SUFIXO_COD.match(apos_digitos)
+    if sufixo:
+        apos_digitos = apos_digitos[sufixo.end():]
+
+    proc_raw = apos_digitos.strip()
+
+    # Remove cauda: "% valor NrK" — ex: "90.00 -57" ou "90.00 66" ou só "60.00"
+    proc = RE_CAUDA_PCT_NR.sub('', proc_raw).strip()
+    proc = RE_CAUDA_PCT.sub('', proc).strip()
+    # Remove " -" final de linhas truncadas pelo PDF
+    proc = RE_TRACO_FINAL.sub('', proc).strip()
+
+    return entidade, proc
+
+
+def _registo(data_raw, processo, meio, valor_raw):
+    """Registo a partir dos campos de uma linha de detalhe."""
+    meio = meio.strip()
+
+    # Separa nome do serviço (case-insensitive, cobre "UROLOGIA" e "Urologia")
+    ms = RE_SERVICO.search(meio)
+    nome  = meio[:ms.start()].strip() if ms else meio.strip()
+    resto = meio[ms.end():]           if ms else ""
+
+    # Extrai entidade e procedimento
+    entidade, procedimento = extrair_entidade_proc(resto)
+
+    # Formata data: DD-MM-YY → DD-MM-YYYY (com zero-padding no dia e mês)
+    p = data_raw.split('-')
+    data_fmt = f"{p[0].zfill(2)}-{p[1].zfill(2)}-20{p[2]}"
+
+    # Formata valor: "1,125.20" → "1125,20" | "-50.00" → "-50,00"
+    valor = valor_raw.replace(',', '').replace('.', ',')
+
+    return {
+        "data":         data_fmt,
+        "processo":     processo,
+        "nome":         nome.upper(),
+        "valor":        valor,
+        "procedimento": procedimento,
+        "entidade":     entidade,
+    }
+
+
+def parsear_pagina(texto: str, grupo_atual: str, por_grupo: dict | None = None) -> tuple[list, str]:
+    """
+    Parseia uma página e devolve (lista_registos, grupo_atual). Com
+    ``por_grupo`` soma-lhe [linhas, cêntimos] por grupo, para a verificação
+    contra o sumário da pág. 1.
+    """
+    registos = []
+
+    for linha in texto.split('\n'):
+        linha = linha.strip()
+        if not linha or RE_IGNORAR.search(linha):
+            continue
+
+        # Detecta mudança de grupo
+        mg = RE_GRUPO.match(linha)
+        if mg:
+            grupo_atual = mg.group(1).strip()
+            continue
+
+        # Linha de dados
+        m = RE_LINHA.match(linha)
+        if not m:
+            continue
+        registos.append(_registo(*m.groups()))
+        if por_grupo is not None:
+            soma = por_grupo.setdefault(grupo_atual, [0, 0])
+            soma[0] += 1
+            soma[1] += centimos(m.group(4))
+
+    return registos, grupo_atual
+
+
+def ler_resumo(texto: str) -> dict | None:
+    """
+    Sumário por grupo da pág. 1: {"grupos": {grupo: (actos, cêntimos)},
+    "total": (actos, cêntimos) ou None}, ou None se a página não o tiver.
+    """
+    grupos, total = {}, None
+    for linha in texto.split('\n'):
+        linha = linha.strip()
+        mt = RE_TOTAL_GERAL.match(linha)
+        if mt:
+            total = (int(mt.group(1)), centimos(mt.group(2)))
+            continue
+        if not linha or RE_IGNORAR.search(linha):
+            continue
+        m = RE_RESUMO.match(linha)
+        if m:
+            grupos[m.group(1).strip()] = (int(m.group(2)), centimos(m.group(3)))
+    if not grupos and total is None:
+        return None
+    return {"grupos": grupos, "total": total}
+
+
+def verificar_resumo(resumo: dict, por_grupo: dict) -> dict:
+    """
+    Compara o sumário (ler_resumo) com as somas por grupo das linhas
+    extraídas. Devolve {"ok", "grupos": [{"grupo", "actos_pdf",
+    "actos_extraidos", "valor_pdf", "valor_extraido", "ok"}, ...]}, com os
+    valores em cêntimos e uma última linha "Total Geral" quando o PDF a tem.
+    """
+    linhas = []
+    for grupo in list(resumo["grupos"]) + [g for g in por_grupo if g not in resumo["grupos"]]:
+        actos_pdf, valor_pdf = resumo["grupos"].get(grupo, (0, 0))
+        actos, valor = por_grupo.get(grupo, (0, 0))
+        linhas.append({
+            "grupo":           grupo or "(sem grupo)",
+            "actos_pdf":       actos_pdf,
+            "actos_extraidos": actos,
+            "valor_pdf":       valor_pdf,
+            "valor_extraido":  valor,
+            "ok":              (actos_pdf, valor_pdf) == (actos, valor),
+        })
+    if resumo["total"] is not None:
+        actos_pdf, valor_pdf = resumo["total"]
+        actos = sum(n for n, _ in por_grupo.values())
+        valor = sum(v for _, v in por_grupo.values())
+        linhas.append({
+            "grupo":           "Total Geral",
+            "actos_pdf":       actos_pdf,
+            "actos_extraidos": actos,
+            "valor_pdf":       valor_pdf,
+            "valor_extraido":  valor,
+            "ok":              (actos_pdf, valor_pdf) == (actos, valor),
+        })
+    return {"ok": all(l["ok"] for l in linhas), "grupos": linhas}
+
+
+def grupos_divergentes(verificacao: dict | None) -> list[str]:
+    """Grupos da verificação que não conferem (vazio se tudo confere ou não há sumário)."""
+    return [l["grupo"] for l in (verificacao or {}).get("grupos", []) if not l["ok"]]
+
+
+def processar_pdf(pdf_bytes):
+    """
+    Extrai todos os registos de um PDF de honorários, página a página,
+    propagando o grupo actual entre páginas.
+    Devolve {"registos" (Lote), "paginas", "amostra", "verificacao",
+    "estados", "falhas"}; "amostra" (início da pág. 2) só é preenchida
+    quando nada foi extraído, para diagnóstico; "verificacao"
+    (verificar_resumo) é None quando a pág. 1 não tem sumário; "estados" e
+    "falhas" são os de EstadoPaginas (uma página com erro não pára o PDF).
+    """
+    registos = Lote(CAMPOS, PARTILHADOS)
+    grupo_atual = ""
+    amostra = ""
+    resumo = None
+    por_grupo = {}
+    with abrir_pdf(pdf_bytes) as pdf:
+        total_pags = len(pdf.pages)
+        paginas = EstadoPaginas(total_pags)
+        for i, pagina in enumerate(pdf.pages):
+            with paginas.ler(i):
+                with etapa("extract_text"):
+                    texto = pagina.extract_text()
+                if not texto:
+                    continue
+                if i == 0:
+                    with etapa("resumo"):
+                        resumo = ler_resumo(texto)
+                # As somas da página só entram depois de lida sem erro
+                da_pagina = {}
+                with etapa("regex"):
+                    novos, grupo_atual = parsear_pagina(texto, grupo_atual, da_pagina)
+                registos.estender(novos)
+                paginas.lida(i, len(novos))
+                for grupo, (n, valor) in da_pagina.items():
+                    soma = por_grupo.setdefault(grupo, [0, 0])
+                    soma[0] += n
+                    soma[1] += valor
+
+        if not registos and total_pags > 1:
+            amostra = (pdf.pages[1].extract_text() or "")[:1500]
+
+    verificacao = verificar_resumo(resumo, por_grupo) if resumo else None
+    if verificacao and not verificacao["ok"]:
+        metricas.contar("honorarios.resumo_divergente")
+    return {"registos": registos, "paginas": total_pags, "amostra": amostra,
+            "verificacao": verificacao, **paginas.como_dict()}
@@ -0,0 +1,23 @@
+"""
+Extração de texto bruto página a página, para o processamento por IA (07).
+"""
+from core.metricas import abrir_pdf, etapa
+from core.parsers.comum import EstadoPaginas
+
+
+def processar_pdf(pdf_bytes, layout=True):
+    """
+    Devolve {"registos": [texto de cada página], "paginas", "amostra",
+    "estados", "falhas"}; uma página cujo texto não se consegue extrair
+    fica com "" e o erro em "falhas" (EstadoPaginas).
+    """
+    textos = []
+    with abrir_pdf(pdf_bytes) as pdf:
+        paginas = EstadoPaginas(len(pdf.pages))
+        for i, pagina in enumerate(pdf.pages):
+            textos.append("")
+            with paginas.ler(i):
+                with etapa("extract_text"):
+                    textos[i] = pagina.extract_text(layout=layout) or ""
+                paginas.lida(i, len(textos[i].strip()))
+    return {"registos": textos, "paginas": len(textos), "amostra": "", **paginas.como_dict()}
@@ -0,0 +1,33 @@
+import re
+
+RE_ID_PLANILHA = re.compile(r'/spreadsheets/d/([a-zA-Z0-9-_]+)')
+
+
+def extrair_id_planilha(url):
+    """Extrai o ID da planilha de um URL do Google Sheets (ou devolve o próprio valor)."""
+    match = RE_ID_PLANILHA.search(url or "")
+    return match.group(1) if match else (url or "").strip()
+
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+
+def cliente_gspread():
+    """Cliente gspread autenticado com a conta de serviço dos segredos."""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    from core import segredos
+
+    creds = Credentials.from_service_account_info(
+        dict(segredos.obter("gcp_service_account")), scopes=SCOPES
+    )
+    return gspread.authorize(creds)
+
+
+def abrir_planilha(sheet_url):
+    """Abre a planilha a partir do URL (ou do ID)."""
+    return cliente_gspread().open_by_key(extrair_id_planilha(sheet_url))
@@ -0,0 +1,154 @@
+"""
+Pools de trabalho persistentes para processar vários PDFs em paralelo.
+
+Os pools são criados uma única vez por processo do servidor (variáveis de
+módulo sobrevivem aos reruns do Streamlit), por isso carregar noutro botão
+não volta a lançar processos. O parsing de PDF é CPU-bound e corre num
+pool de processos; as chamadas a APIs externas (Gemini) correm num pool de
+threads.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from core import metricas, monitor
+from core.cobertura import periodo_lido
+from core.deteccao import DESCRICOES, ler_periodo, texto_cabecalho, tipo_compativel, tipo_do_texto
+from core.parsers import PARSERS
+from core.registos import Lote
+from core.uploads import tamanho
+
+NUM_PROCESSOS = max(1, min(os.cpu_count() or 1, 8))
+NUM_THREADS_IO = 8
+
+_pool = None
+_pool_io = None
+_lock = threading.Lock()
+
+
+def obter_pool():
+    """Pool de processos partilhado (criado na primeira utilização)."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            # "spawn": os processos de trabalho não herdam as threads do servidor
+            _pool = ProcessPoolExecutor(
+                max_workers=NUM_PROCESSOS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def obter_pool_io():
+    """Pool de threads partilhado para chamadas de rede."""
+    global _pool_io
+    with _lock:
+        if _pool_io is None:
+            _pool_io = ThreadPoolExecutor(max_workers=NUM_THREADS_IO, thread_name_prefix="io")
+        return _pool_io
+
+
+def _descartar_pool():
+    global _pool
+    with _lock:
+        _pool = None
+
+
+# ─── Tarefa de um ficheiro (corre num processo de trabalho) ──────────────────
+
+def processar_ficheiro(tipo, nome, conteudo, verificar=False):
+    """
+    Processa um PDF com o parser do tipo indicado. Nunca levanta excepção:
+    um PDF inválido devolve "erro" preenchido e não estraga o resto do lote,
+    e uma página com erro fica em "falhas" ({página: erro}) sem estragar o
+    resto do PDF.
+    ``conteudo`` são os bytes ou o caminho do ficheiro — com o caminho só
+    este vai para o processo de trabalho, que lê o PDF por mmap.
+    Com tipo="auto" o tipo é detectado pelo cabeçalho (core.deteccao) e
+    devolvido em "tipo"; com verificar=True o cabeçalho é lido antes e um
+    relatório de outro tipo devolve logo "erro", sem o parsing completo.
+    Com o cabeçalho lido, "periodo" é o que o PDF cobre
+    (cobertura.periodo_lido, registado no índice de cobertura).
+    Os tempos por etapa e os contadores vêm em "metricas" (core.metricas).
+    """
+    t0 = time.perf_counter()
+    with metricas.medir() as medicao:
+        try:
+            cabecalho = None
+            if tipo == "auto" or verificar:
+                with metricas.etapa("deteccao"):
+                    cabecalho = texto_cabecalho(conteudo)
+            if tipo == "auto":
+                tipo = tipo_do_texto(cabecalho)
+                if tipo is None:
+                    raise ValueError("tipo de relatório não reconhecido")
+            elif verificar:
+                detetado = tipo_do_texto(cabecalho)
+                if not tipo_compativel(tipo, detetado):
+                    raise ValueError(
+                        f"este PDF é {DESCRICOES[detetado]}, não "
+                        f"{DESCRICOES.get(tipo, tipo)} — use a página Importar PDFs"
+                    )
+            periodo = ler_periodo(cabecalho) if cabecalho else None
+            resultado = PARSERS[tipo](conteudo)
+            resultado["erro"] = None
+            if isinstance(resultado["registos"], Lote) and "data" in resultado["registos"].campos:
+                resultado["periodo"] = periodo_lido(periodo, resultado["registos"].coluna("data"))
+        except Exception as e:
+            resultado = {"registos": Lote(), "paginas": 0, "amostra": "",
+                         "erro": f"{type(e).__name__}: {e}"}
+            metricas.contar("erros")
+        metricas.contar("ficheiros")
+        metricas.contar("bytes", tamanho(conteudo))
+        metricas.contar("paginas", resultado["paginas"])
+        metricas.contar("registos", len(resultado["registos"]))
+    resultado["tipo"] = tipo
+    resultado["nome"] = nome
+    resultado["segundos"] = time.perf_counter() - t0
+    resultado["metricas"] = medicao.como_dict()
+    return resultado
+
+
+def resultado_ignorado(tipo, nome, motivo):
+    """Resultado de um PDF recusado sem parsing (duplicado de um já gravado ou carregado)."""
+    return {"registos": Lote(), "paginas": 0, "amostra": "", "erro": None,
+            "ignorado": motivo, "tipo": tipo, "nome": nome, "segundos": 0.0}
+
+
+def processar_lote(tipo, ficheiros, ao_concluir=None, verificar=False):
+    """
+    Processa [(nome, bytes ou caminho), ...] em paralelo e devolve os
+    resultados pela ordem de upload (independentemente da ordem em que terminam).
+    ao_concluir(concluidos, total, resultado) é chamado na thread de quem
+    invoca, à medida que cada ficheiro termina (útil para barras de progresso).
+    Com uma medição activa (core.metricas) cada ficheiro é somado à corrida;
+    é sempre somado aos contadores do processo (core.monitor).
+    verificar: ver processar_ficheiro.
+    """
+    if not ficheiros:
+        return []
+
+    pool = obter_pool()
+    futuros = {
+        pool.submit(processar_ficheiro, tipo, nome, conteudo, verificar): i
+        for i, (nome, conteudo) in enumerate(ficheiros)
+    }
+    resultados = [None] * len(ficheiros)
+    for concluidos, futuro in enumerate(as_completed(futuros), 1):
+        i = futuros[futuro]
+        try:
+            resultados[i] = futuro.result()
+        except BrokenProcessPool as e:
+            # Um processo morreu (ex.: memória); o próximo lote cria um pool novo
+            _descartar_pool()
+            resultados[i] = {"registos": Lote(), "paginas": 0, "amostra": "",
+                             "erro": f"BrokenProcessPool: {e}", "tipo": tipo,
+                             "nome": ficheiros[i][0], "segundos": 0.0}
+        metricas.registar_ficheiro(resultados[i])
+        monitor.registar_ficheiro(resultados[i])
+        if ao_concluir:
+            ao_concluir(concluidos, len(ficheiros), resultados[i])
+    return resultados
@@ -0,0 +1,104 @@
+"""
+Registos extraídos em colunas (um Lote por PDF), em vez de um dict por
+registo.
+
+Um dict por registo custa ~200 bytes só de estrutura, mais uma cópia de
+cada texto — a mesma entidade, procedimento ou data repetida milhares de
+vezes. O Lote guarda uma lista por campo e, nos campos com poucos valores
+distintos, uma só cópia de cada texto; é isto que fica na sessão
+(processar_uploads) e que vem dos processos de parsing.
+
+    lote = Lote(("data", "processo", "nome"), partilhados=("data",))
+    lote.juntar({"data": "01-02-2024", "processo": "123", "nome": "ANA"})
+    lote.linhas(("data", "processo"), "ficheiro.pdf")   # linhas para a folha
+    pd.DataFrame(lote.tabela())                         # pré-visualização
+
+Iterar um Lote dá um dict por registo (criado na hora), para o código que
+ainda lê registo a registo.
+"""
+
+
+class Lote:
+    """Registos em colunas, com os textos repetidos partilhados."""
+
+    __slots__ = ("campos", "colunas", "_partilhados")
+
+    def __init__(self, campos=(), partilhados=()):
+        self.campos = tuple(campos)
+        self.colunas = {c: [] for c in self.campos}
+        self._partilhados = {c: {} for c in partilhados if c in self.colunas}
+
+    @classmethod
+    def concatenar(cls, lotes):
+        """Um só Lote com os registos de vários (os campos são os do primeiro)."""
+        lotes = [l for l in lotes if l]
+        if not lotes:
+            return cls()
+        novo = cls(lotes[0].campos, lotes[0]._partilhados)
+        for lote in lotes:
+            novo.estender(lote)
+        return novo
+
+    def juntar(self, registo):
+        """Acrescenta um registo (dict com pelo menos os campos do lote)."""
+        for campo, coluna in self.colunas.items():
+            valor = registo[campo]
+            cache = self._partilhados.get(campo)
+            if cache is not None:
+                valor = cache.setdefault(valor, valor)
+            coluna.append(valor)
+
+    def estender(self, registos):
+        """Acrescenta vários registos (dicts ou outro Lote com os mesmos campos)."""
+        if isinstance(registos, Lote):
+            for campo, coluna in self.colunas.items():
+                cache = self._partilhados.get(campo)
+                origem = registos.colunas[campo]
+                coluna.extend(origem if cache is None else (cache.setdefault(v, v) for v in origem))
+            return
+        for registo in registos:
+            self.juntar(registo)
+
+    def __len__(self):
+        return len(self.colunas[self.campos[0]]) if self.campos else 0
+
+    def __iter__(self):
+        campos = self.campos
+        for valores in zip(*self.colunas.values()):
+            yield dict(zip(campos, valores))
+
+    def __getitem__(self, i):
+        return {campo: coluna[i] for campo, coluna in self.colunas.items()}
+
+    def __repr__(self):
+        return f"Lote({len(self)} registos: {', '.join(self.campos)})"
+
+    def coluna(self, campo):
+        return self.colunas[campo]
+
+    def tabela(self):
+        """Colunas por nome (dict de listas), para pd.DataFrame / st.dataframe sem cópias por registo."""
+        return dict(self.colunas)
+
+    def linhas(self, campos=None, *sufixo):
+        """
+        Uma lista por registo com os ``campos`` (por omissão todos) e os
+        valores de ``sufixo`` no fim — as linhas para uma aba da folha.
+        """
+        colunas = [self.colunas[c] for c in (campos or self.campos)]
+        sufixo = list(sufixo)
+        return [[*valores, *sufixo] for valores in zip(*colunas)]
+
+
+def partilhar_textos(linhas):
+    """
+    Substitui, no lugar, os textos repetidos de uma lista de linhas (listas)
+    por uma só cópia — p.ex. linhas que voltaram de JSON, onde cada
+    "Ficheiro" e "Data Execução" é uma string nova. Devolve as linhas.
+    """
+    vistos = {}
+    for linha in linhas:
+        for i, valor in enumerate(linha):
+            if isinstance(valor, str):
+                linha[i] = vistos.setdefault(valor, valor)
+    return linhas
@@ -0,0 +1,203 @@
+"""
+Saídas em ficheiro — CSV, XLSX ou Parquet — com o layout de cada aba
+(core.espelho.ABAS), ao lado da gravação no Google Sheets.
+
+Uma importação grande (anos de PDFs) pela API do Sheets fica presa à
+quota; escrita num ficheiro por aba termina numa passagem e o ficheiro é
+depois colado ou carregado de uma vez na folha. As linhas são escritas à
+medida que chegam, sem ficarem todas em memória:
+
+    with Exportacao(pasta, "xlsx") as saida:
+        saida.gravar("pagos", linhas)        # as mesmas linhas da folha
+    saida.ficheiros                          # {tabela: caminho}
+
+- CSV: o texto tal como vai para a folha; um ficheiro que já existe é
+  continuado (linha de comandos, retomas);
+- XLSX: openpyxl em modo write_only (memória constante); os valores em €
+  ficam como números;
+- Parquet: pyarrow (vem com o Streamlit), um row group por gravação; os
+  valores em € como double, o resto como texto.
+
+XLSX e Parquet não se continuam: se o ficheiro já existe, o novo fica com
+um sufixo (pagos.2.xlsx).
+"""
+import csv
+import importlib.util
+import zipfile
+from pathlib import Path
+
+from core import espelho
+
+# Formato → módulo opcional de que depende (None: só a biblioteca padrão)
+DEPENDENCIAS = {"csv": None, "xlsx": "openpyxl", "parquet": "pyarrow"}
+
+MIME = {
+    "csv":     "text/csv",
+    "xlsx":    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+    "zip":     "application/zip",
+}
+
+
+def formatos_disponiveis():
+    """Formatos cuja dependência está instalada, pela ordem de DEPENDENCIAS."""
+    return [f for f, modulo in DEPENDENCIAS.items()
+            if modulo is None or importlib.util.find_spec(modulo) is not None]
+
+
+def _valores(tabela, linha):
+    """A linha com a coluna "valor" (se a aba a tem) convertida em número."""
+    campos = espelho.ABAS[tabela]["campos"]
+    if "valor" not in campos:
+        return linha
+    i = campos.index("valor")
+    linha = list(linha)
+    if i < len(linha):
+        numero = espelho.valor_num(linha[i])
+        if numero is not None:
+            linha[i] = numero
+    return linha
+
+
+def _caminho_livre(pasta, tabela, extensao):
+    caminho = pasta / f"{tabela}.{extensao}"
+    n = 2
+    while caminho.exists():
+        caminho = pasta / f"{tabela}.{n}.{extensao}"
+        n += 1
+    return caminho
+
+
+# ─── Um ficheiro por aba ──────────────────────────────────────────────────────
+
+class SaidaCSV:
+    """CSV com o cabeçalho da aba; continua o ficheiro se já existir."""
+
+    extensao = "csv"
+
+    def __init__(self, pasta, tabela):
+        self.caminho = Path(pasta) / f"{tabela}.csv"
+        novo = not self.caminho.exists()
+        self._f = open(self.caminho, "a", newline="", encoding="utf-8")
+        self._escritor = csv.writer(self._f)
+        if novo:
+            self._escritor.writerow(espelho.ABAS[tabela]["cabecalho"])
+
+    def gravar(self, linhas):
+        self._escritor.writerows(linhas)
+        self._f.flush()
+
+    def fechar(self):
+        self._f.close()
+
+
+class SaidaXLSX:
+    """Folha XLSX escrita em modo write_only do openpyxl (as linhas vão para disco)."""
+
+    extensao = "xlsx"
+
+    def __init__(self, pasta, tabela):
+        from openpyxl import Workbook
+
+        self.caminho = _caminho_livre(Path(pasta), tabela, self.extensao)
+        self.tabela = tabela
+        self._livro = Workbook(write_only=True)
+        self._folha = self._livro.create_sheet(espelho.ABAS[tabela]["folha"] or "Honorários")
+        self._folha.append(espelho.ABAS[tabela]["cabecalho"])
+
+    def gravar(self, linhas):
+        for linha in linhas:
+            self._folha.append(_valores(self.tabela, linha))
+
+    def fechar(self):
+        self._livro.save(self.caminho)
+
+
+class SaidaParquet:
+    """Parquet com uma coluna por campo da aba; cada gravação é um row group."""
+
+    extensao = "parquet"
+
+    def __init__(self, pasta, tabela):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.caminho = _caminho_livre(Path(pasta), tabela, self.extensao)
+        self.tabela = tabela
+        campos = espelho.ABAS[tabela]["campos"]
+        self._esquema = pa.schema([
+            (c, pa.float64() if c == "valor" else pa.string()) for c in campos
+        ])
+        self._escritor = pq.ParquetWriter(self.caminho, self._esquema)
+
+    def gravar(self, linhas):
+        if not linhas:
+            return
+        colunas = []
+        for i, campo in enumerate(self._esquema):
+            if campo.name == "valor":
+                valores = [espelho.valor_num(l[i]) if i < len(l) else None for l in linhas]
+            else:
+                valores = [None if i >= len(l) or l[i] is None else str(l[i]) for l in linhas]
+            colunas.append(self._pa.array(valores, type=campo.type))
+        self._escritor.write_table(self._pa.Table.from_arrays(colunas, schema=self._esquema))
+
+    def fechar(self):
+        self._escritor.close()
+
+
+SAIDAS = {"csv": SaidaCSV, "xlsx": SaidaXLSX, "parquet": SaidaParquet}
+
+
+# ─── Várias abas ──────────────────────────────────────────────────────────────
+
+class Exportacao:
+    """
+    Um ficheiro por aba numa pasta, aberto na primeira gravação dessa aba.
+    Tem o mesmo gravar(tabela, linhas) dos destinos de core.importar.
+    """
+
+    def __init__(self, pasta, formato="csv"):
+        if formato not in SAIDAS:
+            raise ValueError(f"Formato desconhecido: {formato} (use {', '.join(SAIDAS)})")
+        modulo = DEPENDENCIAS[formato]
+        if modulo and importlib.util.find_spec(modulo) is None:
+            raise RuntimeError(f"A saída {formato.upper()} precisa do pacote {modulo} (pip install {modulo})")
+        self.pasta = Path(pasta)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.formato = formato
+        self._saidas = {}
+        self._fechada = False
+
+    @property
+    def ficheiros(self):
+        """{tabela: caminho} dos ficheiros escritos."""
+        return {tabela: s.caminho for tabela, s in self._saidas.items()}
+
+    def gravar(self, tabela, linhas):
+        if tabela not in self._saidas:
+            self._saidas[tabela] = SAIDAS[self.formato](self.pasta, tabela)
+        self._saidas[tabela].gravar(linhas)
+        return len(linhas)
+
+    def fechar(self):
+        if self._fechada:
+            return
+        self._fechada = True
+        for saida in self._saidas.values():
+            saida.fechar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def empacotar(ficheiros, destino):
+    """Junta os ficheiros num ZIP (para uma só transferência); devolve o caminho."""
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as z:
+        for caminho in ficheiros:
+            z.write(caminho, Path(caminho).name)
+    return destino
@@ -0,0 +1,46 @@
+"""
+Acesso aos segredos (conta de serviço Google, GEMINI_API_KEY, utilizadores).
+
+Dentro do Streamlit usa st.secrets; fora dele (threads de tarefas em
+segundo plano já têm st.secrets, mas a linha de comandos não) lê o mesmo
+secrets.toml que o Streamlit procuraria.
+"""
+import os
+import sys
+import tomllib
+from collections.abc import Mapping
+from pathlib import Path
+
+_cache = None
+
+
+def _ficheiros_candidatos():
+    if os.environ.get("HUB_SEGREDOS"):
+        yield Path(os.environ["HUB_SEGREDOS"])
+    yield Path.cwd() / ".streamlit" / "secrets.toml"
+    yield Path(__file__).resolve().parent.parent / ".streamlit" / "secrets.toml"
+    yield Path.home() / ".streamlit" / "secrets.toml"
+
+
+def _ler_ficheiro():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        for caminho in _ficheiros_candidatos():
+            if caminho.is_file():
+                with open(caminho, "rb") as f:
+                    _cache = tomllib.load(f)
+                break
+    return _cache
+
+
+def obter(chave, omissao=None):
+    """Valor de um segredo de topo (dict para secções como gcp_service_account)."""
+    if "streamlit" in sys.modules:
+        import streamlit as st
+        try:
+            valor = st.secrets.get(chave, omissao)
+            return dict(valor) if isinstance(valor, Mapping) else valor
+        except FileNotFoundError:
+            pass
+    return _ler_ficheiro().get(chave, omissao)
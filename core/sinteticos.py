@@ -0,0 +1,492 @@
+"""
+PDFs sintéticos com o layout de cada relatório, para medir os parsers.
+
+    python -m core.sinteticos TIPO --paginas 100 --saida PASTA [--semente 0]
+
+Para cada chave de core.parsers.PARSERS (excepto "texto") há um gerador que
+desenha N páginas com o mesmo layout que os parsers esperam (posições das
+colunas, cabeçalhos, linhas de continuação) e devolve também os registos
+esperados, exactamente no formato que o parser devolve. O PDF é escrito à
+mão (Helvetica, sem dependências); com a mesma semente o resultado é sempre
+o mesmo.
+"""
+import argparse
+import io
+import json
+import random
+import sys
+import zlib
+from datetime import date, timedelta
+from pathlib import Path
+
+
+# ─── Escrita de PDF ───────────────────────────────────────────────────────────
+
+def _escapar(texto):
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def largura_estimada(texto, tamanho):
+    """Largura por excesso do texto em Helvetica (para não sobrepor colunas)."""
+    return len(texto) * tamanho * 0.7
+
+
+class DocumentoPDF:
+    """PDF mínimo só com texto: uma fonte (Helvetica, WinAnsi), posições absolutas."""
+
+    def __init__(self, largura=595, altura=842):
+        self.largura = largura
+        self.altura = altura
+        self._paginas = []
+
+    def nova_pagina(self):
+        self._paginas.append([])
+
+    def texto(self, x, topo, texto, tamanho=7):
+        """Escreve ``texto`` com o canto superior esquerdo em (x, topo), medido do topo."""
+        y = self.altura - topo - tamanho
+        self._paginas[-1].append(f"BT /F1 {tamanho} Tf {x:.1f} {y:.1f} Td ({_escapar(texto)}) Tj ET")
+
+    def __len__(self):
+        return len(self._paginas)
+
+    def bytes(self):
+        objetos = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            None,  # /Pages, preenchido no fim
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        ]
+        filhos = []
+        for conteudo in self._paginas:
+            stream = zlib.compress("\n".join(conteudo).encode("cp1252", errors="replace"))
+            objetos.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream)
+                           + stream + b"\nendstream")
+            objetos.append((
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.largura} {self.altura}] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objetos)} 0 R >>"
+            ).encode())
+            filhos.append(f"{len(objetos)} 0 R")
+        objetos[1] = f"<< /Type /Pages /Kids [{' '.join(filhos)}] /Count {len(filhos)} >>".encode()
+
+        saida = io.BytesIO()
+        saida.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        posicoes = []
+        for n, obj in enumerate(objetos, 1):
+            posicoes.append(saida.tell())
+            saida.write(b"%d 0 obj\n" % n + obj + b"\nendobj\n")
+        xref = saida.tell()
+        saida.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+        for p in posicoes:
+            saida.write(b"%010d 00000 n \n" % p)
+        saida.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (len(objetos) + 1, xref))
+        return saida.getvalue()
+
+
+# ─── Dados aleatórios ─────────────────────────────────────────────────────────
+
+NOMES = ["Maria", "José", "João", "Ana", "Manuel", "Francisco", "António", "Rita",
+         "Inês", "Luís", "Conceição", "Fátima", "Rui", "Sofia", "Paulo", "Helena",
+         "Gonçalo", "Beatriz", "Miguel", "Lúcia", "Tomás", "Célia", "Vítor", "Irene"]
+APELIDOS = ["Silva", "Santos", "Ferreira", "Pereira", "Oliveira", "Costa", "Rodrigues",
+            "Martins", "Jesus", "Sousa", "Fernandes", "Gonçalves", "Gomes", "Lopes",
+            "Marques", "Alves", "Ribeiro", "Pinto", "Carvalho", "Teixeira", "Simões",
+            "Conceição", "Brandão", "Magalhães", "Assunção", "Leitão"]
+PARTICULAS = ["De", "Da", "Dos"]
+
+
+def _nome(rng, minimo=2, maximo=5):
+    """Nome em Title Case (os relatórios GHCE/Honorários escrevem assim, incl. partículas)."""
+    partes = [rng.choice(NOMES)]
+    if rng.random() < 0.4:
+        partes.append(rng.choice(NOMES))
+    while len(partes) < rng.randint(minimo, maximo):
+        if rng.random() < 0.2:
+            partes.append(rng.choice(PARTICULAS))
+        partes.append(rng.choice(APELIDOS))
+    if partes[-1] in PARTICULAS:
+        partes.append(rng.choice(APELIDOS))
+    return " ".join(partes)
+
+
+def _datas(rng, n, ano=2024, mes=None):
+    """n datas ordenadas dentro de um mês."""
+    mes = mes or rng.randint(1, 12)
+    inicio = date(ano, mes, 1)
+    return sorted(inicio + timedelta(days=rng.randint(0, 27)) for _ in range(n))
+
+
+def _distribuir(rng, total, partes):
+    """Divide ``total`` em ``partes`` inteiros >= 0, aleatórios, que somam ``total``."""
+    cortes = sorted(rng.randint(0, total) for _ in range(partes - 1))
+    return [b - a for a, b in zip([0] + cortes, cortes + [total])]
+
+
+# ─── Mapa de Honorários - Detalhe ─────────────────────────────────────────────
+
+HONORARIOS_GRUPOS = {
+    "Anestesia":              ["Anestesiologia"],
+    "Consultas":              ["Anestesiologia", "Urologia", "Cirurgia Geral", "Ortopedia"],
+    "Cirurgias":              ["Cirurgia Geral", "Urologia", "Ortopedia", "Cirurgia Vascular"],
+    "Cirurgias Oftalmologia": ["Oftalmologia"],
+    "Exames Bloco":           ["Gastroenterologia", "Bloco Operatorio Tejo"],
+    "CPRE":                   ["CPRE", "Gastroenterologia"],
+}
+HONORARIOS_ENTIDADES = ["ADSE", "Medis", "Multicare", "Advancecare", "Particular", "SAMS",
+                        "Allianz Saude", "Hospital Garcia De Orta"]
+# Sem dígitos e sem começar por "T"/"PT" (confundia-se com o sufixo do código do acto)
+HONORARIOS_ACTOS = ["Consulta De Anestesia", "Anestesia Para Colonoscopia",
+                    "Anestesia Geral", "Sedação Consciente", "Colecistectomia Laparoscópica",
+                    "Hernioplastia Inguinal", "Artroscopia Do Joelho", "Facoemulsificação",
+                    "Bloqueio Do Plexo Braquial", "Endoscopia Digestiva Alta",
+                    "Colangiopancreatografia Retrógrada", "Cistoscopia"]
+HONORARIOS_LINHAS = 44  # linhas úteis por página de detalhe (paisagem, 7 pt, 10 pt entre linhas)
+
+
+def _valor_fmt(centimos):
+    return f"{centimos / 100:,.2f}"
+
+
+def gerar_honorarios(paginas, rng):
+    """Pág. 1 com o resumo por grupo; págs. 2+ com grupos e linhas de detalhe."""
+    vagas = max(0, paginas - 1) * HONORARIOS_LINHAS
+    grupos = list(HONORARIOS_GRUPOS)
+    if vagas < 2 * len(grupos):
+        grupos = grupos[:vagas // 2]
+    tamanhos = [n + 1 for n in _distribuir(rng, vagas - 2 * len(grupos), len(grupos))]
+
+    linhas, esperados, resumo = [], [], []
+    datas = iter(_datas(rng, vagas))
+    for grupo, n in zip(grupos, tamanhos):
+        linhas.append(grupo)
+        soma = 0
+        for data in sorted(next(datas) for _ in range(n)):
+            processo = str(rng.randint(100000, 9999999))
+            nome = _nome(rng)
+            qtd = -1 if rng.random() < 0.03 else 1
+            centimos = qtd * rng.choice([rng.randint(1500, 30000), rng.randint(100000, 250000)])
+            soma += centimos
+            acto = rng.choice(HONORARIOS_ACTOS)
+            entidade = rng.choice(HONORARIOS_ENTIDADES)
+            codigo = f"{rng.randint(10000, 9999999)}{rng.choice(['', '', 'PT', 'T'])}"
+            cauda = rng.choice(["", "", f" 90.00 {rng.randint(-99, 99)}", " 60.00"])
+            linhas.append(
+                f"{data:%d-%m-%y} {processo}{nome} {rng.choice(HONORARIOS_GRUPOS[grupo])} "
+                f"{rng.randint(100, 9999)} {entidade} {codigo}{acto}{cauda} {qtd} {_valor_fmt(centimos)}"
+            )
+            esperados.append({
+                "data":         f"{data:%d-%m-%Y}",
+                "processo":     processo,
+                "nome":         nome.upper(),
+                "valor":        _valor_fmt(centimos).replace(",", "").replace(".", ","),
+                "procedimento": acto,
+                "entidade":     entidade,
+            })
+        resumo.append((grupo, n, soma))
+
+    doc = DocumentoPDF(842, 595)
+
+    def cabecalho(pag):
+        doc.nova_pagina()
+        doc.texto(30, 20, "Hospital CUF Tejo")
+        doc.texto(30, 30, "Mapa de Honorários - Detalhe", 9)
+        doc.texto(600, 20, "Utilizador: PS_PA_009 Data: 2024-02-01 Hora: 10:15")
+        doc.texto(760, 30, f"Pág. {pag} / {paginas}")
+
+    cabecalho(1)
+    doc.texto(30, 60, "Prestador de Serviços: Serviço de Anestesiologia")
+    doc.texto(30, 80, "Grupo Actos Valor", 8)
+    topo = 95
+    for grupo, n, soma in resumo:
+        doc.texto(30, topo, f"{grupo} {n} {_valor_fmt(soma)}")
+        topo += 10
+    doc.texto(30, topo + 5, f"Total Geral {sum(r[1] for r in resumo)} "
+                            f"{_valor_fmt(sum(r[2] for r in resumo))}")
+
+    for i in range(0, len(linhas), HONORARIOS_LINHAS):
+        cabecalho(len(doc) + 1)
+        doc.texto(30, 50, "Data Doente Serviço Entidade Acto Qtd Valor")
+        for j, linha in enumerate(linhas[i:i + HONORARIOS_LINHAS]):
+            doc.texto(30, 65 + 11 * j, linha)
+    while len(doc) < paginas:
+        cabecalho(len(doc) + 1)
+    return doc.bytes(), esperados
+
+
+# ─── Exames Realizados ────────────────────────────────────────────────────────
+
+EXAMES_GRUPOS = ["Equipa Cirurgica 2", "Endoscopia", "Gastro Bloco", "Exames Especiais"]
+EXAMES_ACTOS = ["Colonoscopia Total", "Endoscopia Digestiva Alta", "Anestesia Geral",
+                "Polipectomia Endoscópica", "Colonoscopia Esquerda", "Ecoendoscopia Alta",
+                "Sedação Profunda", "Gastrostomia Endoscópica Percutânea"]
+EXAMES_LINHAS = 44
+
+
+EXAMES_ESPECIALIDADES = ("GASTROENTEROLO", "GASTROENTEROLO", "CIRURGIA GERAL", "PNEUMOLOGIA")
+
+
+def gerar_exames(paginas, rng, prefixo="CCC", especialidade=EXAMES_ESPECIALIDADES):
+    """
+    Linhas de texto: a 1ª de cada dia traz data, grupo e total; as outras
+    não. Com várias especialidades, cada acto leva uma delas ao acaso; em
+    algumas linhas a especialidade vem colada ao fim do nome
+    (SILVAGASTROENTEROLO6051), como em exportações com o nome a encher a
+    coluna.
+    """
+    especialidades = (especialidade,) if isinstance(especialidade, str) else tuple(especialidade)
+    vagas = paginas * EXAMES_LINHAS
+    linhas, esperados = [], []
+    datas = sorted(set(_datas(rng, max(1, vagas // 6))))
+    por_dia = _distribuir(rng, vagas - len(datas), len(datas))
+    for dia, extra in zip(datas, por_dia):
+        n = extra + 1
+        grupo = rng.choice(EXAMES_GRUPOS)
+        for k in range(n):
+            processo = f"{prefixo}/{rng.randint(100000, 999999)}"
+            nome = _nome(rng).upper()
+            codigo = str(rng.randint(1000, 99999999))
+            acto = rng.choice(EXAMES_ACTOS)
+            separador = "" if rng.random() < 0.1 else " "
+            linha = (f"{processo} {nome}{separador}{rng.choice(especialidades)}{codigo} {acto} "
+                     f"{rng.randint(1, 3)} {rng.choice(['N/N', 'N/N', 'S/N'])}")
+            if k == 0:
+                linha = f"{dia.isoformat()} {grupo} {n} {linha}"
+            linhas.append(linha)
+            esperados.append({"data": dia.isoformat(), "processo": processo, "nome": nome,
+                              "codigo": codigo, "procedimento": acto})
+
+    doc = DocumentoPDF(842, 595)
+    for i in range(paginas):
+        doc.nova_pagina()
+        doc.texto(30, 20, "Hospital CUF Tejo")
+        doc.texto(30, 30, "Exames Realizados", 9)
+        doc.texto(600, 20, "Utilizador: GHCE Data: 2024-02-01 Hora: 10:15")
+        doc.texto(30, 42, "Período entre 2024-01-01 e 2024-12-31")
+        doc.texto(760, 30, f"Pág. {i + 1}/{paginas}")
+        doc.texto(30, 54, "Data Grupo Total Processo Doente Especialidade Acto Qtd Fact")
+        for j, linha in enumerate(linhas[i * EXAMES_LINHAS:(i + 1) * EXAMES_LINHAS]):
+            doc.texto(30, 68 + 11 * j, linha)
+    return doc.bytes(), esperados
+
+
+# ─── GHCE4025R — consultas ────────────────────────────────────────────────────
+
+CONSULTAS_ACTOS = ["Consulta Anestesia", "Consulta Externa", "Consulta Subsequente",
+                   "Primeira Consulta"]
+CONSULTAS_ALTURA = 785  # topo máximo de uma linha de registo
+
+
+def _cabecalho_ghce(doc, pag, paginas):
+    doc.nova_pagina()
+    doc.texto(30, 20, "GHCE4025R Actos Médicos", 9)
+    doc.texto(30, 32, "Hospital CUF Tejo")
+    doc.texto(480, 20, f"Pág. {pag} / {paginas}")
+    doc.texto(30, 50, "Data/Hora")
+    doc.texto(95, 50, "Processo")
+    doc.texto(160, 50, "Nome")
+    doc.texto(420, 50, "N.Benef")
+    doc.texto(470, 50, "Acto")
+
+
+def _linhas_nome(palavras, x_min, x_max, limite, tamanho=7):
+    """Parte o nome em linhas com cada palavra em x_min..x_max e a terminar antes de ``limite``."""
+    linhas, atual, x = [], [], x_min
+    for p in palavras:
+        w = largura_estimada(p, tamanho)
+        if atual and (x > x_max or x + w > limite):
+            linhas.append(atual)
+            atual, x = [], x_min
+        atual.append((x, p))
+        x += w + 6
+    if atual:
+        linhas.append(atual)
+    return linhas
+
+
+def gerar_consultas(paginas, rng, variante="hcis"):
+    """
+    Uma linha por consulta (data, processo, nome, N.Benef, acto), o nome
+    continua nas linhas seguintes se não couber e, por vezes, segue-se
+    "Data de nascimento". HCIS: data e hora coladas e nome em x 155..225;
+    CCC: data e hora separadas, prefixo CCC ou CCO e nome em x 150..400;
+    "misto": as duas, alternadas por página (exportação de vários hospitais).
+    """
+    doc = DocumentoPDF()
+    esperados = []
+    datas = iter(_datas(rng, paginas * 80))
+    for pag in range(1, paginas + 1):
+        _cabecalho_ghce(doc, pag, paginas)
+        modelo = variante if variante != "misto" else ("hcis", "ccc")[pag % 2]
+        topo = 66
+        while True:
+            nome = _nome(rng)
+            if modelo == "ccc":
+                linhas = _linhas_nome(nome.split(), 155, 380, 400)
+            else:
+                linhas = _linhas_nome(nome.split(), 160, 225, 236)
+            nasc = rng.random() < 0.5
+            if topo + 9 * (len(linhas) + nasc) > CONSULTAS_ALTURA:
+                break
+            dia = next(datas)
+            hora = f"{rng.randint(8, 19):02d}:{rng.choice(['00', '15', '30', '45'])}"
+            numero = str(rng.randint(100000, 9999999))
+            if modelo == "ccc":
+                doc.texto(30, topo, dia.isoformat())
+                doc.texto(72, topo, hora)
+                doc.texto(97, topo, f"{rng.choice(['CCC', 'CCO'])}/{numero}")
+            else:
+                doc.texto(30, topo, f"{dia.isoformat()}{hora}")
+                doc.texto(95, topo, f"HCIS/{numero}")
+            if rng.random() < 0.8:
+                doc.texto(420 if modelo == "ccc" else 240, topo, str(rng.randint(10**8, 10**9 - 1)))
+            doc.texto(470 if modelo == "ccc" else 330, topo, rng.choice(CONSULTAS_ACTOS))
+            for linha in linhas:
+                for x, palavra in linha:
+                    doc.texto(x, topo, palavra)
+                topo += 9
+            if nasc:
+                doc.texto(30, topo, f"Data de nascimento: {rng.randint(1930, 2010)}-"
+                                    f"{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+                topo += 9
+            topo += 4
+            esperados.append({"data": f"{dia:%d-%m-%Y}", "processo": numero, "nome": nome})
+    return doc.bytes(), esperados
+
+
+# ─── GHRO4045R — cirurgias ────────────────────────────────────────────────────
+
+CIRURGIAS_ACTOS = ["Colecistectomia Laparoscópica", "Hernioplastia Inguinal",
+                   "Artroscopia Do Joelho", "Anestesia Geral", "Sedação",
+                   "Bloqueio Do Plexo Braquial", "Prótese Total Da Anca",
+                   "Apendicectomia", "Ressecção Transuretral Da Próstata",
+                   "Facoemulsificação Com Lente", "Cistoscopia Rígida"]
+CIRURGIAS_ALTURA = 800
+
+
+def gerar_cirurgias(paginas, rng, prefixo="HCIS", ordem=()):
+    """
+    Pág. 1 de resumo (o parser salta-a); depois, por cirurgia: data, processo
+    e nome (que pode continuar na linha seguinte) à esquerda e os
+    procedimentos "-Nome" em x 300, horário, grau de urgência e equipa.
+    Com vários prefixos, cada cirurgia leva um deles ao acaso; as dos
+    prefixos em ``ordem`` (modelo do CCC) começam pelo nº de ordem na
+    página, antes da data.
+    """
+    prefixos = (prefixo,) if isinstance(prefixo, str) else tuple(prefixo)
+    doc = DocumentoPDF()
+    esperados = []
+    datas = iter(_datas(rng, paginas * 16))
+
+    def cabecalho(pag):
+        doc.nova_pagina()
+        doc.texto(30, 20, "GHRO4045R Cirurgias por Interveniente", 9)
+        doc.texto(30, 32, "Hospital CUF Tejo")
+        doc.texto(480, 20, f"Pág. {pag} / {paginas}")
+
+    cabecalho(1)
+    doc.texto(30, 60, "Período: 2024-01-01 a 2024-12-31")
+    doc.texto(30, 72, "Interveniente: Serviço de Anestesiologia")
+
+    for pag in range(2, paginas + 1):
+        cabecalho(pag)
+        doc.texto(30, 50, "Data Processo Doente")
+        doc.texto(300, 50, "Procedimentos")
+        topo = 66
+        n_ordem = 0
+        while True:
+            dia = next(datas)
+            numero = str(rng.randint(100000, 9999999))
+            nome = _nome(rng, 2, 6).upper()
+            pref = rng.choice(prefixos)
+            inicio = f"{dia.isoformat()} {pref}/{numero} -"
+            if pref in ordem:
+                n_ordem += 1
+                inicio = f"{n_ordem} {inicio}"
+            x = 30 + largura_estimada(inicio + " ", 7)
+            primeira, resto = [], []
+            for p in nome.split():
+                (primeira if not resto and x + largura_estimada(p, 7) < 285 else resto).append(p)
+                x += largura_estimada(p + " ", 7)
+            actos = rng.sample(CIRURGIAS_ACTOS, rng.randint(1, 3))
+            linhas = max(3, len(actos) + (resto != []))
+            if topo + 11 * (linhas + 3) > CIRURGIAS_ALTURA:
+                break
+
+            esquerda = [" ".join([inicio] + primeira)]
+            if resto:
+                esquerda.append(" ".join(resto))
+            hora = rng.randint(8, 17)
+            esquerda.append(f"Início: {hora:02d}:00 Fim: {hora + 1:02d}:30 Sala: {rng.randint(1, 6)}")
+            while len(esquerda) < linhas:
+                esquerda.append(None)
+            for k in range(linhas):
+                if esquerda[k]:
+                    doc.texto(30 if k == 0 else 80, topo, esquerda[k])
+                if k < len(actos):
+                    doc.texto(300, topo, f"-{actos[k]}")
+                topo += 11
+            urgencia = rng.choice(["Programada", "Programada", "Urgente"])
+            doc.texto(30, topo, f"Gr. de urgência: {urgencia}")
+            doc.texto(30, topo + 11, "Responsável:")
+            doc.texto(150, topo + 11, f"Dr. {_nome(rng, 2, 2)}")
+            doc.texto(150, topo + 22, f"Anestesista: Dr. {_nome(rng, 2, 2)}")
+            topo += 37
+            esperados.append({
+                "data":          f"{dia:%d-%m-%Y}",
+                "processo":      numero,
+                "doente":        nome,
+                "procedimentos": " | ".join(actos),
+                "urgencia":      urgencia,
+            })
+    return doc.bytes(), esperados
+
+
+# ─── Registo dos geradores ────────────────────────────────────────────────────
+
+# Tipo de relatório (chave de PARSERS) → gerador(paginas, rng) → (pdf_bytes, esperados).
+# As chaves "_ccc" geram exportações de vários hospitais (prefixos e modelos
+# misturados no mesmo PDF, com os registos do CCC no modelo do CCC), que o
+# parser único da família lê de uma vez.
+GERADORES = {
+    "honorarios":    gerar_honorarios,
+    "cirurgias":     lambda paginas, rng: gerar_cirurgias(paginas, rng, "HCIS"),
+    "cirurgias_ccc": lambda paginas, rng: gerar_cirurgias(paginas, rng, ("HCIS", "CCC", "CCO"), ordem=("CCC",)),
+    "exames":        gerar_exames,
+    "consultas":     lambda paginas, rng: gerar_consultas(paginas, rng, "hcis"),
+    "consultas_ccc": lambda paginas, rng: gerar_consultas(paginas, rng, "misto"),
+}
+
+
+def gerar(tipo, paginas, semente=0):
+    """PDF sintético de ``tipo`` com ``paginas`` páginas → (pdf_bytes, registos esperados)."""
+    if tipo not in GERADORES:
+        raise ValueError(f"Sem gerador para o tipo {tipo!r}")
+    return GERADORES[tipo](max(1, paginas), random.Random(f"{tipo}:{semente}"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m core.sinteticos",
+        description="Gera um PDF sintético e o JSON com os registos esperados.",
+    )
+    parser.add_argument("tipo", choices=list(GERADORES))
+    parser.add_argument("--paginas", type=int, default=10, help="Número de páginas (1–2000)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", default=".", help="Pasta onde gravar o PDF e o JSON")
+    args = parser.parse_args(argv)
+
+    pdf, esperados = gerar(args.tipo, args.paginas, args.semente)
+    pasta = Path(args.saida)
+    pasta.mkdir(parents=True, exist_ok=True)
+    base = pasta / f"{args.tipo}_{args.paginas}p_s{args.semente}"
+    base.with_suffix(".pdf").write_bytes(pdf)
+    base.with_suffix(".json").write_text(
+        json.dumps(esperados, ensure_ascii=False, indent=1), encoding="utf-8"
+    )
+    print(f"{base.with_suffix('.pdf')}: {args.paginas} páginas, {len(esperados)} registos, "
+          f"{len(pdf) / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
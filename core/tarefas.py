@@ -0,0 +1,225 @@
+"""
+Tarefas em segundo plano que sobrevivem a reruns, refresh e desconexões.
+
+Uma página submete uma tarefa e recebe um ID; o trabalho corre numa thread
+do servidor (não na thread do script Streamlit) e vai escrevendo o
+progresso numa tabela SQLite local. Qualquer sessão — incluindo uma nova,
+depois de fechar o separador — pode consultar o estado e o resultado pelo
+ID ou pela lista de tarefas do utilizador. Várias tarefas correm em
+simultâneo.
+
+As funções de cada tipo de tarefa estão em core.trabalhos.
+"""
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from core import metricas
+from core.caminhos import pasta_dados
+from core.uploads import e_caminho
+
+CAMINHO_BD = "tarefas.sqlite3"
+NUM_TRABALHADORES = 4
+DIAS_RETENCAO = 7
+
+PENDENTE     = "pendente"
+EM_CURSO     = "em_curso"
+CONCLUIDA    = "concluida"
+ERRO         = "erro"
+INTERROMPIDA = "interrompida"
+TERMINAIS    = {CONCLUIDA, ERRO, INTERROMPIDA}
+
+_executor = None
+_lock = threading.Lock()
+
+
+# ─── Tabela de tarefas ────────────────────────────────────────────────────────
+
+def _ligar():
+    con = sqlite3.connect(pasta_dados() / CAMINHO_BD, timeout=30)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS tarefas ("
+        "id TEXT PRIMARY KEY, tipo TEXT NOT NULL, utilizador TEXT, "
+        "estado TEXT NOT NULL, progresso REAL NOT NULL DEFAULT 0, "
+        "mensagem TEXT, parametros TEXT, resultado TEXT, erro TEXT, "
+        "criada_em TEXT NOT NULL, atualizada_em TEXT NOT NULL)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS ix_tarefas_utilizador "
+        "ON tarefas (utilizador, criada_em)"
+    )
+    return con
+
+
+def _agora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _atualizar(tarefa_id, **campos):
+    campos["atualizada_em"] = _agora()
+    for chave in ("resultado", "parametros"):
+        if chave in campos:
+            campos[chave] = json.dumps(campos[chave], ensure_ascii=False)
+    with closing(_ligar()) as con, con:
+        con.execute(
+            f"UPDATE tarefas SET {', '.join(f'{c} = ?' for c in campos)} WHERE id = ?",
+            (*campos.values(), tarefa_id),
+        )
+
+
+def _linha_para_dict(r):
+    t = dict(r)
+    for chave in ("resultado", "parametros"):
+        t[chave] = json.loads(t[chave]) if t[chave] else None
+    return t
+
+
+def obter(tarefa_id):
+    """Estado actual de uma tarefa (dict) ou None se não existir."""
+    _obter_executor()
+    with closing(_ligar()) as con:
+        r = con.execute("SELECT * FROM tarefas WHERE id = ?", (tarefa_id,)).fetchone()
+    return _linha_para_dict(r) if r else None
+
+
+def listar(utilizador=None, tipo=None, limite=20):
+    """Tarefas mais recentes, opcionalmente de um utilizador e/ou tipo."""
+    filtros, args = [], []
+    if utilizador:
+        filtros.append("utilizador = ?")
+        args.append(utilizador)
+    if tipo:
+        filtros.append("tipo = ?")
+        args.append(tipo)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    _obter_executor()
+    with closing(_ligar()) as con:
+        cur = con.execute(
+            f"SELECT * FROM tarefas {where} ORDER BY criada_em DESC LIMIT ?",
+            (*args, limite),
+        )
+        return [_linha_para_dict(r) for r in cur]
+
+
+def pasta_tarefa(tarefa_id):
+    """Pasta onde a tarefa guarda os ficheiros recebidos (PDFs)."""
+    return pasta_dados("tarefas", tarefa_id)
+
+
+# ─── Execução ─────────────────────────────────────────────────────────────────
+
+class Contexto:
+    """Passado à função da tarefa: parâmetros, pasta e canal de progresso."""
+
+    def __init__(self, tarefa_id, utilizador, parametros):
+        self.id = tarefa_id
+        self.utilizador = utilizador
+        self.parametros = parametros
+        self.pasta = pasta_tarefa(tarefa_id)
+        self._ultimo = 0.0
+
+    def reportar(self, progresso, mensagem=None):
+        """Regista progresso (0–1) e mensagem; no máximo ~2 escritas por segundo."""
+        agora = time.monotonic()
+        if progresso < 1.0 and agora - self._ultimo < 0.5:
+            return
+        self._ultimo = agora
+        campos = {"progresso": float(min(max(progresso, 0.0), 1.0))}
+        if mensagem is not None:
+            campos["mensagem"] = mensagem
+        _atualizar(self.id, **campos)
+
+
+def _obter_executor():
+    """Threads de trabalho partilhadas; na primeira utilização marca como
+    interrompidas as tarefas que estavam a correr quando o servidor parou."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            with closing(_ligar()) as con, con:
+                con.execute(
+                    "UPDATE tarefas SET estado = ?, mensagem = ?, atualizada_em = ? "
+                    "WHERE estado IN (?, ?)",
+                    (INTERROMPIDA, "Servidor reiniciado durante a execução.",
+                     _agora(), PENDENTE, EM_CURSO),
+                )
+            _limpar_antigas()
+            _executor = ThreadPoolExecutor(
+                max_workers=NUM_TRABALHADORES, thread_name_prefix="tarefa"
+            )
+        return _executor
+
+
+def _limpar_antigas():
+    limite = (datetime.now() - timedelta(days=DIAS_RETENCAO)).strftime("%Y-%m-%d %H:%M:%S")
+    with closing(_ligar()) as con, con:
+        antigas = [r["id"] for r in con.execute(
+            "SELECT id FROM tarefas WHERE criada_em < ?", (limite,)
+        )]
+        con.execute("DELETE FROM tarefas WHERE criada_em < ?", (limite,))
+    for tarefa_id in antigas:
+        shutil.rmtree(pasta_dados("tarefas") / tarefa_id, ignore_errors=True)
+
+
+def _executar(funcao, ctx, tipo):
+    _atualizar(ctx.id, estado=EM_CURSO, mensagem="A iniciar...")
+    try:
+        with metricas.medir() as medicao:
+            resultado = funcao(ctx)
+        if isinstance(resultado, dict):
+            # Tempos e contadores da tarefa (ver core.metricas)
+            resultado["metricas"] = metricas.relatorio(f"tarefa_{tipo}", medicao, tarefa=ctx.id)
+            metricas.gravar(resultado["metricas"])
+        _atualizar(ctx.id, estado=CONCLUIDA, progresso=1.0,
+                   mensagem="Concluída.", resultado=resultado)
+    except Exception as e:
+        _atualizar(ctx.id, estado=ERRO, mensagem=f"Erro: {e}",
+                   erro=traceback.format_exc())
+
+
+def submeter(tipo, utilizador, parametros=None, ficheiros=()):
+    """
+    Cria e arranca uma tarefa. "ficheiros" = [(nome, bytes ou caminho)] é
+    copiado para a pasta da tarefa (que sobrevive à sessão) e os caminhos
+    ficam em parametros["ficheiros"] como [[nome, caminho], ...], pela
+    mesma ordem. Devolve o ID da tarefa.
+    """
+    from core.trabalhos import TRABALHOS
+
+    funcao = TRABALHOS[tipo]
+    executor = _obter_executor()
+    tarefa_id = uuid.uuid4().hex[:12]
+    parametros = dict(parametros or {})
+
+    pasta = pasta_tarefa(tarefa_id)
+    caminhos = []
+    for i, (nome, conteudo) in enumerate(ficheiros):
+        caminho = pasta / f"{i:03d}.pdf"
+        if e_caminho(conteudo):
+            shutil.copyfile(conteudo, caminho)
+        else:
+            caminho.write_bytes(conteudo)
+        caminhos.append([nome, str(caminho)])
+    if caminhos:
+        parametros["ficheiros"] = caminhos
+
+    agora = _agora()
+    with closing(_ligar()) as con, con:
+        con.execute(
+            "INSERT INTO tarefas (id, tipo, utilizador, estado, progresso, mensagem, "
+            "parametros, criada_em, atualizada_em) VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)",
+            (tarefa_id, tipo, utilizador, PENDENTE, "Em fila...",
+             json.dumps(parametros, ensure_ascii=False), agora, agora),
+        )
+
+    executor.submit(_executar, funcao, Contexto(tarefa_id, utilizador, parametros), tipo)
+    return tarefa_id
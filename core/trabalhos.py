@@ -0,0 +1,125 @@
+"""
+Funções das tarefas em segundo plano (ver core.tarefas).
+
+Cada função recebe um core.tarefas.Contexto e devolve um resultado
+serializável em JSON. Correm fora da thread do script Streamlit, por isso
+não usam st.* — os segredos vêm de core.segredos.
+"""
+from datetime import datetime
+
+from core import cobertura
+from core.importacao import gravar, linhas_para_folha, obter_folha
+from core.planilha import abrir_planilha
+from core.processamento import processar_lote, resultado_ignorado
+
+
+def _ficheiros(ctx):
+    """[(nome, caminho)] dos PDFs da tarefa; os parsers lêem-nos do disco."""
+    return [(nome, caminho) for nome, caminho in ctx.parametros["ficheiros"]]
+
+
+# ─── 01: Mapa de Honorários (sem IA) ──────────────────────────────────────────
+
+def trabalho_honorarios(ctx):
+    """
+    Parsing de todos os PDFs em paralelo e gravação na aba 'pagos', PDF a PDF.
+    Os PDFs já gravados nesta planilha (ou repetidos) são recusados antes do
+    parsing (core.cobertura), e um PDF de outro tipo de relatório vem com
+    "erro" pela verificação do cabeçalho.
+    """
+    sheet_url = ctx.parametros["sheet_url"]
+    data_hoje = datetime.now().strftime("%d-%m-%Y %H:%M")
+    ficheiros = _ficheiros(ctx)
+    indice = cobertura.Indice(sheet_url)
+    hashes = [cobertura.hash_ficheiro(caminho) for _, caminho in ficheiros]
+    recusados = cobertura.recusar_duplicados(hashes, indice)
+    a_ler = [i for i in range(len(ficheiros)) if i not in recusados]
+
+    def ao_concluir(concluidos, total, resultado):
+        ctx.reportar(0.5 * concluidos / total,
+                     f"📄 {concluidos}/{total} PDFs lidos — {resultado['nome']}")
+
+    ctx.reportar(0.0, f"📄 A ler {len(a_ler)} PDF(s) em paralelo...")
+    lidos = dict(zip(a_ler, processar_lote(
+        "honorarios", [ficheiros[i] for i in a_ler], ao_concluir,
+        verificar=True,
+    )))
+    resultados = [
+        lidos.get(i) or resultado_ignorado("honorarios", nome, recusados[i])
+        for i, (nome, _) in enumerate(ficheiros)
+    ]
+
+    worksheet = obter_folha(abrir_planilha(sheet_url), "pagos")
+    resumo = []
+    for idx, resultado in enumerate(resultados):
+        nome_pdf = resultado["nome"]
+        linhas = linhas_para_folha("honorarios", resultado["registos"], nome_pdf, data_hoje)
+        if linhas:
+            ctx.reportar(0.5 + 0.5 * idx / len(resultados), f"📤 A gravar {nome_pdf}...")
+            gravar(worksheet, sheet_url, "pagos", linhas, ctx.utilizador)
+            cobertura.registar(sheet_url, "pagos", {**resultado, "hash": hashes[idx]})
+        resumo.append({
+            "nome":        nome_pdf,
+            "linhas":      len(linhas),
+            "erro":        resultado["erro"],
+            "ignorado":    resultado.get("ignorado"),
+            "amostra":     resultado["amostra"],
+            "verificacao": resultado.get("verificacao"),
+            "falhas":      resultado.get("falhas"),
+        })
+
+    return {"ficheiros": resumo, "total": sum(f["linhas"] for f in resumo)}
+
+
+# ─── 07: Honorários com IA (Fases 1 e 2) ─────────────────────────────────────
+
+def trabalho_honorarios_ia(ctx):
+    """
+    Extração por IA e leitura do total declarado; a exportação fica para a página.
+    As páginas com erro são pedidas outra vez no fim da Fase 1. Com
+    parametros["anterior"] (o resultado de uma corrida destes PDFs) só as
+    páginas que lá falharam são repetidas e o total declarado é o mesmo.
+    """
+    from core import ia
+
+    model = ia.obter_modelo()
+    data_exec = datetime.now().strftime("%d-%m-%Y %H:%M")
+    ficheiros = _ficheiros(ctx)
+    anterior = ctx.parametros.get("anterior")
+
+    if anterior:
+        paginas, erros = anterior["paginas"], anterior["erros"]
+    else:
+        paginas, erros = ia.extrair_paginas(
+            ficheiros, model,
+            reportar=lambda fracao, mensagem: ctx.reportar(0.8 * fracao, mensagem),
+            utilizador=ctx.utilizador,
+        )
+    ia.repetir_falhadas(
+        paginas, ficheiros, model,
+        reportar=lambda fracao, mensagem: ctx.reportar(0.8 + 0.1 * fracao, mensagem),
+        utilizador=ctx.utilizador,
+    )
+    linhas = ia.linhas_das_paginas(paginas, data_exec)
+
+    if anterior:
+        total_esperado = anterior["total_esperado"]
+        metodo_verificacao = anterior["metodo_verificacao"]
+    else:
+        ctx.reportar(0.9, "🔍 Fase 2/2 — A ler total declarado no PDF...")
+        total_esperado, metodo_verificacao = ia.obter_total_esperado(ficheiros, model, ctx.utilizador)
+
+    return {
+        "linhas": linhas,
+        "total_extraido": len(linhas),
+        "total_esperado": total_esperado,
+        "metodo_verificacao": metodo_verificacao,
+        "erros": erros,
+        "paginas": paginas,
+    }
+
+
+TRABALHOS = {
+    "honorarios":    trabalho_honorarios,
+    "honorarios_ia": trabalho_honorarios_ia,
+}
@@ -0,0 +1,247 @@
+"""
+Componentes Streamlit partilhados pelas páginas.
+"""
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import streamlit as st
+
+from core import cobertura, metricas, monitor, saidas, tarefas
+from core.importacao import TABELA_DO_TIPO, linhas_para_folha
+from core.processamento import processar_lote, resultado_ignorado
+from core.uploads import PastaSessao
+
+
+def acompanhar_tarefa(tarefa_id, intervalo=1.0):
+    """
+    Mostra o progresso de uma tarefa em segundo plano até terminar e devolve
+    o seu estado final. Se a página for fechada ou recarregada, só o
+    acompanhamento pára — a tarefa continua no servidor.
+    """
+    st.caption(f"🆔 Tarefa `{tarefa_id}` — pode fechar a página e voltar mais tarde.")
+    barra = st.progress(0.0)
+    msg = st.empty()
+    while True:
+        t = tarefas.obter(tarefa_id)
+        if t is None:
+            msg.error("Tarefa não encontrada.")
+            return None
+        barra.progress(t["progresso"])
+        msg.info(t["mensagem"] or "…")
+        if t["estado"] in tarefas.TERMINAIS:
+            barra.empty()
+            msg.empty()
+            if t["estado"] != tarefas.CONCLUIDA:
+                st.error(f"❌ {t['mensagem']}")
+                if t["erro"]:
+                    with st.expander("Detalhes do erro"):
+                        st.code(t["erro"])
+            return t
+        time.sleep(intervalo)
+
+
+def tarefa_da_sessao(chave, tipo):
+    """
+    ID da tarefa acompanhada nesta página: a da sessão ou, numa sessão nova,
+    a última do mesmo tipo submetida pelo utilizador que ainda esteja a correr.
+    """
+    tarefa_id = st.session_state.get(chave)
+    if tarefa_id:
+        return tarefa_id
+    recentes = tarefas.listar(st.session_state.get("username"), tipo, limite=1)
+    if recentes and recentes[0]["estado"] not in tarefas.TERMINAIS:
+        st.session_state[chave] = recentes[0]["id"]
+        return recentes[0]["id"]
+    return None
+
+
+# ─── Uploads: spool em disco, parsing memoizado e gravação uma só vez ────────
+
+def pasta_uploads():
+    """Pasta temporária da sessão para os uploads (core.uploads), criada na primeira utilização."""
+    if "_pasta_uploads" not in st.session_state:
+        st.session_state["_pasta_uploads"] = PastaSessao()
+    return st.session_state["_pasta_uploads"]
+
+
+def guardar_uploads(uploads, grupo):
+    """
+    Guarda os ficheiros do file_uploader na pasta da sessão e devolve
+    [(nome, caminho, sha256)] pela ordem de upload. ``grupo`` é a página:
+    os que deixaram de estar carregados nela são apagados do disco, se
+    nenhuma outra página os tiver (core.uploads).
+    """
+    pasta = pasta_uploads()
+    with metricas.etapa("uploads.spool"):
+        guardados = [pasta.guardar(f, grupo) for f in uploads]
+    pasta.manter(uploads, grupo)
+    return guardados
+
+
+def processar_uploads(tipo, uploads, grupo):
+    """
+    processar_lote para os ficheiros do file_uploader, memoizado na sessão
+    pelo hash do conteúdo: os reruns (qualquer interacção com um widget)
+    devolvem logo o resultado em vez de voltar a ler os PDFs. Cada
+    resultado traz também "hash". Os PDFs são guardados em disco
+    (guardar_uploads, no ``grupo`` da página) e os processos de parsing
+    recebem só o caminho. O
+    cabeçalho de cada PDF é verificado antes do parsing: um relatório de
+    outro tipo vem logo com "erro" (ver processamento.processar_ficheiro).
+
+    Com a planilha configurada, o índice de cobertura (core.cobertura)
+    decide antes do parsing: um PDF repetido no carregamento ou igual a um
+    já gravado vem com "ignorado". A decisão fica memoizada com o resultado, por isso gravar o
+    ficheiro não o faz passar a "ignorado" no rerun seguinte.
+    """
+    cache = st.session_state.setdefault("_parsing_uploads", {})
+    guardados = guardar_uploads(uploads, grupo)
+    chaves = [(tipo, sha) for _, _, sha in guardados]
+    repetidos = cobertura.recusar_duplicados([sha for _, _, sha in guardados])
+
+    em_falta = [i for i, chave in enumerate(chaves) if chave not in cache and i not in repetidos]
+    metricas.contar("uploads.em_cache", len(chaves) - len(em_falta) - len(repetidos))
+    monitor.contar("hub_cache_total", len(chaves) - len(em_falta) - len(repetidos),
+                   cache="uploads", resultado="acerto")
+    monitor.contar("hub_cache_total", len(em_falta), cache="uploads", resultado="falha")
+    novos = {}
+    if em_falta:
+        indice = cobertura.Indice(st.session_state.get("sheet_url", "").strip())
+        ja_gravados = cobertura.recusar_duplicados([chaves[i][1] for i in em_falta], indice)
+        for j, motivo in ja_gravados.items():
+            i = em_falta[j]
+            novos[i] = cache[chaves[i]] = resultado_ignorado(tipo, guardados[i][0], motivo)
+            metricas.contar("cobertura.ficheiros_duplicados")
+        a_ler = [i for j, i in enumerate(em_falta) if j not in ja_gravados]
+        novos.update(zip(a_ler, processar_lote(
+            tipo, [guardados[i][:2] for i in a_ler], verificar=True,
+        )))
+        for i in a_ler:
+            # Um processo de trabalho que morreu é transitório: volta a tentar no próximo rerun
+            if not (novos[i]["erro"] or "").startswith("BrokenProcessPool"):
+                cache[chaves[i]] = novos[i]
+    for i, motivo in repetidos.items():
+        novos[i] = resultado_ignorado(tipo, guardados[i][0], motivo)
+
+    resultados = [
+        {**(novos.get(i) or cache[chave]), "nome": nome, "hash": chave[1]}
+        for i, ((nome, _, _), chave) in enumerate(zip(guardados, chaves))
+    ]
+
+    atuais = set(chaves)
+    for chave in [c for c in cache if c[0] == tipo and c not in atuais]:
+        del cache[chave]
+    return resultados
+
+
+def ja_exportado(sheet_url, tabela, res):
+    """True se este ficheiro (pelo hash) já foi gravado nesta aba nesta sessão."""
+    return (sheet_url, tabela, res["hash"]) in st.session_state.get("_exportados", set())
+
+
+def marcar_exportado(sheet_url, tabela, res):
+    """Marca o ficheiro como gravado nesta sessão e no índice de cobertura da planilha."""
+    st.session_state.setdefault("_exportados", set()).add((sheet_url, tabela, res["hash"]))
+    cobertura.registar(sheet_url, tabela, res)
+
+
+def ficheiro_para_transferir(resultados, formato):
+    """
+    Escreve as linhas dos resultados, com o layout de cada aba, num ficheiro
+    por aba no ``formato`` (core.saidas), PDF a PDF, na pasta da sessão.
+    Devolve (caminho, nome, mime) do ficheiro — ou de um ZIP, se há mais de
+    uma aba — para um st.download_button. Memoizado por formato e ficheiros.
+    """
+    chave = (formato, tuple(res["hash"] for res in resultados))
+    cache = st.session_state.setdefault("_transferencias", {})
+    monitor.contar("hub_cache_total", cache="transferencias",
+                   resultado="acerto" if chave in cache else "falha")
+    if chave not in cache:
+        gravado_em = datetime.now().strftime("%d-%m-%Y %H:%M")
+        pasta = pasta_uploads().pasta / "saidas" / uuid.uuid4().hex[:8]
+        with metricas.etapa("saidas." + formato), saidas.Exportacao(pasta, formato) as saida:
+            for res in resultados:
+                saida.gravar(
+                    TABELA_DO_TIPO[res["tipo"]],
+                    linhas_para_folha(res["tipo"], res["registos"], res["nome"], gravado_em),
+                )
+        ficheiros = list(saida.ficheiros.values())
+        if len(ficheiros) == 1:
+            caminho, mime = ficheiros[0], saidas.MIME[formato]
+        else:
+            caminho, mime = saidas.empacotar(ficheiros, pasta / "abas.zip"), saidas.MIME["zip"]
+        cache[chave] = (str(caminho), Path(caminho).name, mime)
+    return cache[chave]
+
+
+def avisar_falhas(nome, falhas):
+    """
+    Aviso com as páginas de um PDF que não foi possível ler (o resto do PDF
+    foi lido). ``falhas`` é {página: erro}; vindo de JSON, as páginas são texto.
+    """
+    if not falhas:
+        return
+    paginas = sorted(falhas.items(), key=lambda p: int(p[0]))
+    st.warning(
+        f"⚠️ **{nome}** — {len(paginas)} página(s) com erro, não lida(s): "
+        f"{', '.join(str(p) for p, _ in paginas)}. O resto do PDF foi lido."
+    )
+    with st.expander("Detalhes"):
+        st.code("\n".join(f"pág. {p}: {erro}" for p, erro in paginas))
+
+
+# ─── Tempos e contadores da corrida (core.metricas) ──────────────────────────
+
+@contextmanager
+def medir_corrida(origem, medicao=None):
+    """
+    Mede o que corre dentro do bloco (parsing, chamadas ao Gemini e ao
+    Sheets); passar a medição devolvida a um segundo bloco do mesmo rerun
+    junta-os no mesmo relatório. Se houve trabalho — um rerun que só
+    reutiliza resultados em memória não conta — o relatório fica na sessão
+    e em dados/relatorios/, e mostrar_relatorio(origem) mostra-o.
+    """
+    with metricas.medir(medicao) as medicao:
+        try:
+            yield medicao
+        finally:
+            if set(medicao.contadores) - {"uploads.em_cache"}:
+                rel = metricas.relatorio(origem, medicao, utilizador=st.session_state.get("username"))
+                metricas.gravar(rel)
+                st.session_state[f"_relatorio_{origem}"] = rel
+
+
+def mostrar_relatorio(rel_ou_origem):
+    """Painel recolhido com os tempos por etapa e por ficheiro e o JSON para descarregar."""
+    rel = rel_ou_origem
+    if isinstance(rel_ou_origem, str):
+        rel = st.session_state.get(f"_relatorio_{rel_ou_origem}")
+    if not rel:
+        return
+    with st.expander(f"⏱️ Tempos e contadores — {rel['segundos']:.1f} s"):
+        st.caption(f"{rel['origem']} · {rel['inicio']} · versão {rel['versao'] or '?'}")
+        if rel["etapas"]:
+            st.dataframe(metricas.linhas_etapas(rel), hide_index=True, use_container_width=True)
+        if rel["contadores"]:
+            st.write(" · ".join(f"**{k}**: {v:,}".replace(",", " ") for k, v in rel["contadores"].items()))
+        if rel["ficheiros"]:
+            st.dataframe(
+                [
+                    {"Ficheiro": f["nome"], "Tipo": f["tipo"], "Páginas": f["paginas"],
+                     "Registos": f["registos"], "Segundos": f["segundos"],
+                     **{e: d["segundos"] for e, d in f.get("etapas", {}).items()}}
+                    for f in rel["ficheiros"]
+                ],
+                hide_index=True, use_container_width=True,
+            )
+        st.download_button(
+            "⬇️ Relatório JSON",
+            json.dumps(rel, ensure_ascii=False, indent=1),
+            file_name=f"relatorio_{rel['origem']}_{rel['inicio'].replace(':', '')}.json",
+            mime="application/json",
+            key=f"relatorio_{rel['origem']}_{rel['inicio']}",
+        )
@@ -0,0 +1,127 @@
+"""
+PDFs carregados guardados em disco, numa pasta temporária por sessão, em
+vez de bytes em memória.
+
+O file_uploader do Streamlit já guarda cada ficheiro em memória; copiá-lo
+com getvalue(), mandá-lo em pickle para um processo de parsing e guardá-lo
+na sessão até à exportação multiplicava essa memória por utilizador. Aqui
+cada upload é escrito uma vez em disco (sem cópia intermédia) e daí em
+diante só circula o caminho: os processos de parsing e as tarefas abrem o
+ficheiro mapeado em memória (abrir_fonte), que fica na cache de páginas do
+sistema e é partilhado entre processos.
+
+    pasta = PastaSessao()                                   # uma por sessão (core.ui)
+    nome, caminho, sha = pasta.guardar(upload, "exames")    # reruns reutilizam o ficheiro
+    pasta.manter(uploads, "exames")     # apaga os que a página deixou de ter carregados
+    with abrir_fonte(caminho) as fluxo: ...                 # mmap (ou BytesIO para bytes)
+
+Cada página guarda os seus uploads com o seu grupo: manter só esquece os
+do grupo dado, e um ficheiro só é apagado do disco quando nenhum grupo o
+tem (o mesmo PDF carregado em duas páginas fica enquanto uma o tiver).
+
+A pasta é apagada quando a sessão termina (o objecto guardado na sessão é
+libertado) e, para servidores que pararam sem limpar, as pastas com mais
+de HORAS_RETENCAO são apagadas ao criar uma nova.
+"""
+import hashlib
+import io
+import mmap
+import os
+import shutil
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+
+from core.caminhos import pasta_dados
+
+PASTA_UPLOADS = "uploads"
+HORAS_RETENCAO = 24
+
+
+def e_caminho(fonte):
+    """True se ``fonte`` é o caminho de um ficheiro (e não os bytes do PDF)."""
+    return isinstance(fonte, (str, os.PathLike))
+
+
+def tamanho(fonte):
+    """Tamanho em bytes de um PDF dado por bytes ou por caminho."""
+    return os.path.getsize(fonte) if e_caminho(fonte) else len(fonte)
+
+
+@contextmanager
+def abrir_fonte(fonte):
+    """
+    Fluxo binário de leitura para um PDF dado por bytes (BytesIO) ou por
+    caminho (mapeado em memória; um ficheiro vazio é aberto normalmente).
+    """
+    if not e_caminho(fonte):
+        yield io.BytesIO(fonte)
+        return
+    with open(fonte, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield f
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            yield mapa
+
+
+def _limpar_orfas():
+    """Apaga pastas de sessões antigas (servidor parado sem as limpar)."""
+    limite = time.time() - HORAS_RETENCAO * 3600
+    for pasta in pasta_dados(PASTA_UPLOADS).iterdir():
+        try:
+            if pasta.is_dir() and pasta.stat().st_mtime < limite:
+                shutil.rmtree(pasta, ignore_errors=True)
+        except OSError:
+            pass
+
+
+class PastaSessao:
+    """Pasta temporária com os uploads de uma sessão, apagada quando a sessão termina."""
+
+    def __init__(self):
+        _limpar_orfas()
+        self.pasta = pasta_dados(PASTA_UPLOADS, uuid.uuid4().hex[:12])
+        self._guardados = {}    # grupo -> {file_id do upload: (caminho, sha256)}
+        self._finalizar = weakref.finalize(self, shutil.rmtree, str(self.pasta), True)
+
+    def guardar(self, upload, grupo=""):
+        """
+        Escreve o upload na pasta (uma vez por ficheiro carregado) e devolve
+        (nome, caminho, sha256). O nome do ficheiro em disco é o hash, por
+        isso o mesmo PDF carregado duas vezes ocupa o disco uma só vez.
+        """
+        guardados = self._guardados.setdefault(grupo, {})
+        chave = getattr(upload, "file_id", None) or id(upload)
+        if chave not in guardados:
+            buf = upload.getbuffer()
+            try:
+                sha = hashlib.sha256(buf).hexdigest()
+                caminho = self.pasta / f"{sha}.pdf"
+                if not caminho.exists():
+                    caminho.write_bytes(buf)
+            finally:
+                buf.release()
+            guardados[chave] = (str(caminho), sha)
+        caminho, sha = guardados[chave]
+        return upload.name, caminho, sha
+
+    def manter(self, uploads, grupo=""):
+        """
+        Esquece os uploads do grupo que já não estão carregados e apaga do
+        disco os ficheiros que nenhum grupo tem.
+        """
+        atuais = {getattr(u, "file_id", None) or id(u) for u in uploads}
+        guardados = self._guardados.get(grupo, {})
+        for chave in [c for c in guardados if c not in atuais]:
+            del guardados[chave]
+        vivos = {c for g in self._guardados.values() for c, _ in g.values()}
+        for ficheiro in self.pasta.glob("*.pdf"):
+            if str(ficheiro) not in vivos:
+                ficheiro.unlink(missing_ok=True)
+
+    def limpar(self):
+        """Apaga já a pasta (p.ex. ao sair), sem esperar pelo fim da sessão."""
+        self._guardados.clear()
+        self._finalizar()
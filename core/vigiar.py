@@ -0,0 +1,190 @@
+"""
+Serviço de importação automática a partir de uma pasta vigiada.
+
+    python -m core.vigiar PASTA --planilha URL [--csv PASTA_SAIDA]
+                                [--intervalo 2] [--estabilidade 3]
+
+As secretárias largam os PDFs exportados (GHRO4045R, GHCE4025R, Mapa de
+Honorários, Exames Realizados) na pasta; cada ficheiro é importado assim
+que deixa de crescer: o tipo é detectado pelo cabeçalho, o parsing usa os
+parsers das páginas e as linhas vão para a aba respectiva (mesmo layout e
+espelho local que a importação pela interface). Depois o PDF é movido para
+"importados/" ou, se falhar, para "falhados/" com um .txt a explicar o erro.
+
+Um PDF igual (mesmo sha256) a um já gravado na planilha (core.cobertura)
+ou já importado por este serviço não é lido: vai para "repetidos/", também
+com um .txt. As linhas são gravadas primeiro na planilha e só depois no
+CSV, por isso um erro do Sheets (que deixa o PDF na pasta para a próxima
+verificação) não deixa no CSV linhas que voltariam a ser acrescentadas.
+
+A pasta é verificada por polling (sem dependências extra); um ficheiro só
+é considerado completo quando o tamanho e a data de modificação não mudam
+durante "estabilidade" segundos e termina com o marcador %%EOF.
+"""
+import argparse
+import logging
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from core import cobertura, processamento
+from core.importar import DestinoCSV, DestinoPlanilha, gravar_resultado
+
+log = logging.getLogger("core.vigiar")
+
+PASTA_IMPORTADOS = "importados"
+PASTA_FALHADOS = "falhados"
+PASTA_REPETIDOS = "repetidos"
+
+
+def _completo(caminho):
+    """True se o PDF termina com %%EOF (um ficheiro a meio da cópia não termina)."""
+    try:
+        with open(caminho, "rb") as f:
+            f.seek(0, 2)
+            f.seek(max(0, f.tell() - 1024))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def _mover(caminho, pasta_destino):
+    pasta_destino.mkdir(exist_ok=True)
+    destino = pasta_destino / caminho.name
+    if destino.exists():
+        destino = pasta_destino / f"{caminho.stem}_{datetime.now():%Y%m%d-%H%M%S}{caminho.suffix}"
+    shutil.move(str(caminho), destino)
+    return destino
+
+
+def _explicar(destino, motivo, tipo=None):
+    """O .txt ao lado de um PDF não importado, com o motivo."""
+    destino.with_suffix(".txt").write_text(
+        f"{datetime.now():%Y-%m-%d %H:%M:%S}\n{motivo}\n" + (f"tipo: {tipo}\n" if tipo else ""),
+        encoding="utf-8",
+    )
+
+
+class Vigia:
+    """Detecta PDFs estáveis na pasta e importa-os; um ciclo por chamada a ``verificar``."""
+
+    def __init__(self, pasta, destinos, estabilidade=3.0):
+        self.pasta = Path(pasta)
+        self.destinos = destinos
+        self.estabilidade = estabilidade
+        self._vistos = {}  # caminho -> (tamanho, mtime, desde)
+        self._gravados = {}  # sha256 -> nome, dos PDFs importados por este processo
+        self.planilha = next((d for d in destinos if isinstance(d, DestinoPlanilha)), None)
+
+    def _estaveis(self):
+        agora = time.monotonic()
+        presentes = set()
+        prontos = []
+        for caminho in sorted(self.pasta.iterdir()):
+            if not caminho.is_file() or caminho.suffix.lower() != ".pdf":
+                continue
+            presentes.add(caminho)
+            try:
+                st = caminho.stat()
+            except OSError:
+                continue
+            assinatura = (st.st_size, st.st_mtime_ns)
+            anterior = self._vistos.get(caminho)
+            if anterior is None or anterior[:2] != assinatura:
+                self._vistos[caminho] = (*assinatura, agora)
+                continue
+            if agora - anterior[2] >= self.estabilidade and _completo(caminho):
+                prontos.append(caminho)
+        for caminho in set(self._vistos) - presentes:
+            del self._vistos[caminho]
+        return prontos
+
+    def verificar(self):
+        """Importa os ficheiros que estabilizaram desde a última verificação."""
+        prontos = self._estaveis()
+        if not prontos:
+            return 0
+        gravado_em = datetime.now().strftime("%d-%m-%Y %H:%M")
+        # Os PDFs já gravados na planilha, já importados ou repetidos não são lidos
+        indice = cobertura.Indice(self.planilha.sheet_url) if self.planilha else None
+        hashes = [cobertura.hash_ficheiro(c) for c in prontos]
+        recusados = cobertura.recusar_duplicados(hashes, indice)
+        for i, sha in enumerate(hashes):
+            if i not in recusados and sha in self._gravados:
+                recusados[i] = f"ficheiro idêntico a {self._gravados[sha]}, já importado"
+        a_ler = [i for i in range(len(prontos)) if i not in recusados]
+        lidos = dict(zip(a_ler, processamento.processar_lote(
+            "auto", [(prontos[i].name, str(prontos[i])) for i in a_ler]
+        )))
+        for i, caminho in enumerate(prontos):
+            self._vistos.pop(caminho, None)
+            if i in recusados:
+                _explicar(_mover(caminho, self.pasta / PASTA_REPETIDOS), recusados[i])
+                log.warning("%s: %s — movido para %s/", caminho.name, recusados[i], PASTA_REPETIDOS)
+                continue
+            res = lidos[i]
+            erro = res["erro"] or (None if res["registos"] else "nenhum registo extraído")
+            if erro:
+                _explicar(_mover(caminho, self.pasta / PASTA_FALHADOS), erro, res["tipo"])
+                log.error("%s: %s — movido para %s/", caminho.name, erro, PASTA_FALHADOS)
+                continue
+            # Um erro a gravar (quota, rede) sobe para correr(): o ficheiro fica
+            # na pasta e é importado de novo quando o destino voltar
+            tabela, n_planilha = gravar_resultado(res, self.destinos, gravado_em)
+            if n_planilha is not None:
+                cobertura.registar(self.planilha.sheet_url, tabela, {**res, "hash": hashes[i]})
+            self._gravados[hashes[i]] = caminho.name
+            _mover(caminho, self.pasta / PASTA_IMPORTADOS)
+            log.info("%s: %s, %d registos → %s (%.1f s)", caminho.name, res["tipo"],
+                     len(res["registos"]), tabela, res["segundos"])
+        return len(prontos)
+
+    def correr(self, intervalo=2.0):
+        log.info("A vigiar %s (Ctrl+C para parar)", self.pasta.resolve())
+        while True:
+            try:
+                self.verificar()
+            except Exception:
+                # Ex.: quota do Sheets ou rede em baixo — os ficheiros ficam na
+                # pasta e são tentados de novo no próximo ciclo
+                log.exception("Erro no ciclo de importação")
+            time.sleep(intervalo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m core.vigiar",
+        description="Importa automaticamente os PDFs largados numa pasta.",
+    )
+    parser.add_argument("pasta", help="Pasta vigiada")
+    parser.add_argument("--planilha", help="URL da planilha Google onde gravar")
+    parser.add_argument("--csv", help="Pasta onde gravar um CSV por aba")
+    parser.add_argument("--utilizador", default="pasta-vigiada",
+                        help="Nome usado na fila partilhada do Sheets")
+    parser.add_argument("--intervalo", type=float, default=2.0,
+                        help="Segundos entre verificações da pasta")
+    parser.add_argument("--estabilidade", type=float, default=3.0,
+                        help="Segundos sem alterações para considerar um ficheiro completo")
+    args = parser.parse_args(argv)
+
+    if not args.planilha and not args.csv:
+        parser.error("indique --planilha e/ou --csv")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # A planilha primeiro: o CSV só é escrito depois de o Sheets aceitar as linhas
+    destinos = []
+    if args.planilha:
+        destinos.append(DestinoPlanilha(args.planilha, args.utilizador))
+    if args.csv:
+        destinos.append(DestinoCSV(args.csv))
+
+    try:
+        Vigia(args.pasta, destinos, args.estabilidade).correr(args.intervalo)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -49,6 +49,10 @@ st.info("Basta ir à página **🏠 Home** no menu lateral e colar o **Link da s
 st.markdown("---")
 st.header("3️⃣ Onde carregar os seus relatórios?")
 st.write("Selecione a página correta no menu lateral de acordo com o tipo de ficheiro que deseja processar:")
+st.info(
+    "📥 **Não sabe qual é?** Use a página **Importar PDFs**: reconhece o tipo de cada relatório "
+    "pelo cabeçalho e grava-o na aba certa, mesmo misturando vários tipos e hospitais."
+)
 
 c1, c2, c3, c4 = st.columns(4)
 
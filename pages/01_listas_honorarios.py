@@ -1,10 +1,9 @@
 import streamlit as st
-import gspread
-import re
-import pdfplumber
-import time
-from datetime import datetime
-from google.oauth2.service_account import Credentials
+
+from core import tarefas
+from core.ui import (
+    acompanhar_tarefa, avisar_falhas, guardar_uploads, mostrar_relatorio, tarefa_da_sessao,
+)
 
 # ---------------------------------------------------------------------------
 # CONFIGURAÇÕES INICIAIS
@@ -16,193 +15,6 @@ if not sheet_url:
     st.warning("⚠️ Configuração em falta na Home (Link da Planilha).")
     st.stop()
 
-# ---------------------------------------------------------------------------
-# PARSING DIRETO (sem IA)
-#
-# ESTRUTURA DO PDF (Mapa de Honorários - Detalhe):
-#
-# Pág. 1: sumário por grupo (ignorada)
-# Págs. 2+: linhas de detalhe, uma por ato:
-#   "DD-MM-YY <processo><nome> <Serviço> <cod_ent> <entidade> <cod_acto><procedimento> [%] [NrK] <qtd> <valor>"
-#
-# Colunas extraídas (por ordem):
-#   Data | Processo | Nome | Valor | Procedimento | Entidade | Data Extração | PDF Origem
-# ---------------------------------------------------------------------------
-
-# Serviços conhecidos — do mais longo para o mais curto (evita matches parciais)
-_SERVICOS = [
-    'Bloco Operatorio Tejo',
-    'Cir. Plástica E Reconstru',
-    'Ginecologia Obstetricia',
-    'Otorrinolaringologia',
-    'Neuro-Cirurgia',
-    'Cirurgia Vascular',
-    'Cirurgia Torácica',
-    'Cirurgia Geral',
-    'Gastroenterologia',
-    'Anestesiologia',
-    'Oftalmologia',
-    'Ortopedia',
-    'Angiografia',
-    'Urologia',
-    'CPRE',
-]
-_SERVICOS.sort(key=len, reverse=True)
-
-# Mapa para nome canónico independente de maiúsculas no PDF
-_SERVICO_CANON = {s.lower(): s for s in _SERVICOS}
-
-# Separador nome → serviço: case-insensitive, serviço seguido de dígito (código entidade)
-RE_SERVICO = re.compile(
-    r'\s*(' + '|'.join(re.escape(s) for s in _SERVICOS) + r')(?=\s*\d)',
-    re.IGNORECASE
-)
-
-# Linha de dados principal
-RE_LINHA = re.compile(
-    r'^(\d{2}-\d{2}-\d{2})\s+'   # data DD-MM-YY
-    r'(\d+)'                       # processo (só dígitos, colado ao nome)
-    r'(.+?)\s+'                    # nome + serviço + entidade + procedimento
-    r'-?\d+\s+'                    # quantidade (pode ser negativa em extornos)
-    r'(-?[\d,]+\.\d{2})$'         # valor (ex: 50.00 ou -121.41 ou 1,125.20)
-)
-
-# Cabeçalhos de secção de grupo
-RE_GRUPO = re.compile(
-    r'^(Anestesia|Angiografia[^,]|CPRE|Cirurgias Oftalmologia|Cirurgias|'
-    r'Consultas|Exames Bloco)$'
-)
-
-# Linhas de cabeçalho/rodapé a ignorar
-# "Hospital" ancorado ao início para não apanhar entidades como "Hospital Garcia De Orta"
-RE_IGNORAR = re.compile(
-    r'^Hospital |Mapa de Honor|PS_PA_009|Utilizador:|Pág\.\s*(por|:)?\s*\d|'
-    r'Data:\s*\d{4}|Hora:\s*\d|Ano:\s*\d|Prestador de Serviços|'
-    r'Código fornecedor|1M - Processamento|Datas (Activ|Factur)|'
-    r'Valores do Período|^Data\s+Doente|Total (do Período|Geral|Valor)'
-)
-
-
-def extrair_entidade_proc(resto: str) -> tuple[str, str]:
-    """
-    Dado o texto após o serviço, extrai entidade pagadora e início do procedimento.
-
-    Formato do resto: " <cod_ent> <entidade...> <cod_acto><procedimento> [% NrK]"
-
-    O cod_acto é sempre 5+ dígitos colados ao início do procedimento.
-    Alguns códigos têm sufixo de letras maiúsculas (PT, T) que fazem parte do código.
-    """
-    resto = resto.strip()
-    partes = resto.split(None, 1)
-    if len(partes) < 2:
-        return "", ""
-
-    sem_cod_ent = partes[1]  # remove o código numérico da entidade (1ª palavra)
-
-    # Localiza cod_acto: 5+ dígitos colados ao procedimento
-    m = re.search(r'\d{5,}', sem_cod_ent)
-    if not m:
-        return sem_cod_ent.strip(), ""
-
-    entidade   = sem_cod_ent[:m.start()].strip()
-    apos_digitos = sem_cod_ent[m.end():]
-
-    # Elimina sufixo de código (PT ou T) quando colado ao procedimento
-    sufixo = re.match(r'^(PT|T)(?=[A-Za-zÀ-ÿ])', apos_digitos)
-    if sufixo:
-        apos_digitos = apos_digitos[sufixo.end():]
-
-    proc_raw = apos_digitos.strip()
-
-    # Remove cauda: "% valor NrK" — ex: "90.00 -57" ou "90.00 66" ou só "60.00"
-    proc = re.sub(r'\s+\d+\.\d{2}\s+-?\d+\s*$', '', proc_raw).strip()
-    proc = re.sub(r'\s+\d+\.\d{2}\s*$', '', proc).strip()
-    # Remove " -" final de linhas truncadas pelo PDF
-    proc = re.sub(r'\s+-\s*$', '', proc).strip()
-
-    return entidade, proc
-
-
-def parsear_pagina(texto: str, grupo_atual: str) -> tuple[list, str]:
-    """Parseia uma página e devolve (lista_registos, grupo_atual)."""
-    registos = []
-
-    for linha in texto.split('\n'):
-        linha = linha.strip()
-        if not linha or RE_IGNORAR.search(linha):
-            continue
-
-        # Detecta mudança de grupo
-        mg = RE_GRUPO.match(linha)
-        if mg:
-            grupo_atual = mg.group(1).strip()
-            continue
-
-        # Linha de dados
-        m = RE_LINHA.match(linha)
-        if not m:
-            continue
-
-        data_raw  = m.group(1)   # DD-MM-YY
-        processo  = m.group(2)   # só dígitos
-        meio      = m.group(3).strip()
-        valor_raw = m.group(4)
-
-        # Separa nome do serviço (case-insensitive, cobre "UROLOGIA" e "Urologia")
-        ms = RE_SERVICO.search(meio)
-        nome  = meio[:ms.start()].strip() if ms else meio.strip()
-        resto = meio[ms.end():]           if ms else ""
-
-        # Extrai entidade e procedimento
-        entidade, procedimento = extrair_entidade_proc(resto)
-
-        # Formata data: DD-MM-YY → DD-MM-YYYY (com zero-padding no dia e mês)
-        p = data_raw.split('-')
-        data_fmt = f"{p[0].zfill(2)}-{p[1].zfill(2)}-20{p[2]}"
-
-        # Formata valor: "1,125.20" → "1125,20" | "-50.00" → "-50,00"
-        valor = valor_raw.replace(',', '').replace('.', ',')
-
-        registos.append({
-            "data":         data_fmt,
-            "processo":     processo,
-            "nome":         nome.upper(),
-            "valor":        valor,
-            "procedimento": procedimento,
-            "entidade":     entidade,
-        })
-
-    return registos, grupo_atual
-
-
-# ---------------------------------------------------------------------------
-# CONEXÃO GOOGLE SHEETS
-# ---------------------------------------------------------------------------
-try:
-    scope = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    creds = Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"], scopes=scope
-    )
-    gc = gspread.authorize(creds)
-    sheet_id = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url).group(1)
-    sh = gc.open_by_key(sheet_id)
-
-    NOME_FOLHA = 'pagos'
-    CABECALHO  = [["Data", "Processo", "Nome do Doente", "Valor (€)",
-                   "Procedimento", "Entidade", "Gravado Em", "Origem PDF"]]
-    try:
-        worksheet = sh.worksheet(NOME_FOLHA)
-    except Exception:
-        worksheet = sh.add_worksheet(title=NOME_FOLHA, rows="10000", cols="15")
-        worksheet.update(range_name="B1", values=CABECALHO)
-
-except Exception as e:
-    st.error(f"❌ Erro de ligação ao Google Sheets: {e}")
-    st.stop()
-
 # ---------------------------------------------------------------------------
 # INTERFACE E PROCESSAMENTO
 # ---------------------------------------------------------------------------
@@ -217,63 +29,59 @@ uploads = st.file_uploader(
 )
 
 if uploads and st.button("🚀 Iniciar Processamento"):
-    data_hoje = datetime.now().strftime("%d-%m-%Y %H:%M")
-    status_msg = st.empty()
-    progresso  = st.progress(0)
-
-    for idx_pdf, pdf_file in enumerate(uploads):
-        todas_linhas = []
-        grupo_atual  = ""
-
-        with pdfplumber.open(pdf_file) as pdf:
-            total_pags = len(pdf.pages)
-
-            for p_idx, pagina in enumerate(pdf.pages):
-                status_msg.info(
-                    f"📄 PDF {idx_pdf+1}/{len(uploads)} | "
-                    f"Página {p_idx+1}/{total_pags} — {pdf_file.name}"
-                )
-                texto = pagina.extract_text()
-                if not texto:
-                    continue
-
-                registos, grupo_atual = parsear_pagina(texto, grupo_atual)
-
-                for r in registos:
-                    todas_linhas.append([
-                        r["data"], r["processo"], r["nome"],
-                        r["valor"], r["procedimento"], r["entidade"],
-                        data_hoje, pdf_file.name
-                    ])
-
-        # Diagnóstico por PDF
-        st.write(f"**{pdf_file.name}** — {len(todas_linhas)} linhas extraídas")
-
-        if todas_linhas:
-            # Determina a primeira linha vazia na coluna B (garante que nunca escreve na coluna A)
-            col_b = worksheet.col_values(2)  # coluna B (índice 2)
-            primeira_linha_livre = len(col_b) + 1
-
-            # Gravação em lotes de 500 com range explícito a partir da coluna B
-            for i in range(0, len(todas_linhas), 500):
-                lote = todas_linhas[i:i+500]
-                range_destino = f"B{primeira_linha_livre}"
-                worksheet.update(
-                    range_name=range_destino,
-                    values=lote,
-                    value_input_option="USER_ENTERED"
-                )
-                primeira_linha_livre += len(lote)
-                if len(todas_linhas) > 500:
-                    time.sleep(1)
-            st.toast(f"✅ {len(todas_linhas)} linhas gravadas de {pdf_file.name}")
-        else:
-            # Diagnóstico se nada extraído
-            with pdfplumber.open(pdf_file) as pdf:
-                txt_p2 = pdf.pages[1].extract_text() if len(pdf.pages) > 1 else ""
-            st.warning("⚠️ Nenhum registo encontrado. Primeiras linhas da pág. 2:")
-            st.code(txt_p2[:1500] if txt_p2 else "(vazio)")
-
-        progresso.progress((idx_pdf + 1) / len(uploads))
+    # O processamento corre em segundo plano: sobrevive a reruns e a
+    # desconexões, e pode ser acompanhado noutra sessão (página Tarefas)
+    st.session_state["tarefa_honorarios"] = tarefas.submeter(
+        "honorarios",
+        st.session_state.get("username"),
+        {"sheet_url": sheet_url},
+        [(nome, caminho) for nome, caminho, _ in guardar_uploads(uploads, "honorarios")],
+    )
 
-    status_msg.success("✨ Processamento concluído!")
+tarefa_id = tarefa_da_sessao("tarefa_honorarios", "honorarios")
+
+if tarefa_id:
+    tarefa = acompanhar_tarefa(tarefa_id)
+    if tarefa and tarefa["estado"] == tarefas.CONCLUIDA:
+        for f in tarefa["resultado"]["ficheiros"]:
+            if f["erro"]:
+                st.error(f"❌ **{f['nome']}** — erro ao ler o PDF: {f['erro']}")
+                continue
+            if f.get("ignorado"):
+                st.info(f"⏭️ **{f['nome']}** — não lido: {f['ignorado']}.")
+                continue
+
+            # Diagnóstico por PDF
+            st.write(f"**{f['nome']}** — {f['linhas']} linhas extraídas")
+            avisar_falhas(f["nome"], f.get("falhas"))
+            if not f["linhas"]:
+                st.warning("⚠️ Nenhum registo encontrado. Primeiras linhas da pág. 2:")
+                st.code(f["amostra"] or "(vazio)")
+
+            # Verificação contra o sumário por grupo da pág. 1 (sem IA)
+            verificacao = f.get("verificacao")
+            if verificacao is None:
+                st.caption("Sem sumário por grupo na pág. 1 — extracção não verificada.")
+                continue
+            tabela = [
+                {
+                    "Grupo":           l["grupo"],
+                    "Actos (PDF)":     l["actos_pdf"],
+                    "Actos extraídos": l["actos_extraidos"],
+                    "Valor (PDF)":     f"{l['valor_pdf'] / 100:.2f}".replace(".", ","),
+                    "Valor extraído":  f"{l['valor_extraido'] / 100:.2f}".replace(".", ","),
+                    "":                "✅" if l["ok"] else "❌",
+                }
+                for l in verificacao["grupos"]
+            ]
+            if verificacao["ok"]:
+                with st.expander("✅ Confere com o sumário da pág. 1 (actos e valores por grupo)"):
+                    st.dataframe(tabela, use_container_width=True, hide_index=True)
+            else:
+                st.warning("⚠️ A extracção não confere com o sumário da pág. 1:")
+                st.dataframe(tabela, use_container_width=True, hide_index=True)
+
+        st.success(
+            f"✨ Processamento concluído! {tarefa['resultado']['total']} linhas gravadas."
+        )
+        mostrar_relatorio(tarefa["resultado"].get("metricas"))
@@ -1,221 +1,25 @@
 import streamlit as st
-import pdfplumber
-import re
-import io
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime
 
+from core.importacao import gravar, linhas_para_folha, obter_folha
+from core.planilha import abrir_planilha
+from core.registos import Lote
+from core.ui import (
+    avisar_falhas, ja_exportado, marcar_exportado, medir_corrida, mostrar_relatorio,
+    processar_uploads,
+)
+
 # ─── Autenticação ─────────────────────────────────────────────────────────────
 if "authenticated" not in st.session_state or not st.session_state["authenticated"]:
     st.warning("🔐 Por favor autentique-se na página principal.")
     st.stop()
 
-# ─── Constantes de parsing ────────────────────────────────────────────────────
-PROC_MIN_X = 290
-PROC_MAX_X = 480
-DOC_MAX_X  = 290
-
-
-# ─── Funções de parsing PDF ───────────────────────────────────────────────────
-
-def cluster_rows(words, gap=6):
-    if not words:
-        return []
-    sw = sorted(words, key=lambda w: w['top'])
-    clusters = [[sw[0]]]
-    for w in sw[1:]:
-        if w['top'] - clusters[-1][-1]['top'] <= gap:
-            clusters[-1].append(w)
-        else:
-            clusters.append([w])
-    return [(int(c[0]['top']), c) for c in clusters]
-
-
-def left_text(ws):
-    return " ".join(
-        w['text'] for w in sorted(ws, key=lambda x: x['x0'])
-        if w['x0'] < DOC_MAX_X
-    )
-
-
-def proc_text(ws):
-    return " ".join(
-        w['text'] for w in sorted(ws, key=lambda x: x['x0'])
-        if PROC_MIN_X <= w['x0'] < PROC_MAX_X
-    )
-
-
-def min_left_x(ws):
-    lws = [w for w in ws if w['x0'] < DOC_MAX_X]
-    return min(w['x0'] for w in lws) if lws else 0
-
-
-def parse_cirurgias_pdf(pdf_bytes):
-    records = []
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page in pdf.pages[1:]:
-            words = page.extract_words(keep_blank_chars=False, x_tolerance=3, y_tolerance=3)
-            row_clusters = cluster_rows(words, gap=6)
-
-            date_re = re.compile(r'^\d{4}-\d{2}-\d{2}')
-            gr_re   = re.compile(r'Gr\.\s*de\s*urg', re.I)
-            resp_re = re.compile(r'Responsável:', re.I)
-
-            row_data = [
-                (top, left_text(ws), proc_text(ws), ws)
-                for top, ws in row_clusters
-            ]
-
-            rec_starts = [
-                i for i, (top, l, p, ws) in enumerate(row_data)
-                if date_re.match(l) and re.search(r'HCIS', l, re.I)
-            ]
-
-            for idx, start in enumerate(rec_starts):
-                end = rec_starts[idx + 1] if idx + 1 < len(rec_starts) else len(row_data)
-                block = row_data[start:end]
-
-                _, first_left, first_proc, _ = block[0]
-
-                dm = re.match(r'(\d{4}-\d{2}-\d{2})', first_left)
-                date_raw = dm.group(1) if dm else ""
-                pts = date_raw.split('-')
-                date_fmt = f"{pts[2]}-{pts[1]}-{pts[0]}" if len(pts) == 3 else date_raw
-
-                pm = re.search(r'HCIS\s*/\s*(\d+)', first_left)
-                proc_num = pm.group(1) if pm else ""
-
-                nm = re.search(r'HCIS\s*/\s*\d+\s*-\s*(.+)', first_left)
-                name_acc = [nm.group(1).strip()] if nm else []
-
-                urgency = ""
-                proc_lines = [first_proc] if first_proc.strip() else []
-                in_resp = False
-
-                for top_row, left, right, row_ws in block[1:]:
-                    if gr_re.search(left):
-                        ug = re.search(r'urgência\s*:\s*(\w+)', left, re.I)
-                        if ug:
-                            urgency = ug.group(1)
-                        in_resp = True
-                        if right.strip():
-                            proc_lines.append(right)
-                        continue
-                    if resp_re.search(left):
-                        in_resp = True
-                        if right.strip():
-                            proc_lines.append(right)
-                        continue
-                    if in_resp:
-                        mx = min_left_x(row_ws)
-                        if mx > 145:
-                            if right.strip():
-                                proc_lines.append(right)
-                            continue
-                        else:
-                            in_resp = False
-                    if left.strip() and not re.search(r'\d{2}:\d{2}', left):
-                        name_acc.append(left.strip())
-                    if right.strip():
-                        proc_lines.append(right)
-
-                full_name = re.sub(r'\s+', ' ', " ".join(name_acc)).strip()
-
-                proc_raw = " ".join(proc_lines)
-                proc_raw = re.sub(r'\b\d+\b', '', proc_raw)
-                proc_raw = re.sub(r'\s+', ' ', proc_raw).strip()
-
-                proc_items = re.findall(
-                    r'-([A-ZÁÉÍÓÚÀÃÕÂÊÔÇÜ][^-]+?)(?=\s*-[A-ZÁÉÍÓÚÀÃÕÂÊÔÇÜ]|$)',
-                    proc_raw
-                )
-                procedures = []
-                for p in proc_items:
-                    p = re.sub(r'\s+', ' ', p).strip().strip(',').strip(' )')
-                    if p and len(p) > 2 and not re.fullmatch(r'[\s/\(\)\.\)]+', p):
-                        procedures.append(p)
-
-                records.append({
-                    "data":          date_fmt,
-                    "processo":      proc_num,
-                    "doente":        full_name,
-                    "procedimentos": " | ".join(procedures),
-                    "urgencia":      urgency,
-                })
-
-    return records
-
-
-# ─── Funções Google Sheets ────────────────────────────────────────────────────
-
-def get_gspread_client():
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    creds = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]), scopes=scopes
-    )
-    return gspread.authorize(creds)
-
-
-def append_to_sheets(records, sheet_url, pdf_name=""):
-    """
-    Abre a aba 'Anestesiados', encontra a primeira linha livre na coluna C
-    e acrescenta os registos a partir daí sem apagar dados existentes.
-    Se a aba não existir, cria-a com cabeçalhos.
-    Se não houver linhas suficientes, expande a aba automaticamente.
-    Devolve (primeira_linha_escrita, total_registos).
-    """
-    gc = get_gspread_client()
-    sh = gc.open_by_url(sheet_url)
-
-    # Obter ou criar aba Anestesiados
-    try:
-        ws = sh.worksheet("Anestesiados")
-    except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet(title="Anestesiados", rows=2000, cols=20)
-        # Aba nova: escrever cabeçalhos na linha 1 a partir de C
-        ws.update(
-            range_name="C1:H1",
-            values=[["Data", "Nº Processo", "Doente", "Procedimentos", "Urgência", "Origem"]]
-        )
-        ws.format("C1:H1", {
-            "textFormat": {"bold": True},
-            "backgroundColor": {"red": 0.122, "green": 0.220, "blue": 0.392},
-        })
-
-    # Primeira linha livre na coluna C
-    col_c_values = ws.col_values(3)       # valores actuais da coluna C
-    first_free_row = len(col_c_values) + 1
-
-    # Construir linhas: colunas C a H (dados + nome do PDF de origem)
-    rows_to_write = [
-        [rec["data"], rec["processo"], rec["doente"], rec["procedimentos"], rec["urgencia"], pdf_name]
-        for rec in records
-    ]
-
-    last_row = first_free_row + len(rows_to_write) - 1
-
-    # Se a aba não tiver linhas suficientes, expande-a
-    if last_row > ws.row_count:
-        rows_needed = last_row - ws.row_count + 1000  # margem extra de segurança
-        ws.add_rows(rows_needed)
-
-    ws.update(
-        range_name=f"C{first_free_row}:H{last_row}",
-        values=rows_to_write
-    )
-
-    return first_free_row, len(rows_to_write)
-
-
 # ─── Interface ────────────────────────────────────────────────────────────────
 
 st.title("📋 Extração de Cirurgias — GHRO4045R")
 st.markdown(
-    "Carregue o PDF de **Cirurgias por Interveniente**. "
+    "Carregue um ou mais PDFs de **Cirurgias por Interveniente**, de qualquer hospital "
+    "(HCIS, CCC, CCO — também misturados no mesmo PDF). "
     "Os dados são extraídos e escritos automaticamente na aba **Anestesiados** "
     "da planilha configurada, a partir da primeira linha livre na coluna **C**."
 )
@@ -230,22 +34,34 @@ if not sheet_url:
         "Cole o link na barra lateral (⚙️ Configuração) antes de carregar o PDF."
     )
 
-uploaded_file = st.file_uploader(
-    "📂 Selecionar PDF",
+uploaded_files = st.file_uploader(
+    "📂 Selecionar PDF(s)",
     type=["pdf"],
+    accept_multiple_files=True,
     help="Relatório exportado do sistema GHRO4045R"
 )
 
-if uploaded_file:
-    pdf_bytes = uploaded_file.read()
-
-    # ── Parsing + escrita automática ──────────────────────────────────────────
-    with st.spinner("🔍 A processar PDF..."):
-        try:
-            records = parse_cirurgias_pdf(pdf_bytes)
-        except Exception as e:
-            st.error(f"Erro ao processar PDF: {e}")
-            st.stop()
+if uploaded_files:
+    # ── Parsing em paralelo (ordem de upload; memoizado por ficheiro) ────────
+    with medir_corrida("02_anestesiados") as corrida, \
+            st.spinner(f"🔍 A processar {len(uploaded_files)} PDF(s)..."):
+        resultados = processar_uploads("cirurgias", uploaded_files, "anestesiados")
+
+    for res in resultados:
+        if res["erro"]:
+            st.error(f"Erro ao processar `{res['nome']}`: {res['erro']}")
+        elif res.get("ignorado"):
+            st.info(f"⏭️ `{res['nome']}`: {res['ignorado']}.")
+        elif not res["registos"]:
+            st.warning(f"⚠️ `{res['nome']}`: nenhum registo extraído.")
+        avisar_falhas(res["nome"], res.get("falhas"))
+
+    validos = [res for res in resultados if res["registos"]]
+    records = Lote.concatenar(res["registos"] for res in validos)
+
+    if not records and all(res.get("ignorado") for res in resultados):
+        st.info("ℹ️ Nada de novo: estes PDFs já foram importados.")
+        st.stop()
 
     if not records:
         st.error("Não foi possível extrair registos. Confirme que é um relatório GHRO4045R válido.")
@@ -253,7 +69,7 @@ if uploaded_file:
 
     # ── Pré-visualização ──────────────────────────────────────────────────────
     import pandas as pd
-    df = pd.DataFrame(records)
+    df = pd.DataFrame(records.tabela())
     df.columns = ["Data", "Nº Processo", "Doente", "Procedimentos", "Urgência"]
 
     def highlight_urgente(row):
@@ -274,11 +90,11 @@ if uploaded_file:
     )
 
     col1, col2, col3, col4 = st.columns(4)
-    urgentes = sum(1 for r in records if r["urgencia"] == "Urgente")
+    urgentes = records.coluna("urgencia").count("Urgente")
     with col1:
         st.metric("Total Cirurgias", len(records))
     with col2:
-        st.metric("Dias Operatórios", len({r["data"] for r in records}))
+        st.metric("Dias Operatórios", len(set(records.coluna("data"))))
     with col3:
         st.metric("Urgentes", urgentes)
     with col4:
@@ -286,24 +102,36 @@ if uploaded_file:
 
     st.divider()
 
-    # ── Escrita automática na planilha ────────────────────────────────────────
+    # ── Escrita automática na planilha (uma vez por ficheiro e sessão) ───────
+    pendentes = [res for res in validos if not ja_exportado(sheet_url, "anestesiados", res)]
     if not sheet_url:
         st.info("Configure o link da planilha na barra lateral para exportar os dados.")
+    elif not pendentes:
+        st.caption(f"🔗 Planilha: `{sheet_url}` — estes PDFs já foram gravados nesta sessão.")
     else:
+        import gspread      # só aqui, para os erros abaixo (ver core.arranque)
+
         st.caption(f"🔗 Planilha: `{sheet_url}`")
-        with st.spinner("📤 A escrever na planilha..."):
+        with medir_corrida("02_anestesiados", corrida), st.spinner("📤 A escrever na planilha..."):
             try:
-                first_row, n = append_to_sheets(records, sheet_url, pdf_name=uploaded_file.name)
-                st.success(
-                    f"✅ **{n} registos** escritos na aba **Anestesiados** "
-                    f"a partir da linha **{first_row}** (coluna C)."
-                )
+                total = 0
+                worksheet = obter_folha(abrir_planilha(sheet_url), "anestesiados")
+                for res in pendentes:
+                    linhas = linhas_para_folha("cirurgias", res["registos"], res["nome"], None)
+                    first_row = gravar(worksheet, sheet_url, "anestesiados", linhas, st.session_state.get("username"))
+                    n = len(linhas)
+                    marcar_exportado(sheet_url, "anestesiados", res)
+                    total += n
+                    st.success(
+                        f"✅ **{n} registos** de `{res['nome']}` escritos na aba **Anestesiados** "
+                        f"a partir da linha **{first_row}** (coluna C)."
+                    )
                 st.markdown(f"[🔗 Abrir Planilha]({sheet_url})")
                 st.session_state["last_sheet_write"] = {
                     "url":  sheet_url,
-                    "rows": n,
+                    "rows": total,
                     "time": datetime.now().strftime("%d-%m-%Y %H:%M"),
-                    "file": uploaded_file.name,
+                    "file": ", ".join(res["nome"] for res in pendentes),
                 }
             except gspread.exceptions.SpreadsheetNotFound:
                 st.error("❌ Planilha não encontrada. Verifique o URL na configuração.")
@@ -320,5 +148,7 @@ if uploaded_file:
             f"de `{last['file']}` → {last['time']}"
         )
 
+    mostrar_relatorio("02_anestesiados")
+
 else:
-    st.info("👆 Carregue um ficheiro PDF para começar.")
+    st.info("👆 Carregue um ou mais ficheiros PDF para começar.")
@@ -1,10 +1,11 @@
 import streamlit as st
-import gspread
-import re
-import pdfplumber
-import time
 from datetime import datetime
-from google.oauth2.service_account import Credentials
+
+from core import cobertura, metricas
+from core.importacao import chaves_exames, deduplicar_exames, gravar, linhas_para_folha, obter_folha
+from core.planilha import abrir_planilha
+from core.processamento import processar_lote
+from core.ui import avisar_falhas, guardar_uploads, medir_corrida, mostrar_relatorio
 
 # ---------------------------------------------------------------------------
 # CONFIGURAÇÕES INICIAIS
@@ -16,133 +17,6 @@ if not sheet_url:
     st.warning("⚠️ Configuração em falta na Home (Link da Planilha).")
     st.stop()
 
-# ---------------------------------------------------------------------------
-# PARSING DIRETO (sem IA)
-#
-# Regex genéricos: funcionam com qualquer prefixo de processo (CCC/, HCIS/, etc.)
-# e qualquer nome de especialidade (GASTROENTEROLO, CIRURGIA, MEDICINA, etc.)
-#
-# ESTRUTURA DO PDF:
-# Linha com data:  "2021-05-17 Equipa Cirurgica 2 CCC/245230 JOSE... GASTROENTEROLO6051 Anestesia... 1 N/N"
-# Linha sem data:  "CCC/344423 ANABELA... GASTROENTEROLO17009901 Colonoscopia... 1 N/N"
-# Cabeçalho (ignorado): "Data: 2026-02-17", "Hospital ...", "Pág. 1/52", etc.
-# ---------------------------------------------------------------------------
-
-RE_IGNORAR = re.compile(
-    r'Data:\s*\d{4}|'
-    r'Hora:\s*\d|'
-    r'Hospital |'
-    r'Exames Realizados|'
-    r'Utilizador:|'
-    r'GHC[A-Z]\d+|'
-    r'Período entre|'
-    r'Interveniente:|'
-    r'^Data\s+Grupo\s+Total|'
-    r'Pág\.\s*\d'
-)
-
-# Linha COM data de ato
-RE_COM_DATA = re.compile(
-    r'^(\d{4}-\d{2}-\d{2})\s+'   # data do ato YYYY-MM-DD
-    r'.+?\s+'                      # nome do grupo (qualquer texto)
-    r'\d+\s+'                      # total do grupo
-    r'([A-Z]+/\d+)\s+'            # processo (CCC/245230, HCIS/123, etc.)
-    r'(.+?)'                       # nome do doente
-    r'GASTROENTEROLO\s*'           # separador de especialidade (fixo)
-    r'(\w+)\s+'                    # código do ato
-    r'(.+?)\s+'                    # descrição do procedimento
-    r'\d+\s+[A-Z]/[A-Z]$'         # qtd e fact — âncora final
-)
-
-# Linha SEM data
-RE_SEM_DATA = re.compile(
-    r'^([A-Z]+/\d+)\s+'   # processo (qualquer prefixo)
-    r'(.+?)'               # nome do doente
-    r'GASTROENTEROLO\s*'   # separador de especialidade (fixo)
-    r'(\w+)\s+'            # código do ato
-    r'(.+?)\s+'            # descrição do procedimento
-    r'\d+\s+[A-Z]/[A-Z]$' # âncora final
-)
-
-
-def extrair_registos_pagina(texto: str, ultima_data: str):
-    """
-    Parseia uma página e devolve (lista_registos, última_data_de_ato).
-    A data propaga-se apenas entre registos de ato — nunca do cabeçalho.
-    """
-    registos = []
-
-    for linha in texto.split('\n'):
-        linha = linha.strip()
-        if not linha or RE_IGNORAR.search(linha):
-            continue
-
-        m = RE_COM_DATA.match(linha)
-        if m:
-            ultima_data = m.group(1)
-            # grupos: 1=data, 2=processo, 3=nome, 4=codigo, 5=procedimento
-            registos.append({
-                "data": ultima_data,
-                "processo": m.group(2),
-                "nome": m.group(3).strip(),
-                "codigo": m.group(4),
-                "procedimento": m.group(5).strip()
-            })
-            continue
-
-        m2 = RE_SEM_DATA.match(linha)
-        if m2:
-            registos.append({
-                "data": ultima_data,
-                "processo": m2.group(1),
-                "nome": m2.group(2).strip(),
-                "codigo": m2.group(3),
-                "procedimento": m2.group(4).strip()
-            })
-
-    return registos, ultima_data
-
-
-def formatar_data_pt(data_iso: str) -> str:
-    """YYYY-MM-DD → DD-MM-YYYY com zero padding garantido (ex: 05-06-2021)"""
-    if not data_iso:
-        return ""
-    p = re.findall(r'\d+', data_iso)
-    if len(p) == 3 and len(p[0]) == 4:
-        ano, mes, dia = p[0], p[1].zfill(2), p[2].zfill(2)
-        return f"{dia}-{mes}-{ano}"
-    return data_iso
-
-
-# ---------------------------------------------------------------------------
-# CONEXÃO GOOGLE SHEETS
-# ---------------------------------------------------------------------------
-try:
-    scope = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    creds = Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"], scopes=scope
-    )
-    gc = gspread.authorize(creds)
-    sheet_id = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url).group(1)
-    sh = gc.open_by_key(sheet_id)
-
-    NOME_FOLHA = 'ExamesEsp'
-    try:
-        worksheet = sh.worksheet(NOME_FOLHA)
-    except Exception:
-        worksheet = sh.add_worksheet(title=NOME_FOLHA, rows="10000", cols="10")
-        worksheet.update(
-            range_name="C1",
-            values=[["Data", "Processo", "Nome do Doente", "Código", "Procedimento", "Gravado Em", "Origem PDF"]]
-        )
-except Exception as e:
-    st.error(f"❌ Erro de ligação ao Google Sheets: {e}")
-    st.stop()
-
-
 # ---------------------------------------------------------------------------
 # INTERFACE E PROCESSAMENTO
 # ---------------------------------------------------------------------------
@@ -157,84 +31,89 @@ uploads = st.file_uploader(
 )
 
 if uploads and st.button("🚀 Iniciar Processamento"):
-    dados_existentes = worksheet.get_all_values()
-    chaves_existentes = {
-        f"{r[0]}_{r[1]}"
-        for r in dados_existentes[1:] if len(r) > 1
-    }
+    with medir_corrida("03_exames") as corrida:
+        try:
+            # Só aqui, quando há PDFs para gravar, não a cada rerun
+            with metricas.etapa("sheets.abrir"):
+                worksheet = obter_folha(abrir_planilha(sheet_url), "exames_esp")
+        except Exception as e:
+            st.error(f"❌ Erro de ligação ao Google Sheets: {e}")
+            st.stop()
+
+        with metricas.etapa("sheets.leitura"):
+            chaves_existentes = chaves_exames(worksheet)
 
     data_hoje = datetime.now().strftime("%d-%m-%Y %H:%M")
     status_msg = st.empty()
     progresso = st.progress(0)
 
-    for idx_pdf, pdf_file in enumerate(uploads):
-        novas_linhas = []
-        ultima_data = ""
-        total_extraido = 0
-        total_duplicado = 0
-
-        with pdfplumber.open(pdf_file) as pdf:
-            total_pags = len(pdf.pages)
-
-            for p_idx, pagina in enumerate(pdf.pages):
-                status_msg.info(
-                    f"📄 PDF {idx_pdf+1}/{len(uploads)} | "
-                    f"Página {p_idx+1}/{total_pags} — {pdf_file.name}"
-                )
+    def mostrar_progresso(concluidos, total, resultado):
+        status_msg.info(f"📄 {concluidos}/{total} PDFs lidos — {resultado['nome']}")
+        progresso.progress(concluidos / total)
+
+    # Parsing de todos os PDFs em paralelo; a deduplicação corre depois,
+    # na ordem de upload, para o resultado ser sempre o mesmo
+    # PDFs já gravados nesta planilha (ou repetidos) não chegam a ser lidos
+    # (core.cobertura)
+    guardados = guardar_uploads(uploads, "exames_especiais")
+    indice = cobertura.Indice(sheet_url)
+    recusados = cobertura.recusar_duplicados([sha for _, _, sha in guardados], indice)
+    a_ler = [i for i in range(len(guardados)) if i not in recusados]
+    status_msg.info(f"📄 A ler {len(a_ler)} PDF(s) em paralelo...")
+    with medir_corrida("03_exames", corrida):
+        lidos = dict(zip(a_ler, processar_lote(
+            "exames", [guardados[i][:2] for i in a_ler], mostrar_progresso,
+            verificar=True,
+        )))
+
+    for pos, (nome_pdf, _, sha) in enumerate(guardados):
+        resultado = lidos.get(pos)
+        if resultado is None:
+            st.info(f"⏭️ **{nome_pdf}** — não lido: {recusados[pos]}.")
+            continue
+        if resultado["erro"]:
+            st.error(f"❌ **{nome_pdf}** — erro ao ler o PDF: {resultado['erro']}")
+            continue
+        if resultado.get("ignorado"):
+            st.info(f"⏭️ **{nome_pdf}** — não lido: {resultado['ignorado']}.")
+            continue
 
-                texto = pagina.extract_text()
-                if not texto:
-                    continue
-
-                registos, ultima_data = extrair_registos_pagina(texto, ultima_data)
-                total_extraido += len(registos)
-
-                for r in registos:
-                    data_fmt = formatar_data_pt(r["data"])
-                    nome = r["nome"].upper()
-                    codigo = r["codigo"]
-                    proc = r["procedimento"]
-                    processo = re.sub(r'\D', '', r["processo"])  # só dígitos
-
-                    chave = f"{data_fmt}_{processo}"
-                    if chave not in chaves_existentes:
-                        novas_linhas.append([
-                            data_fmt, processo, nome, codigo, proc,
-                            data_hoje, pdf_file.name
-                        ])
-                        chaves_existentes.add(chave)
-                    else:
-                        total_duplicado += 1
+        total_extraido = len(resultado["registos"])
+        novas_linhas = deduplicar_exames(
+            linhas_para_folha("exames", resultado["registos"], nome_pdf, data_hoje),
+            chaves_existentes,
+        )
+        total_duplicado = total_extraido - len(novas_linhas)
 
         # Diagnóstico sempre visível
         st.write(
-            f"**{pdf_file.name}** — extraídos: {total_extraido} | "
+            f"**{nome_pdf}** — extraídos: {total_extraido} | "
             f"novos: {len(novas_linhas)} | duplicados ignorados: {total_duplicado}"
         )
+        avisar_falhas(nome_pdf, resultado.get("falhas"))
 
         # Se extraiu zero, mostra as primeiras linhas brutas para diagnóstico
         if total_extraido == 0:
-            with pdfplumber.open(pdf_file) as pdf:
-                txt_p1 = pdf.pages[0].extract_text() or ""
             st.warning("⚠️ Nenhum registo encontrado. Primeiras linhas do PDF:")
-            st.code(txt_p1[:1500])
+            st.code(resultado["amostra"])
 
-        # Gravação em lotes de 500
+        # Gravação em lotes, pela fila partilhada do Sheets
         if novas_linhas:
-            for i in range(0, len(novas_linhas), 500):
-                lote = novas_linhas[i:i+500]
-                worksheet.append_rows(
-                    lote,
-                    value_input_option="USER_ENTERED",
-                    table_range="C1"
+            with medir_corrida("03_exames", corrida):
+                gravar(
+                    worksheet, sheet_url, "exames_esp", novas_linhas,
+                    st.session_state.get("username"),
+                    ao_esperar=lambda e: status_msg.info(
+                        f"⏳ Quota do Sheets partilhada — {e['posicao']} lote(s) à frente"
+                    ),
                 )
-                if len(novas_linhas) > 500:
-                    time.sleep(1)
-            st.toast(f"✅ {len(novas_linhas)} linhas gravadas de {pdf_file.name}")
+            st.toast(f"✅ {len(novas_linhas)} linhas gravadas de {nome_pdf}")
         else:
-            st.toast(f"ℹ️ Nenhuma linha nova em {pdf_file.name}")
-
-        progresso.progress((idx_pdf + 1) / len(uploads))
+            st.toast(f"ℹ️ Nenhuma linha nova em {nome_pdf}")
+        if total_extraido:
+            cobertura.registar(sheet_url, "exames_esp", {**resultado, "hash": sha})
 
     status_msg.success("✨ Processamento concluído!")
     st.balloons()
+
+mostrar_relatorio("03_exames")
@@ -1,207 +1,25 @@
 import streamlit as st
-import pdfplumber
-import re
-import io
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime
 
+from core.importacao import gravar, linhas_para_folha, obter_folha
+from core.planilha import abrir_planilha
+from core.registos import Lote
+from core.ui import (
+    avisar_falhas, ja_exportado, marcar_exportado, medir_corrida, mostrar_relatorio,
+    processar_uploads,
+)
+
 # ─── Autenticação ─────────────────────────────────────────────────────────────
 if "authenticated" not in st.session_state or not st.session_state["authenticated"]:
     st.warning("🔐 Por favor autentique-se na página principal.")
     st.stop()
 
-# ─── Constantes de parsing ────────────────────────────────────────────────────
-PROC_MIN_X = 290
-PROC_MAX_X = 480
-DOC_MAX_X  = 290
-
-
-# ─── Funções de parsing PDF ───────────────────────────────────────────────────
-
-def cluster_rows(words, gap=6):
-    if not words:
-        return []
-    sw = sorted(words, key=lambda w: w['top'])
-    clusters = [[sw[0]]]
-    for w in sw[1:]:
-        if w['top'] - clusters[-1][-1]['top'] <= gap:
-            clusters[-1].append(w)
-        else:
-            clusters.append([w])
-    return [(int(c[0]['top']), c) for c in clusters]
-
-
-def left_text(ws):
-    return " ".join(
-        w['text'] for w in sorted(ws, key=lambda x: x['x0'])
-        if w['x0'] < DOC_MAX_X
-    )
-
-
-def proc_text(ws):
-    return " ".join(
-        w['text'] for w in sorted(ws, key=lambda x: x['x0'])
-        if PROC_MIN_X <= w['x0'] < PROC_MAX_X
-    )
-
-
-def min_left_x(ws):
-    lws = [w for w in ws if w['x0'] < DOC_MAX_X]
-    return min(w['x0'] for w in lws) if lws else 0
-
-
-def parse_cirurgias_pdf(pdf_bytes):
-    records = []
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page in pdf.pages[1:]:
-            words = page.extract_words(keep_blank_chars=False, x_tolerance=3, y_tolerance=3)
-            row_clusters = cluster_rows(words, gap=6)
-
-            date_re = re.compile(r'^\d{4}-\d{2}-\d{2}')
-            gr_re   = re.compile(r'Gr\.\s*de\s*urg', re.I)
-            resp_re = re.compile(r'Responsável:', re.I)
-
-            row_data = [
-                (top, left_text(ws), proc_text(ws), ws)
-                for top, ws in row_clusters
-            ]
-
-            # Alterado de HCIS para CCC
-            rec_starts = [
-                i for i, (top, l, p, ws) in enumerate(row_data)
-                if date_re.search(l) and re.search(r'CCC', l, re.I)
-            ]
-
-            for idx, start in enumerate(rec_starts):
-                end = rec_starts[idx + 1] if idx + 1 < len(rec_starts) else len(row_data)
-                block = row_data[start:end]
-
-                _, first_left, first_proc, _ = block[0]
-
-                dm = re.search(r'(\d{4}-\d{2}-\d{2})', first_left)
-                date_raw = dm.group(1) if dm else ""
-                pts = date_raw.split('-')
-                date_fmt = f"{pts[2]}-{pts[1]}-{pts[0]}" if len(pts) == 3 else date_raw
-
-                # Alterado de HCIS para CCC
-                pm = re.search(r'CCC\s*/\s*(\d+)', first_left)
-                proc_num = pm.group(1) if pm else ""
-
-                # Alterado de HCIS para CCC
-                nm = re.search(r'CCC\s*/\s*\d+\s*-\s*(.+)', first_left)
-                name_acc = [nm.group(1).strip()] if nm else []
-
-                urgency = ""
-                proc_lines = [first_proc] if first_proc.strip() else []
-                in_resp = False
-
-                for top_row, left, right, row_ws in block[1:]:
-                    if gr_re.search(left):
-                        ug = re.search(r'urgência\s*:\s*(\w+)', left, re.I)
-                        if ug:
-                            urgency = ug.group(1)
-                        in_resp = True
-                        if right.strip():
-                            proc_lines.append(right)
-                        continue
-                    if resp_re.search(left):
-                        in_resp = True
-                        if right.strip():
-                            proc_lines.append(right)
-                        continue
-                    if in_resp:
-                        mx = min_left_x(row_ws)
-                        if mx > 145:
-                            if right.strip():
-                                proc_lines.append(right)
-                            continue
-                        else:
-                            in_resp = False
-                    if left.strip() and not re.search(r'\d{2}:\d{2}', left):
-                        name_acc.append(left.strip())
-                    if right.strip():
-                        proc_lines.append(right)
-
-                full_name = re.sub(r'\s+', ' ', " ".join(name_acc)).strip()
-
-                proc_raw = " ".join(proc_lines)
-                proc_raw = re.sub(r'\b\d+\b', '', proc_raw)
-                proc_raw = re.sub(r'\s+', ' ', proc_raw).strip()
-
-                proc_items = re.findall(
-                    r'-([A-ZÁÉÍÓÚÀÃÕÂÊÔÇÜ][^-]+?)(?=\s*-[A-ZÁÉÍÓÚÀÃÕÂÊÔÇÜ]|$)',
-                    proc_raw
-                )
-                procedures = []
-                for p in proc_items:
-                    p = re.sub(r'\s+', ' ', p).strip().strip(',').strip(' )')
-                    if p and len(p) > 2 and not re.fullmatch(r'[\s/\(\)\.\)]+', p):
-                        procedures.append(p)
-
-                records.append({
-                    "data":          date_fmt,
-                    "processo":      proc_num,
-                    "doente":        full_name,
-                    "procedimentos": " | ".join(procedures),
-                    "urgencia":      urgency,
-                })
-
-    return records
-
-
-# ─── Funções Google Sheets ────────────────────────────────────────────────────
-
-def get_gspread_client():
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    creds = Credentials.from_service_account_info(
-        dict(st.secrets["gcp_service_account"]), scopes=scopes
-    )
-    return gspread.authorize(creds)
-
-
-def append_to_sheets(records, sheet_url, pdf_name=""):
-    gc = get_gspread_client()
-    sh = gc.open_by_url(sheet_url)
-
-    try:
-        ws = sh.worksheet("Anestesiados")
-    except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet(title="Anestesiados", rows=2000, cols=20)
-        ws.update(
-            range_name="C1:H1",
-            values=[["Data", "Nº Processo", "Doente", "Procedimentos", "Urgência", "Origem"]]
-        )
-        ws.format("C1:H1", {
-            "textFormat": {"bold": True},
-            "backgroundColor": {"red": 0.122, "green": 0.220, "blue": 0.392},
-        })
-
-    col_c_values = ws.col_values(3)
-    first_free_row = len(col_c_values) + 1
-
-    rows_to_write = [
-        [rec["data"], rec["processo"], rec["doente"], rec["procedimentos"], rec["urgencia"], pdf_name]
-        for rec in records
-    ]
-
-    last_row = first_free_row + len(rows_to_write) - 1
-    ws.update(
-        range_name=f"C{first_free_row}:H{last_row}",
-        values=rows_to_write
-    )
-
-    return first_free_row, len(rows_to_write)
-
-
 # ─── Interface ────────────────────────────────────────────────────────────────
 
 st.title("📋 Extração de Cirurgias — GHRO4045R")
 st.markdown(
-    "Carregue o PDF de **Cirurgias por Interveniente**. "
+    "Carregue um ou mais PDFs de **Cirurgias por Interveniente**, de qualquer hospital "
+    "(HCIS, CCC, CCO). "
     "Os dados são extraídos e escritos automaticamente na aba **Anestesiados**."
 )
 
@@ -212,32 +30,52 @@ sheet_url = st.session_state.get("sheet_url", "").strip()
 if not sheet_url:
     st.warning("⚠️ Nenhuma planilha configurada na barra lateral.")
 
-uploaded_file = st.file_uploader("📂 Selecionar PDF", type=["pdf"])
+uploaded_files = st.file_uploader("📂 Selecionar PDF(s)", type=["pdf"], accept_multiple_files=True)
 
-if uploaded_file:
-    pdf_bytes = uploaded_file.read()
+if uploaded_files:
+    with medir_corrida("06_anestesiados_ccc") as corrida, \
+            st.spinner(f"🔍 A processar {len(uploaded_files)} PDF(s)..."):
+        resultados = processar_uploads("cirurgias", uploaded_files, "anestesiados_ccc")
 
-    with st.spinner("🔍 A processar PDF..."):
-        try:
-            records = parse_cirurgias_pdf(pdf_bytes)
-        except Exception as e:
-            st.error(f"Erro ao processar PDF: {e}")
-            st.stop()
+    for res in resultados:
+        if res["erro"]:
+            st.error(f"Erro ao processar `{res['nome']}`: {res['erro']}")
+        elif res.get("ignorado"):
+            st.info(f"⏭️ `{res['nome']}`: {res['ignorado']}.")
+        avisar_falhas(res["nome"], res.get("falhas"))
+
+    validos = [res for res in resultados if res["registos"]]
+    records = Lote.concatenar(res["registos"] for res in validos)
+
+    if not records and all(res.get("ignorado") for res in resultados):
+        st.info("ℹ️ Nada de novo: estes PDFs já foram importados.")
+        st.stop()
 
     if not records:
         st.error("Não foi possível extrair registos. Confirme se o PDF contém o padrão 'CCC/'.")
         st.stop()
 
     import pandas as pd
-    df = pd.DataFrame(records)
+    df = pd.DataFrame(records.tabela())
     df.columns = ["Data", "Nº Processo", "Doente", "Procedimentos", "Urgência"]
 
     st.dataframe(df, use_container_width=True, hide_index=True)
 
-    if sheet_url:
-        with st.spinner("📤 A escrever na planilha..."):
+    # Cada ficheiro é gravado uma só vez por sessão, mesmo com reruns
+    pendentes = [res for res in validos if not ja_exportado(sheet_url, "anestesiados", res)]
+    if sheet_url and not pendentes:
+        st.caption("✔️ Estes PDFs já foram gravados nesta sessão.")
+    elif sheet_url:
+        with medir_corrida("06_anestesiados_ccc", corrida), st.spinner("📤 A escrever na planilha..."):
             try:
-                first_row, n = append_to_sheets(records, sheet_url, pdf_name=uploaded_file.name)
-                st.success(f"✅ **{n} registos** escritos a partir da linha **{first_row}**.")
+                worksheet = obter_folha(abrir_planilha(sheet_url), "anestesiados")
+                for res in pendentes:
+                    linhas = linhas_para_folha("cirurgias", res["registos"], res["nome"], None)
+                    first_row = gravar(worksheet, sheet_url, "anestesiados", linhas, st.session_state.get("username"))
+                    n = len(linhas)
+                    marcar_exportado(sheet_url, "anestesiados", res)
+                    st.success(f"✅ **{n} registos** de `{res['nome']}` escritos a partir da linha **{first_row}**.")
             except Exception as e:
                 st.error(f"❌ Erro ao exportar: {e}")
+
+    mostrar_relatorio("06_anestesiados_ccc")
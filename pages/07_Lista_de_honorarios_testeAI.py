@@ -1,13 +1,14 @@
 import streamlit as st
-import google.generativeai as genai
-import gspread
-import json
 import re
-import io
-import pdfplumber
-from collections import Counter
 from datetime import datetime
-from google.oauth2.service_account import Credentials
+
+from core import tarefas
+from core.importacao import gravar, obter_folha
+from core.ia import ERRO_API, encontrar_em_falta, extrair_todos_ids_do_pdf, falhadas
+from core.registos import partilhar_textos
+from core.ui import (
+    acompanhar_tarefa, guardar_uploads, medir_corrida, mostrar_relatorio, tarefa_da_sessao,
+)
 
 # --- 1. CONFIGURAÇÕES INICIAIS ---
 st.set_page_config(page_title="Lista de Honorários", page_icon="💰", layout="wide")
@@ -23,174 +24,29 @@ if not sheet_url:
     st.warning("⚠️ Configuração em falta! Por favor, insira o link da sua planilha na página Home (🏠).")
     st.stop()
 
-# --- 2. FUNÇÕES DE SUPORTE ---
-
-def extrair_id_planilha(url):
-    match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', url)
-    return match.group(1) if match else url
-
-def formatar_data(data_str):
-    data_str = str(data_str).strip()
-    if not data_str or "DD-MM-YYYY" in data_str.upper():
-        return None
-    match = re.search(r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{2,4})', data_str)
-    if match:
-        d, m, a = match.groups()
-        if len(a) == 2: a = "20" + a
-        return f"{d.zfill(2)}-{m.zfill(2)}-{a}"
-    return None
-
-def extrair_dados_ia(texto_pagina, model):
-    """Extração principal — usada na Fase 1."""
-    prompt = 'Extraia dados deste PDF CUF para este JSON: [{"data":"DD-MM-YYYY","id":"ID","nome":"NOME","valor":0.00}]'
-    try:
-        response = model.generate_content(
-            f"{prompt}\n\nTEXTO:\n{texto_pagina}",
-            generation_config={"temperature": 0.0}
-        )
-        match = re.search(r'\[\s*\{.*\}\s*\]', response.text, re.DOTALL)
-        return json.loads(match.group()) if match else []
-    except:
-        return []
-
-
-# ── VERIFICAÇÃO: lê o total DECLARADO no próprio PDF ─────────────────────────
-
-def _extrair_texto_extremos(pdf_bytes_list):
-    texto = ""
-    for nome, conteudo in pdf_bytes_list:
-        with pdfplumber.open(io.BytesIO(conteudo)) as pdf:
-            indices = sorted(set([0, len(pdf.pages) - 1]))
-            for i in indices:
-                t = pdf.pages[i].extract_text() or ""
-                texto += f"\n[{nome} — pág. {i+1}]\n{t}\n"
-    return texto
-
-def _regex_total(texto):
-    padroes = [
-        r'n[oº°]\.?\s*(?:de\s+)?registos\s*[:\-]\s*(\d+)',
-        r'total\s+(?:de\s+)?registos\s*[:\-]\s*(\d+)',
-        r'total\s+(?:de\s+)?linhas\s*[:\-]\s*(\d+)',
-        r'total\s*[:\-]\s*(\d+)\s*registos',
-        r'\b(\d{2,4})\s+registos\b',
-        r'\blinhas\s*[:\-]\s*(\d+)',
-        r'\bcount\s*[:\-]\s*(\d+)',
-    ]
-    candidatos = []
-    for padrao in padroes:
-        for m in re.finditer(padrao, texto.lower()):
-            val = int(m.group(1))
-            if 1 < val < 100000:
-                candidatos.append(val)
-    return Counter(candidatos).most_common(1)[0][0] if candidatos else None
-
-def _ia_total(texto_extremos, model):
-    prompt = (
-        "Lê este texto de PDFs de honorários CUF (primeiras e últimas páginas).\n"
-        "Encontra o número TOTAL DE REGISTOS declarado ('Total', 'Nº Registos', 'Nº de linhas', etc.).\n"
-        "Responde APENAS com o número inteiro. Se não encontrares, responde: null"
-    )
+# --- 2. CONEXÃO (aberta só quando uma acção precisa dela) ---
+
+@st.cache_resource(show_spinner=False)
+def obter_modelo():
+    from core.ia import obter_modelo as criar_modelo
+    return criar_modelo()
+
+
+@st.cache_resource(show_spinner=False)
+def abrir_folha(sheet_url):
+    from core.planilha import abrir_planilha
+    return obter_folha(abrir_planilha(sheet_url), "honorarios_ia")
+
+
+def folha_ou_parar():
     try:
-        response = model.generate_content(
-            f"{prompt}\n\nTEXTO:\n{texto_extremos}",
-            generation_config={"temperature": 0.0, "max_output_tokens": 20}
-        )
-        raw = response.text.strip()
-        if "null" in raw.lower():
-            return None
-        numeros = re.findall(r'\d+', raw)
-        return int(numeros[0]) if numeros else None
-    except:
-        return None
-
-def obter_total_esperado(pdf_bytes_list, model):
-    texto_extremos = _extrair_texto_extremos(pdf_bytes_list)
-    total = _regex_total(texto_extremos)
-    if total:
-        return total, "rodapé/cabeçalho do PDF (detecção automática)"
-    total = _ia_total(texto_extremos, model)
-    if total:
-        return total, "rodapé/cabeçalho do PDF (leitura por IA)"
-    return None, None
-
-
-# ── FASE 3: CAÇA AOS REGISTOS EM FALTA ──────────────────────────────────────
-
-TERMOS_IGNORAR = ["PROENÇA ANTUNES", "UTILIZADOR", "PÁGINA", "LISTAGEM", "RELATÓRIO", "FIM DA LISTAGEM"]
-
-def extrair_todos_ids_do_pdf(pdf_bytes_list, model, status_placeholder, progresso_placeholder):
-    """
-    Relê TODAS as páginas de todos os PDFs e extrai todos os registos,
-    usando uma abordagem mais agressiva (sem pular a página 0).
-    Devolve dict {id: {data, id, nome, valor, pagina, ficheiro}}.
-    """
-    todos = {}
-    total_paginas = sum(
-        len(pdfplumber.open(io.BytesIO(c)).pages) for _, c in pdf_bytes_list
-    )
-    pagina_atual = 0
-
-    for nome_ficheiro, conteudo in pdf_bytes_list:
-        with pdfplumber.open(io.BytesIO(conteudo)) as pdf:
-            ultima_data = ""
-            for i, pagina in enumerate(pdf.pages):
-                pagina_atual += 1
-                progresso_placeholder.progress(pagina_atual / total_paginas)
-                status_placeholder.info(f"🔎 A re-analisar: {nome_ficheiro} — pág. {i+1}/{len(pdf.pages)}")
-
-                texto = pagina.extract_text(layout=True)
-                if not texto:
-                    continue
-
-                dados = extrair_dados_ia(texto, model)
-                for d in dados:
-                    dt = formatar_data(d.get('data', ''))
-                    if dt:
-                        ultima_data = dt
-                    else:
-                        dt = ultima_data
-
-                    id_limpo = re.sub(r'\D', '', str(d.get('id', '')))
-                    nome_raw = str(d.get('nome', '')).strip().upper()
-                    e_lixo = any(t in nome_raw for t in TERMOS_IGNORAR)
-
-                    if id_limpo and not e_lixo and len(nome_raw) > 3:
-                        if id_limpo not in todos:   # primeiro encontrado ganha
-                            todos[id_limpo] = {
-                                "data": dt,
-                                "id": id_limpo,
-                                "nome": nome_raw,
-                                "valor": d.get('valor', 0.0),
-                                "pagina": i + 1,
-                                "ficheiro": nome_ficheiro,
-                            }
-    return todos
-
-def encontrar_em_falta(ids_extraidos_set, todos_do_pdf):
-    """
-    Compara o set de IDs já extraídos com o universo completo do PDF.
-    Devolve lista de registos presentes no PDF mas ausentes na extração principal.
-    """
-    return [
-        r for id_key, r in todos_do_pdf.items()
-        if id_key not in ids_extraidos_set
-    ]
-
-
-# --- 3. CONEXÃO ---
-try:
-    genai.configure(api_key=master_api_key)
-    model = genai.GenerativeModel("models/gemini-2.0-flash")
-    scope = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    creds = Credentials.from_service_account_info(st.secrets["gcp_service_account"], scopes=scope)
-    gc = gspread.authorize(creds)
-    sh = gc.open_by_key(extrair_id_planilha(sheet_url))
-    worksheet = sh.get_worksheet(0)
-except Exception as e:
-    st.error(f"❌ Erro de Conexão: {e}")
-    st.stop()
+        return abrir_folha(sheet_url)
+    except Exception as e:
+        st.error(f"❌ Erro de Conexão: {e}")
+        st.stop()
 
-# --- 4. INTERFACE ---
+
+# --- 3. INTERFACE ---
 st.title("💰 Processador de Honorários")
 st.info("O sistema escreve a partir da Coluna B, preservando fórmulas na Coluna A.")
 
@@ -198,8 +54,8 @@ arquivos_pdf = st.file_uploader("Carregue os PDFs de Honorários", type=['pdf'],
 
 if "resultado_processamento" not in st.session_state:
     st.session_state.resultado_processamento = None
-if "pdf_bytes_cache" not in st.session_state:
-    st.session_state.pdf_bytes_cache = None
+if "ficheiros_tarefa" not in st.session_state:
+    st.session_state.ficheiros_tarefa = None
 if "registos_em_falta" not in st.session_state:
     st.session_state.registos_em_falta = None
 if "investigacao_feita" not in st.session_state:
@@ -209,65 +65,43 @@ if arquivos_pdf and st.button("🚀 Iniciar Processamento e Verificação"):
     # Reset investigação anterior
     st.session_state.registos_em_falta = None
     st.session_state.investigacao_feita = False
+    st.session_state.resultado_processamento = None
+
+    # Fases 1 e 2 correm em segundo plano: uma corrida longa sobrevive a
+    # reruns e desconexões e pode ser retomada numa nova sessão
+    st.session_state.tarefa_honorarios_ia = tarefas.submeter(
+        "honorarios_ia",
+        st.session_state.get("username"),
+        {},
+        [(nome, caminho) for nome, caminho, _ in guardar_uploads(arquivos_pdf, "honorarios_ia")],
+    )
 
-    todas_as_linhas_final = []
-    pdf_bytes_list = []
-    data_exec = datetime.now().strftime("%d-%m-%Y %H:%M")
-
-    progresso = st.progress(0)
-    status_info = st.empty()
-
-    # ── FASE 1: EXTRAÇÃO ─────────────────────────────────────────────────────
-    for idx, pdf_file in enumerate(arquivos_pdf):
-        status_info.info(f"📖 Fase 1/2 — A ler: {pdf_file.name} ({idx+1}/{len(arquivos_pdf)})")
-        ultima_data_valida = ""
-
-        conteudo_bytes = pdf_file.read()
-        pdf_bytes_list.append((pdf_file.name, conteudo_bytes))
-
-        with pdfplumber.open(io.BytesIO(conteudo_bytes)) as pdf:
-            for i, pagina in enumerate(pdf.pages):
-                if i == 0:
-                    continue
-                texto = pagina.extract_text(layout=True)
-                if not texto:
-                    continue
-                dados_ia = extrair_dados_ia(texto, model)
-                for d in dados_ia:
-                    dt = formatar_data(d.get('data', ''))
-                    if dt:
-                        ultima_data_valida = dt
-                    else:
-                        dt = ultima_data_valida
-                    id_limpo = re.sub(r'\D', '', str(d.get('id', '')))
-                    nome_raw = str(d.get('nome', '')).strip().upper()
-                    e_lixo = any(t in nome_raw for t in TERMOS_IGNORAR)
-                    if id_limpo and not e_lixo and len(nome_raw) > 3:
-                        todas_as_linhas_final.append([
-                            dt, id_limpo, nome_raw,
-                            d.get('valor', 0.0), data_exec, pdf_file.name
-                        ])
-
-        progresso.progress((idx + 1) / len(arquivos_pdf))
-
-    total_extraido = len(todas_as_linhas_final)
-
-    # ── FASE 2: VERIFICAÇÃO ──────────────────────────────────────────────────
-    status_info.info("🔍 Fase 2/2 — A ler total declarado no PDF...")
-    progresso.progress(0)
-    total_esperado, metodo_verificacao = obter_total_esperado(pdf_bytes_list, model)
-    progresso.progress(1.0)
-    status_info.empty()
-
-    # Guarda tudo em sessão (incluindo bytes dos PDFs para eventual Fase 3)
-    st.session_state.pdf_bytes_cache = pdf_bytes_list
-    st.session_state.resultado_processamento = {
-        "linhas": todas_as_linhas_final,
-        "total_extraido": total_extraido,
-        "total_esperado": total_esperado,
-        "metodo_verificacao": metodo_verificacao,
-        "dados_atuais_len": len(worksheet.get_all_values()),
-    }
+tarefa_id = tarefa_da_sessao("tarefa_honorarios_ia", "honorarios_ia")
+
+if tarefa_id and st.session_state.get("tarefa_ia_carregada") != tarefa_id:
+    tarefa = acompanhar_tarefa(tarefa_id)
+    if tarefa and tarefa["estado"] == tarefas.CONCLUIDA:
+        res_tarefa = tarefa["resultado"]
+        for erro in res_tarefa["erros"]:
+            st.error(f"❌ {erro}")
+
+        # Guarda o resultado em sessão; para a eventual Fase 3 basta o caminho
+        # dos PDFs na pasta da tarefa, que são relidos do disco
+        st.session_state.ficheiros_tarefa = [
+            (nome, caminho) for nome, caminho in tarefa["parametros"]["ficheiros"]
+        ]
+        st.session_state.resultado_processamento = {
+            # Vindas de JSON, cada "Ficheiro"/"Data Execução" é uma string nova
+            "linhas": partilhar_textos(res_tarefa["linhas"]),
+            "total_extraido": res_tarefa["total_extraido"],
+            "total_esperado": res_tarefa["total_esperado"],
+            "metodo_verificacao": res_tarefa["metodo_verificacao"],
+            "erros": res_tarefa["erros"],
+            "paginas": res_tarefa.get("paginas", []),
+        }
+        folha_ou_parar()
+        st.session_state["_relatorio_07_honorarios_ia"] = res_tarefa.get("metricas")
+    st.session_state.tarefa_ia_carregada = tarefa_id
 
 # ── RELATÓRIO ────────────────────────────────────────────────────────────────
 res = st.session_state.resultado_processamento
@@ -282,6 +116,41 @@ if res:
     st.markdown("---")
     st.subheader("📋 Relatório de Verificação")
 
+    # Páginas que a IA não leu (erro da API ou resposta inválida), mesmo
+    # depois da repetição automática: podem ser pedidas de novo só elas
+    paginas_falhadas = falhadas(res["paginas"])
+    if paginas_falhadas:
+        st.warning(
+            f"⚠️ **{len(paginas_falhadas)} página(s)** não foram lidas pela IA — "
+            "os registos dessas páginas não estão na extração."
+        )
+        st.dataframe(
+            [
+                {"Ficheiro": p["ficheiro"], "Página": p["pagina"],
+                 "Estado": "erro da API" if p["estado"] == ERRO_API else "página ilegível ou resposta inválida",
+                 "Erro": p["erro"]}
+                for p in paginas_falhadas
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+        if st.button(f"🔁 Repetir só as {len(paginas_falhadas)} página(s) com erro"):
+            st.session_state.registos_em_falta = None
+            st.session_state.investigacao_feita = False
+            st.session_state.tarefa_honorarios_ia = tarefas.submeter(
+                "honorarios_ia",
+                st.session_state.get("username"),
+                {"anterior": {
+                    "paginas": res["paginas"],
+                    "erros": res["erros"],
+                    "total_esperado": res["total_esperado"],
+                    "metodo_verificacao": res["metodo_verificacao"],
+                }},
+                st.session_state.ficheiros_tarefa,
+            )
+            st.session_state.resultado_processamento = None
+            st.rerun()
+
     if total_esperado is None:
         st.warning(
             f"⚠️ Não foi possível encontrar um total declarado no PDF. "
@@ -324,12 +193,14 @@ if res:
                 prog_inv = st.progress(0)
                 status_inv = st.empty()
 
-                todos_do_pdf = extrair_todos_ids_do_pdf(
-                    st.session_state.pdf_bytes_cache,
-                    model,
-                    status_inv,
-                    prog_inv
-                )
+                with medir_corrida("07_honorarios_ia"):
+                    todos_do_pdf = extrair_todos_ids_do_pdf(
+                        st.session_state.ficheiros_tarefa,
+                        obter_modelo(),
+                        status_inv,
+                        prog_inv,
+                        utilizador=st.session_state.get("username"),
+                    )
                 em_falta = encontrar_em_falta(ids_extraidos, todos_do_pdf)
 
                 prog_inv.progress(1.0)
@@ -352,7 +223,7 @@ if res:
                 st.error(f"🔍 Foram encontrados **{len(em_falta)} registo(s) em falta**:")
 
                 import pandas as pd
-                df_falta = pd.DataFrame(em_falta)
+                df_falta = pd.DataFrame(em_falta.tabela())
                 df_falta = df_falta.rename(columns={
                     "data": "Data", "id": "ID Utente", "nome": "Nome",
                     "valor": "Valor (€)", "pagina": "Página", "ficheiro": "Ficheiro"
@@ -420,15 +291,17 @@ if res:
             st.warning("⚠️ Nenhum dado válido para exportar.")
         else:
             try:
-                proxima_linha = res["dados_atuais_len"] + 1
-                worksheet.update(
-                    range_name=f"B{proxima_linha}",
-                    values=todas_as_linhas_final
-                )
+                with medir_corrida("07_honorarios_ia"):
+                    gravar(
+                        abrir_folha(sheet_url), sheet_url, "honorarios_ia",
+                        todas_as_linhas_final, st.session_state.get("username"),
+                    )
                 st.success(f"✅ {len(todas_as_linhas_final)} linhas gravadas na Coluna B com sucesso!")
                 st.session_state.resultado_processamento = None
-                st.session_state.pdf_bytes_cache = None
+                st.session_state.ficheiros_tarefa = None
                 st.session_state.registos_em_falta = None
                 st.session_state.investigacao_feita = False
             except Exception as e:
                 st.error(f"❌ Erro ao gravar na planilha: {e}")
+
+mostrar_relatorio("07_honorarios_ia")
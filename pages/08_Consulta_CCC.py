@@ -1,160 +1,70 @@
 import streamlit as st
-import pdfplumber
-import re
-import io
-import gspread
-import pandas as pd
-from google.oauth2.service_account import Credentials
 from datetime import datetime
 
+from core.importacao import gravar, linhas_para_folha, obter_folha
+from core.planilha import abrir_planilha
+from core.registos import Lote
+from core.ui import (
+    avisar_falhas, ja_exportado, marcar_exportado, medir_corrida, mostrar_relatorio,
+    processar_uploads,
+)
+
 # ─── Autenticação ─────────────────────────────────────────────────────────────
 if "authenticated" not in st.session_state or not st.session_state["authenticated"]:
     st.warning("🔐 Por favor autentique-se na página principal.")
     st.stop()
 
-# ─── Constantes de layout e RegEx ─────────────────────────────────────────────
-NAME_X_MIN  = 150   
-NAME_X_MAX  = 400   
-
-# Regex para Data e Hora
-DATE_TIME_RE = re.compile(r'(\d{4}-\d{2}-\d{2})\s*(\d{2}:\d{2})?')
-
-# Regex para capturar o prefixo no grupo 1 e os NÚMEROS no grupo 2
-PROC_RE = re.compile(r'(CCC|CCO|HCIS)/(\d+)')
-
-# Filtro para ignorar lixo
-JUNK_RE = re.compile(r'\d{5,}|^[A-Z0-9]{6,}$|Anestesiologi|Consultas|Consulta De')
-
-# ─── Parser PDF ───────────────────────────────────────────────────────────────
-
-def cluster_rows(words, gap=5):
-    if not words: return []
-    sw = sorted(words, key=lambda w: w['top'])
-    clusters = [[sw[0]]]
-    for w in sw[1:]:
-        if w['top'] - clusters[-1][-1]['top'] <= gap:
-            clusters[-1].append(w)
-        else:
-            clusters.append([w])
-    return clusters
-
-def limpar_nome(parts):
-    limpos = [p for p in parts if not JUNK_RE.search(p)]
-    return ' '.join(limpos).strip()
-
-def parse_consultas_pdf(pdf_bytes):
-    records = []
-
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page in pdf.pages:
-            words = page.extract_words(keep_blank_chars=False, x_tolerance=3, y_tolerance=3)
-            clusters = cluster_rows(words, gap=5)
-
-            i = 0
-            while i < len(clusters):
-                row = clusters[i]
-                row_text = " ".join([w['text'] for w in row])
-
-                date_val = None
-                proc_val = None
-                name_parts = []
-
-                date_match = DATE_TIME_RE.search(row_text)
-                proc_match = PROC_RE.search(row_text)
-
-                if date_match:
-                    date_val = date_match.group(1)
-                
-                if proc_match:
-                    # ALTERAÇÃO: Captura apenas o grupo(2), que são os números
-                    proc_val = proc_match.group(2)
-
-                if date_val and proc_val:
-                    for w in sorted(row, key=lambda x: x['x0']):
-                        if NAME_X_MIN <= w['x0'] <= NAME_X_MAX:
-                            if re.match(r'^[A-ZÁÉÍÓÚÀÃÕÂÊÔÇÜ]', w['text']):
-                                name_parts.append(w['text'])
-
-                    j = i + 1
-                    while j < len(clusters):
-                        next_row = clusters[j]
-                        next_text = " ".join([w['text'] for w in next_row])
-                        if DATE_TIME_RE.search(next_text) or "nascimento" in next_text.lower():
-                            break
-                        for w in sorted(next_row, key=lambda x: x['x0']):
-                            if NAME_X_MIN <= w['x0'] <= NAME_X_MAX:
-                                if re.match(r'^[A-ZÁÉÍÓÚÀÃÕÂÊÔÇÜ]', w['text']):
-                                    name_parts.append(w['text'])
-                        j += 1
-
-                    pts = date_val.split('-')
-                    date_fmt = f"{pts[2]}-{pts[1]}-{pts[0]}"
-
-                    records.append({
-                        "data":     date_fmt,
-                        "processo": proc_val,
-                        "nome":     limpar_nome(name_parts),
-                    })
-                    i = j
-                else:
-                    i += 1
-    return records
-
-# ─── Google Sheets ────────────────────────────────────────────────────────────
-
-def get_gspread_client():
-    scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-    creds = Credentials.from_service_account_info(dict(st.secrets["gcp_service_account"]), scopes=scopes)
-    return gspread.authorize(creds)
-
-def append_to_sheets(records, sheet_url, pdf_name):
-    gc = get_gspread_client()
-    sh = gc.open_by_url(sheet_url)
-
-    try:
-        ws = sh.worksheet("Consulta")
-    except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet(title="Consulta", rows=2000, cols=20)
-        ws.update(range_name="C1:F1", values=[["Data", "Nº Processo", "Nome", "Origem PDF"]])
-        ws.format("C1:F1", {"textFormat": {"bold": True}, "backgroundColor": {"red": 0.1, "green": 0.2, "blue": 0.4}})
-
-    col_c = ws.col_values(3)
-    first_free_row = len(col_c) + 1
-
-    rows_to_write = [[r["data"], r["processo"], r["nome"], pdf_name] for r in records]
-    last_row = first_free_row + len(rows_to_write) - 1
-    
-    ws.update(range_name=f"C{first_free_row}:F{last_row}", values=rows_to_write)
-    return first_free_row, len(rows_to_write)
-
 # ─── Interface Streamlit ──────────────────────────────────────────────────────
 
 st.title("🗓️ Extração de Consultas — GHCE4025R")
-st.markdown("Extração de dados sem prefixos (apenas números de processo).")
+st.markdown(
+    "Extração de dados sem prefixos (apenas números de processo), "
+    "de qualquer hospital (HCIS, CCC, CCO)."
+)
 
 sheet_url = st.session_state.get("sheet_url", "").strip()
 
-uploaded_file = st.file_uploader("📂 Selecionar PDF", type=["pdf"])
+uploaded_files = st.file_uploader("📂 Selecionar PDF(s)", type=["pdf"], accept_multiple_files=True)
 
-if uploaded_file:
-    pdf_bytes = uploaded_file.read()
-    with st.spinner("🔍 A processar PDF..."):
-        try:
-            records = parse_consultas_pdf(pdf_bytes)
-        except Exception as e:
-            st.error(f"Erro: {e}")
-            st.stop()
+if uploaded_files:
+    with medir_corrida("08_consultas_ccc") as corrida, \
+            st.spinner(f"🔍 A processar {len(uploaded_files)} PDF(s)..."):
+        resultados = processar_uploads("consultas", uploaded_files, "consultas_ccc")
 
-    if not records:
+    for res in resultados:
+        if res["erro"]:
+            st.error(f"Erro em `{res['nome']}`: {res['erro']}")
+        elif res.get("ignorado"):
+            st.info(f"⏭️ `{res['nome']}`: {res['ignorado']}.")
+        avisar_falhas(res["nome"], res.get("falhas"))
+
+    validos = [res for res in resultados if res["registos"]]
+    records = Lote.concatenar(res["registos"] for res in validos)
+
+    if not records and all(res.get("ignorado") for res in resultados):
+        st.info("ℹ️ Nada de novo: estes PDFs já foram importados.")
+    elif not records:
         st.error("Nenhum dado extraído. Verifique o PDF.")
     else:
-        df = pd.DataFrame(records)
+        import pandas as pd
+        df = pd.DataFrame(records.tabela())
         st.dataframe(df, use_container_width=True, hide_index=True)
 
-        if sheet_url:
+        pendentes = [res for res in validos if not ja_exportado(sheet_url, "consulta", res)]
+        if sheet_url and not pendentes:
+            st.caption("✔️ Estes PDFs já foram enviados nesta sessão.")
+        elif sheet_url:
             if st.button("📤 Enviar para Google Sheets"):
-                with st.spinner("A enviar..."):
-                    row, count = append_to_sheets(records, sheet_url, uploaded_file.name)
+                with medir_corrida("08_consultas_ccc", corrida), st.spinner("A enviar..."):
+                    count = 0
+                    worksheet = obter_folha(abrir_planilha(sheet_url), "consulta")
+                    for res in pendentes:
+                        linhas = linhas_para_folha("consultas", res["registos"], res["nome"], None)
+                        gravar(worksheet, sheet_url, "consulta", linhas, st.session_state.get("username"))
+                        marcar_exportado(sheet_url, "consulta", res)
+                        count += len(linhas)
                     st.success(f"Sucesso! {count} registos enviados.")
         else:
             st.warning("🔗 Por favor, configure o link da planilha.")
+
+    mostrar_relatorio("08_consultas_ccc")
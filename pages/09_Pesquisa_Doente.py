@@ -0,0 +1,132 @@
+import streamlit as st
+import time
+
+from core import espelho
+from core.indice import IndiceDoentes
+from core.planilha import cliente_gspread, extrair_id_planilha
+
+st.set_page_config(page_title="Pesquisa de Doente", page_icon="🔎", layout="wide")
+
+# ─── Autenticação ─────────────────────────────────────────────────────────────
+if "authenticated" not in st.session_state or not st.session_state["authenticated"]:
+    st.warning("🔐 Por favor autentique-se na página principal.")
+    st.stop()
+
+sheet_url = st.session_state.get("sheet_url", "").strip()
+if not sheet_url:
+    st.warning("⚠️ Configuração em falta na Home (Link da Planilha).")
+    st.stop()
+
+
+# ─── Índice partilhado entre sessões ──────────────────────────────────────────
+
+@st.cache_resource(show_spinner=False)
+def obter_indice(planilha_id):
+    """Um índice por planilha, partilhado por todas as sessões do servidor."""
+    return IndiceDoentes(planilha_id)
+
+
+def sincronizar_historico(sheet_url):
+    """Copia para o espelho local o conteúdo actual de todas as abas da planilha."""
+    import gspread
+
+    sh = cliente_gspread().open_by_url(sheet_url)
+    nomes_abas = {aba["folha"] for aba in espelho.ABAS.values() if aba["folha"]}
+
+    totais = {}
+    for tabela, aba in espelho.ABAS.items():
+        # A primeira aba (07) só é lida se não for uma das abas já sincronizadas
+        if aba["folha"] is None and sh.get_worksheet(0).title in nomes_abas:
+            continue
+        try:
+            totais[tabela] = espelho.sincronizar_da_folha(sh, sheet_url, tabela)
+        except gspread.exceptions.WorksheetNotFound:
+            totais[tabela] = 0
+    return totais
+
+
+indice = obter_indice(extrair_id_planilha(sheet_url))
+
+
+# ─── Interface ────────────────────────────────────────────────────────────────
+
+st.title("🔎 Pesquisa de Doente")
+st.markdown(
+    "Pesquise por **nº de processo** ou **nome** (início de qualquer palavra, "
+    "sem distinguir acentos). Mostra a cronologia completa do doente: "
+    "consultas, anestesias, exames e pagamentos."
+)
+
+with st.expander("🔄 Histórico anterior ao espelho local"):
+    st.caption(
+        "As importações feitas nesta aplicação entram no índice automaticamente. "
+        "Para incluir dados que já estavam na planilha, sincronize uma vez."
+    )
+    if st.button("Sincronizar a partir da planilha"):
+        import gspread      # só aqui, para os erros abaixo (ver core.arranque)
+
+        with st.spinner("📥 A ler as abas da planilha..."):
+            try:
+                totais = sincronizar_historico(sheet_url)
+                st.success(
+                    "✅ Sincronizado: "
+                    + ", ".join(f"{t}: {n}" for t, n in totais.items())
+                )
+            except gspread.exceptions.SpreadsheetNotFound:
+                st.error("❌ Planilha não encontrada. Verifique o URL na configuração.")
+            except gspread.exceptions.APIError as e:
+                st.error(f"❌ Erro de API Google: {e}")
+
+termo = st.text_input("Processo ou nome do doente", placeholder="ex.: 245230 ou silva")
+
+if termo:
+    t0 = time.perf_counter()
+    indice.atualizar()
+    resultados = indice.procurar(termo)
+    ms = (time.perf_counter() - t0) * 1000
+    st.caption(f"{len(resultados)} resultado(s) em {ms:.1f} ms — {len(indice)} doentes no índice")
+
+    if not resultados:
+        st.info("Nenhum doente encontrado.")
+        st.stop()
+
+    escolha = st.radio(
+        "Doente",
+        resultados,
+        format_func=lambda r: f"{r[0]} — {r[1]}",
+        label_visibility="collapsed",
+    )
+    processo, nome = escolha
+    eventos = indice.cronologia(processo)
+
+    st.subheader(f"{nome} · processo {processo}")
+
+    contagem = {}
+    for e in eventos:
+        contagem[e["tipo"]] = contagem.get(e["tipo"], 0) + 1
+    total_pago = sum(e["valor"] or 0 for e in eventos if e["tipo"].startswith("Pagamento"))
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("Consultas", contagem.get("Consulta", 0))
+    with col2:
+        st.metric("Anestesias", contagem.get("Anestesia", 0))
+    with col3:
+        st.metric("Exames", contagem.get("Exame", 0))
+    with col4:
+        st.metric(
+            "Pagamentos",
+            contagem.get("Pagamento", 0) + contagem.get("Pagamento (IA)", 0),
+        )
+    with col5:
+        st.metric("Total pago (€)", f"{total_pago:,.2f}")
+
+    import pandas as pd
+    df = pd.DataFrame(eventos, columns=["data", "tipo", "descricao", "valor", "origem"])
+    df.columns = ["Data", "Tipo", "Descrição", "Valor (€)", "Origem"]
+    st.dataframe(
+        df,
+        use_container_width=True,
+        hide_index=True,
+        column_config={"Descrição": st.column_config.TextColumn(width="large")},
+    )
@@ -0,0 +1,147 @@
+import streamlit as st
+import time
+from datetime import date
+
+from core import analise, espelho
+from core.planilha import cliente_gspread
+
+st.set_page_config(page_title="Painel de Análise", page_icon="📊", layout="wide")
+
+# ─── Autenticação ─────────────────────────────────────────────────────────────
+if "authenticated" not in st.session_state or not st.session_state["authenticated"]:
+    st.warning("🔐 Por favor autentique-se na página principal.")
+    st.stop()
+
+sheet_url = st.session_state.get("sheet_url", "").strip()
+if not sheet_url:
+    st.warning("⚠️ Configuração em falta na Home (Link da Planilha).")
+    st.stop()
+
+# Abas lidas pelo painel (a primeira aba do 07 partilha as colunas B:E com "pagos")
+TABELAS_PAINEL = ["pagos", "anestesiados", "consulta", "exames_esp"]
+TTL_DADOS = 600  # segundos
+
+
+# ─── Leitura (uma só chamada batchGet para todas as abas) ─────────────────────
+
+@st.cache_data(ttl=TTL_DADOS, show_spinner=False)
+def carregar_dados(sheet_url, versao):
+    """
+    Lê todas as abas do painel num único pedido multi-intervalo e devolve
+    {tabela: DataFrame}. "versao" vem do espelho local: qualquer importação
+    muda-a e invalida esta cache, mesmo antes de expirar o TTL.
+    """
+    sh = cliente_gspread().open_by_url(sheet_url)
+    existentes = {ws.title for ws in sh.worksheets()}
+
+    intervalos = {}
+    for tabela in TABELAS_PAINEL:
+        aba = espelho.ABAS[tabela]
+        if aba["folha"] not in existentes:
+            continue
+        col = aba["coluna_inicial"]
+        ultima_col = chr(ord(col) + len(aba["campos"]) - 1)
+        intervalos[tabela] = f"'{aba['folha']}'!{col}2:{ultima_col}"
+
+    resposta = sh.values_batch_get(
+        list(intervalos.values()),
+        params={
+            "valueRenderOption": "UNFORMATTED_VALUE",
+            "dateTimeRenderOption": "FORMATTED_STRING",
+        },
+    ) if intervalos else {"valueRanges": []}
+
+    lidos = dict(zip(intervalos, resposta.get("valueRanges", [])))
+    return {
+        tabela: analise.preparar(lidos.get(tabela, {}).get("values", []), tabela)
+        for tabela in TABELAS_PAINEL
+    }
+
+
+# ─── Interface ────────────────────────────────────────────────────────────────
+
+st.title("📊 Painel de Análise")
+
+with st.spinner("📥 A carregar dados da planilha..."):
+    try:
+        dados = carregar_dados(sheet_url, espelho.versao(sheet_url))
+    except Exception as e:
+        # Um erro da planilha vem de carregar_dados, que já importou o gspread
+        import gspread
+
+        if isinstance(e, gspread.exceptions.SpreadsheetNotFound):
+            st.error("❌ Planilha não encontrada. Verifique o URL na configuração.")
+        elif isinstance(e, gspread.exceptions.APIError):
+            st.error(f"❌ Erro de API Google: {e}")
+        else:
+            raise
+        st.stop()
+
+t0 = time.perf_counter()
+
+todas_datas = [df["dt"] for df in dados.values() if not df.empty]
+if not todas_datas:
+    st.info("Ainda não há registos nas abas da planilha.")
+    st.stop()
+
+minimo = min(s.min() for s in todas_datas).date()
+maximo = max(s.max() for s in todas_datas).date()
+
+col_a, col_b = st.columns([3, 1])
+with col_a:
+    if minimo < maximo:
+        inicio, fim = st.slider(
+            "Período",
+            min_value=minimo,
+            max_value=maximo,
+            value=(max(minimo, date(maximo.year - 1, maximo.month, 1)), maximo),
+            format="MM/YYYY",
+        )
+    else:
+        inicio, fim = minimo, maximo
+with col_b:
+    if st.button("🔄 Recarregar da planilha"):
+        carregar_dados.clear()
+        st.rerun()
+
+pagos   = analise.filtrar_periodo(dados["pagos"], inicio, fim)
+anest   = analise.filtrar_periodo(dados["anestesiados"], inicio, fim)
+consult = analise.filtrar_periodo(dados["consulta"], inicio, fim)
+exames  = analise.filtrar_periodo(dados["exames_esp"], inicio, fim)
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("Receita (€)", f"{pagos['valor_num'].sum():,.2f}" if not pagos.empty else "0.00")
+with col2:
+    st.metric("Cirurgias", len(anest))
+with col3:
+    st.metric("Consultas", len(consult))
+with col4:
+    st.metric("Exames Especiais", len(exames))
+
+st.subheader("💶 Receita mensal")
+receita = analise.receita_mensal(pagos)
+st.bar_chart(receita["Receita (€)"])
+
+st.subheader("🩺 Actividade mensal")
+actividade = analise.contagem_mensal(anest, "Cirurgias").join(
+    [analise.contagem_mensal(consult, "Consultas"),
+     analise.contagem_mensal(exames, "Exames")],
+    how="outer",
+).fillna(0)
+st.line_chart(actividade)
+
+col_e, col_p = st.columns(2)
+with col_e:
+    st.subheader("🏢 Por entidade")
+    st.dataframe(analise.volume_por(pagos, "entidade"), use_container_width=True)
+with col_p:
+    st.subheader("📋 Por procedimento")
+    st.dataframe(analise.volume_por(pagos, "procedimento"), use_container_width=True)
+
+st.subheader("💉 Actos por dia operatório")
+por_dia = analise.atos_por_dia_operatorio(anest)
+st.line_chart(por_dia["Actos por dia"])
+st.dataframe(por_dia, use_container_width=True)
+
+st.caption(f"Agregações calculadas em {(time.perf_counter() - t0) * 1000:.0f} ms")
@@ -0,0 +1,105 @@
+import streamlit as st
+import pandas as pd
+
+from core import tarefas
+from core.escalonador import formatar_eta, obter_fila_gemini, obter_fila_sheets
+
+st.set_page_config(page_title="Tarefas", page_icon="⏳", layout="wide")
+
+# ─── Autenticação ─────────────────────────────────────────────────────────────
+if "authenticated" not in st.session_state or not st.session_state["authenticated"]:
+    st.warning("🔐 Por favor autentique-se na página principal.")
+    st.stop()
+
+NOMES_TIPO = {
+    "honorarios":    "💶 Honorários",
+    "honorarios_ia": "💰 Honorários (IA)",
+}
+ICONES_ESTADO = {
+    tarefas.PENDENTE:     "🕓 Em fila",
+    tarefas.EM_CURSO:     "⚙️ Em curso",
+    tarefas.CONCLUIDA:    "✅ Concluída",
+    tarefas.ERRO:         "❌ Erro",
+    tarefas.INTERROMPIDA: "⛔ Interrompida",
+}
+
+st.title("⏳ Tarefas em segundo plano")
+st.caption(
+    "As importações longas continuam a correr no servidor mesmo depois de fechar a página. "
+    "As tarefas ficam guardadas durante "
+    f"{tarefas.DIAS_RETENCAO} dias."
+)
+
+if st.button("🔄 Atualizar"):
+    st.rerun()
+
+# ─── Filas partilhadas (quota Gemini / Sheets) ────────────────────────────────
+st.subheader("🚦 Filas partilhadas")
+st.caption(
+    "A chave Gemini e a conta de serviço do Sheets são partilhadas por todos os utilizadores; "
+    "os pedidos são servidos à vez entre utilizadores, para que trabalhos pequenos não "
+    "fiquem presos atrás de importações grandes."
+)
+for coluna, (titulo, fila) in zip(
+    st.columns(2),
+    [("🤖 Gemini (páginas)", obter_fila_gemini()), ("📊 Google Sheets (lotes)", obter_fila_sheets())],
+):
+    estado = fila.estado(st.session_state.get("username"))
+    with coluna:
+        st.markdown(f"**{titulo}**")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Seus na fila", estado["na_fila"])
+        c2.metric("À frente", estado["posicao"] if estado["na_fila"] else "—")
+        c3.metric("ETA", formatar_eta(estado["eta_s"]) if estado["na_fila"] else "—")
+        st.caption(f"Total na fila (todos os utilizadores): {estado['total_fila']}")
+
+st.subheader("📋 As suas tarefas")
+
+lista = tarefas.listar(st.session_state.get("username"), limite=50)
+if not lista:
+    st.info("Ainda não submeteu nenhuma tarefa.")
+    st.stop()
+
+df = pd.DataFrame([
+    {
+        "ID":         t["id"],
+        "Tipo":       NOMES_TIPO.get(t["tipo"], t["tipo"]),
+        "Estado":     ICONES_ESTADO.get(t["estado"], t["estado"]),
+        "Progresso":  t["progresso"],
+        "Mensagem":   t["mensagem"],
+        "Criada em":  t["criada_em"],
+        "Atualizada": t["atualizada_em"],
+    }
+    for t in lista
+])
+st.dataframe(
+    df,
+    use_container_width=True,
+    hide_index=True,
+    column_config={
+        "Progresso": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0),
+    },
+)
+
+# ─── Detalhe ──────────────────────────────────────────────────────────────────
+escolhida = st.selectbox(
+    "Ver detalhe da tarefa",
+    [t["id"] for t in lista],
+    format_func=lambda i: next(
+        f"{i} — {NOMES_TIPO.get(t['tipo'], t['tipo'])} ({t['criada_em']})"
+        for t in lista if t["id"] == i
+    ),
+)
+t = tarefas.obter(escolhida)
+
+if t["parametros"] and t["parametros"].get("ficheiros"):
+    st.markdown("**Ficheiros:** " + ", ".join(nome for nome, _ in t["parametros"]["ficheiros"]))
+
+if t["estado"] == tarefas.CONCLUIDA:
+    st.json(t["resultado"], expanded=False)
+elif t["estado"] in tarefas.TERMINAIS:
+    st.error(t["mensagem"])
+    if t["erro"]:
+        st.code(t["erro"])
+else:
+    st.progress(t["progresso"], text=t["mensagem"] or "…")
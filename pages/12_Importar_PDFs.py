@@ -0,0 +1,144 @@
+import streamlit as st
+from datetime import datetime
+
+from core import espelho
+from core.deteccao import DESCRICOES
+from core.importacao import TABELA_DO_TIPO
+from core.parsers.honorarios import grupos_divergentes
+from core.registos import Lote
+from core.saidas import formatos_disponiveis
+from core.ui import (
+    ficheiro_para_transferir, ja_exportado, marcar_exportado, medir_corrida, mostrar_relatorio,
+    processar_uploads,
+)
+
+st.set_page_config(page_title="Importar PDFs", page_icon="📥", layout="wide")
+
+# ─── Autenticação ─────────────────────────────────────────────────────────────
+if "authenticated" not in st.session_state or not st.session_state["authenticated"]:
+    st.warning("🔐 Por favor autentique-se na página principal.")
+    st.stop()
+
+# ─── Interface ────────────────────────────────────────────────────────────────
+
+st.title("📥 Importar PDFs")
+st.markdown(
+    "Carregue qualquer relatório — **Mapa de Honorários**, **Cirurgias (GHRO4045R)**, "
+    "**Consultas (GHCE4025R)** ou **Exames Realizados**, de qualquer hospital "
+    "(HCIS, CCC, CCO). O tipo é reconhecido pelo cabeçalho da primeira página e cada "
+    "ficheiro vai para a aba certa; pode misturar tipos no mesmo carregamento."
+)
+
+st.divider()
+
+sheet_url = st.session_state.get("sheet_url", "").strip()
+
+uploaded_files = st.file_uploader(
+    "📂 Selecionar PDF(s)",
+    type=["pdf"],
+    accept_multiple_files=True,
+)
+
+if uploaded_files:
+    # ── Detecção pelo cabeçalho + parsing em paralelo (memoizado) ────────────
+    with medir_corrida("12_importar") as corrida, \
+            st.spinner(f"🔍 A identificar e processar {len(uploaded_files)} PDF(s)..."):
+        resultados = processar_uploads("auto", uploaded_files, "importar")
+
+    def estado(res):
+        if res["erro"]:
+            return f"❌ {res['erro']}"
+        if res.get("ignorado"):
+            return f"⏭️ {res['ignorado']}"
+        if res.get("falhas"):
+            return f"⚠️ página(s) com erro, não lida(s): {', '.join(map(str, sorted(res['falhas'])))}"
+        if not res["registos"]:
+            return "⚠️ nenhum registo extraído"
+        divergentes = grupos_divergentes(res.get("verificacao"))
+        if divergentes:
+            return f"⚠️ não confere com o sumário da pág. 1: {', '.join(divergentes)}"
+        return "✅"
+
+    st.dataframe(
+        [
+            {
+                "Ficheiro": res["nome"],
+                "Tipo":     DESCRICOES.get(res["tipo"], "—" if res.get("ignorado") else "não reconhecido"),
+                "Aba":      espelho.ABAS[TABELA_DO_TIPO[res["tipo"]]]["folha"]
+                            if res["tipo"] in TABELA_DO_TIPO else "—",
+                "Páginas":  res["paginas"],
+                "Registos": len(res["registos"]),
+                "Estado":   estado(res),
+            }
+            for res in resultados
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    validos = [res for res in resultados if res["registos"] and res["tipo"] in TABELA_DO_TIPO]
+    por_tabela = {}
+    for res in validos:
+        por_tabela.setdefault(TABELA_DO_TIPO[res["tipo"]], []).append(res)
+
+    # ── Pré-visualização por aba ─────────────────────────────────────────────
+    for tabela, lista in por_tabela.items():
+        registos = Lote.concatenar(res["registos"] for res in lista)
+        with st.expander(f"👁️ {espelho.ABAS[tabela]['folha']} — {len(registos)} registos"):
+            st.dataframe(registos.tabela(), use_container_width=True, hide_index=True)
+
+    # ── Transferência em ficheiro (sem a quota do Sheets) ────────────────────
+    # Para importações grandes: um ficheiro por aba, com as colunas da
+    # folha, para colar ou carregar de uma vez
+    if validos:
+        col_formato, col_botao = st.columns([1, 3])
+        formato = col_formato.selectbox(
+            "Formato", formatos_disponiveis(), format_func=str.upper, key="formato_saida_12",
+        )
+        chave = ("saida_12", formato, tuple(res["hash"] for res in validos))
+        if col_botao.button(f"📄 Preparar ficheiro {formato.upper()}", help=(
+            "Um ficheiro por aba (pagos, Anestesiados, Consulta, ExamesEsp), com as "
+            "mesmas colunas que a gravação na planilha."
+        )):
+            st.session_state["_saida_12"] = chave
+        if st.session_state.get("_saida_12") == chave:
+            with medir_corrida("12_importar", corrida):
+                caminho, nome, mime = ficheiro_para_transferir(validos, formato)
+            with open(caminho, "rb") as f:
+                col_botao.download_button(f"⬇️ Descarregar {nome}", f, file_name=nome, mime=mime)
+
+    st.divider()
+
+    # ── Gravação (uma vez por ficheiro e sessão) ─────────────────────────────
+    pendentes = [
+        res for res in validos
+        if not ja_exportado(sheet_url, TABELA_DO_TIPO[res["tipo"]], res)
+    ]
+    if not sheet_url:
+        st.info("Configure o link da planilha na barra lateral para exportar os dados.")
+    elif not validos:
+        st.error("Nenhum registo para gravar.")
+    elif not pendentes:
+        st.caption(f"🔗 Planilha: `{sheet_url}` — estes PDFs já foram gravados nesta sessão.")
+    elif st.button(f"📤 Gravar {len(pendentes)} ficheiro(s) na planilha", type="primary"):
+        from core.importar import DestinoPlanilha, gravar_resultado
+
+        gravado_em = datetime.now().strftime("%d-%m-%Y %H:%M")
+        with medir_corrida("12_importar", corrida), st.spinner("📤 A escrever na planilha..."):
+            try:
+                destino = DestinoPlanilha(sheet_url, st.session_state.get("username"))
+                for res in pendentes:
+                    tabela, n = gravar_resultado(res, [destino], gravado_em)
+                    marcar_exportado(sheet_url, tabela, res)
+                    st.success(
+                        f"✅ **{n} linhas** de `{res['nome']}` gravadas na aba "
+                        f"**{espelho.ABAS[tabela]['folha']}**."
+                    )
+                st.markdown(f"[🔗 Abrir Planilha]({sheet_url})")
+            except Exception as e:
+                st.error(f"❌ Erro ao gravar na planilha: {e}")
+
+    mostrar_relatorio("12_importar")
+
+else:
+    st.info("👆 Carregue um ou mais ficheiros PDF para começar.")